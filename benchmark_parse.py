@@ -0,0 +1,238 @@
+# benchmark_parse.py
+"""Before/after benchmark of troop page parsing on debug_troop.html.
+
+"before" is the original implementation, which built three soups per page.
+"after" is the single-pass parse_troop_page, run with each available parser
+backend. Both must produce the same troop record; the new parser may only add
+equipment links (names the item resolver maps that exact lookup missed).
+
+Usage: python benchmark_parse.py [iterations]
+"""
+import re
+import sys
+import time
+from typing import Dict
+
+from bs4 import BeautifulSoup
+
+import run_scraper_improved
+from run_scraper_improved import BannerlordTroopScraper
+
+FIXTURE_HTML = 'debug_troop.html'
+DEFAULT_ITERATIONS = 200
+
+
+class LegacyTroopParser(BannerlordTroopScraper):
+    """The parsing code as it was before the single-pass rewrite, kept for comparison"""
+
+    def extract_equipment(self, soup: BeautifulSoup, troop_id: int, missing_items: set = None):
+        if missing_items is None:
+            missing_items = self.missing_items
+
+        equipment_header = soup.find('span', {'id': 'Equipment'})
+        if not equipment_header:
+            return
+
+        equipment_section = equipment_header.find_parent(['h2', 'h3'])
+        if not equipment_section:
+            return
+
+        equipment_table = equipment_section.find_next('table')
+        if not equipment_table:
+            return
+
+        slot_mapping = {
+            'weapons': 'weapon',
+            'weapon': 'weapon',
+            'shield': 'shield',
+            'head armor': 'head_armor',
+            'shoulder armor': 'shoulder_armor',
+            'body armor': 'body_armor',
+            'hand armor': 'hand_armor',
+            'leg armor': 'leg_armor',
+            'foot armor': 'foot_armor',
+            'mount': 'horse',
+            'mount harness': 'horse_harness',
+        }
+
+        for row in equipment_table.find_all('tr'):
+            cells = row.find_all(['th', 'td'])
+
+            if len(cells) < 2:
+                continue
+
+            slot_name = cells[0].get_text(strip=True).lower()
+            cell_text = cells[1].get_text().strip()
+
+            if 'n/a' in cell_text.lower() or cell_text == '?':
+                continue
+
+            db_slot = slot_mapping.get(slot_name)
+            if not db_slot:
+                continue
+
+            items_text = str(cells[1])
+            items_text = items_text.replace('<br/>', '|').replace('<br />', '|').replace('<br>', '|')
+            soup_cell = BeautifulSoup(items_text, 'html.parser')
+            item_names = soup_cell.get_text().split('|')
+
+            for item_name in item_names:
+                item_name = item_name.strip()
+
+                if not item_name or item_name == '?' or '(Possible)' in item_name:
+                    continue
+
+                item_name = item_name.replace('(Possible)', '').strip()
+                if ' (' in item_name:
+                    item_name = item_name.split(' (')[0]
+
+                if item_name in self.item_map:
+                    item_data = self.item_map[item_name]
+                    self.equipment_data.append((troop_id, item_data['id'], item_data['slot']))
+                else:
+                    missing_items.add(item_name)
+
+    def parse_troop_page(self, html: str, troop_name: str, faction: str, troop_id: int,
+                         missing_items: set = None) -> Dict:
+        """Parse individual troop page for stats AND equipment"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Extract tier
+        tier = 1
+        tier_match = re.search(r'tier-(\w+)', html, re.IGNORECASE)
+        if tier_match:
+            tier_text = tier_match.group(1).lower()
+            tier_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+            tier = tier_map.get(tier_text, self.estimate_tier(troop_name))
+        else:
+            tier = self.estimate_tier(troop_name)
+
+        # Extract wage
+        wage = 0
+        wage_match = re.search(r'(\d+)\s*denars?/day', html, re.IGNORECASE)
+        if wage_match:
+            wage = int(wage_match.group(1))
+        else:
+            wage = self.estimate_wage(tier)
+
+        # Determine if mounted
+        is_mounted = self.is_troop_mounted(troop_name, html)
+
+        # Extract Equipment
+        self.extract_equipment(soup, troop_id, missing_items)
+
+        return {
+            'name': troop_name,
+            'tier': tier,
+            'wage': wage,
+            'is_mounted': is_mounted,
+            'faction': faction
+        }
+
+    def is_troop_mounted(self, troop_name: str, html: str) -> bool:
+        """Determine if troop is mounted by checking Equipment table"""
+        # Parse the HTML to find the Mount row in the Equipment table
+        soup = BeautifulSoup(html, 'html.parser')
+
+        mount_found = False
+        has_mount = False
+
+        # Look for the Equipment section
+        equipment_header = soup.find('span', {'id': 'Equipment'})
+        if equipment_header:
+            equipment_section = equipment_header.find_parent(['h2', 'h3'])
+            if equipment_section:
+                equipment_table = equipment_section.find_next('table')
+                if equipment_table:
+                    # Find the Mount row
+                    for row in equipment_table.find_all('tr'):
+                        cells = row.find_all(['th', 'td'])
+                        if len(cells) >= 2:
+                            header = cells[0].get_text(strip=True).lower()
+                            value = cells[1].get_text(strip=True)
+
+                            if header == 'mount':
+                                # Check if mount value is N/A or ? or empty
+                                if value.upper() == 'N/A':
+                                    return False
+                                elif value == '?' or not value:
+                                    has_mount = False
+                                else:
+                                    return True
+                                break
+
+        # Fallback: check for mounted keywords in name (used when no Equipment table or Mount row)
+        name_lower = troop_name.lower()
+        mounted_keywords = ['cavalry', 'horseman', 'horse archer', 'lancer', 'knight',
+                          'cataphract', 'faris', 'mameluke', 'equite', 'bucellarii',
+                          'druzhinnik', 'kheshig', 'darkhan', 'mounted']
+
+        if any(keyword in name_lower for keyword in mounted_keywords):
+            return True
+
+        # Default to not mounted if we can't determine
+        return False
+
+
+def parse_once(scraper: BannerlordTroopScraper, html: str):
+    """Return (troop record, [(item_id, slot)]) from either implementation"""
+    if isinstance(scraper, LegacyTroopParser):
+        scraper.equipment_data = []
+        troop = scraper.parse_troop_page(html, 'Aserai Recruit', 'Aserai', 1, set())
+        return troop, [(item_id, slot) for _, item_id, slot in scraper.equipment_data]
+    return scraper.parse_troop_page(html, 'Aserai Recruit', 'Aserai', set())
+
+
+def compare_output(before_troop: Dict, before_links: list, after_troop: Dict, after_links: list) -> str:
+    """Describe how the new output relates to the old one"""
+    if after_troop != before_troop or not set(before_links) <= set(after_links):
+        return "OUTPUT DIFFERS"
+    if after_links == before_links:
+        return "same output"
+    # The item resolver maps near-miss names that the old exact lookup dropped
+    return f"same output plus {len(after_links) - len(before_links)} resolved links"
+
+
+def time_parse(scraper: BannerlordTroopScraper, html: str, iterations: int):
+    """Return (ms per page, troop record, equipment links) for parse_troop_page"""
+    troop, links = parse_once(scraper, html)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse_once(scraper, html)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / iterations * 1000, troop, links
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS
+
+    with open(FIXTURE_HTML, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    legacy = LegacyTroopParser()
+    current = BannerlordTroopScraper()
+
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        print("lxml not installed; only benchmarking html.parser")
+
+    print(f"\nParsing {FIXTURE_HTML} ({len(html)} bytes), {iterations} iterations")
+    print("-" * 60)
+
+    before_ms, before_troop, before_links = time_parse(legacy, html, iterations)
+    print(f"  {'before (3 soups, html.parser)':36} {before_ms:8.3f} ms/page")
+
+    for backend in backends:
+        run_scraper_improved.HTML_PARSER = backend
+        after_ms, after_troop, after_links = time_parse(current, html, iterations)
+        print(f"  {'after (single pass, ' + backend + ')':36} {after_ms:8.3f} ms/page  "
+              f"x{before_ms / after_ms:.1f}  {compare_output(before_troop, before_links, after_troop, after_links)}")
+
+
+if __name__ == "__main__":
+    main()
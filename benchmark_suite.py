@@ -0,0 +1,593 @@
+# benchmark_suite.py
+"""Offline benchmark suite for the scraper's hot paths.
+
+Runs parse_troop_page, extract_equipment, is_troop_mounted,
+build_upgrade_paths, generate_sql and create_map against a corpus on disk,
+reporting throughput, p50/p99 latency and peak memory. A corpus is a
+directory with gzipped troop pages, troop trees and an items/ folder.
+Corpora are either recorded from the page cache or synthesized at any
+scale. Every benchmark runs several timed rounds and reports the best
+round, along with how much the rounds spread. A run can be saved as a
+baseline, and later runs print their differences from it, only flagging
+changes larger than the measured noise.
+
+Usage:
+  python benchmark_suite.py generate --size 10k          (or --troops N)
+  python benchmark_suite.py record                       (pages from page_cache.sqlite)
+  python benchmark_suite.py run bench_corpus/10k [--save-baseline] [--only parse_troop_page,...] [--rounds N]
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import run_scraper_improved
+from create_item_map_enhanced import create_map
+from metrics import percentile
+from page_cache import PAGE_CACHE_DB
+from run_scraper_improved import BannerlordTroopScraper
+from sql_writer import SqlWriter
+from troop_store import EquipmentLinks, TroopStore
+
+# --- Configuration ---
+BENCH_CORPUS_DIR = 'bench_corpus'
+CORPUS_SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+ITEMS_PER_TROOP = 2           # Synthetic item rows per troop page (the real wiki has about ten)
+BENCH_ROUNDS = 5              # Timed passes over the corpus for the per-page benchmarks
+WHOLE_RUN_REPEAT = 7          # Timed runs of the whole-corpus benchmarks (create_map, generate_sql, ...)
+MEMORY_SAMPLE = 500           # Per-page calls traced for peak memory; tracing is too slow for every call
+REGRESSION_THRESHOLD = 0.10   # Smallest relative change from the baseline flagged as a regression
+NOISE_FACTOR = 2.0            # ...raised to this many times the rounds' relative interquartile range
+LATENCY_MIN_SAMPLES = 100     # Calls per round below which p50/p99 are reported but not compared
+MEMORY_FLOOR_MB = 0.5         # Peak memory changes smaller than this are never regressions
+# --- End Configuration ---
+
+PAGES_FILE = 'pages.jsonl.gz'
+TREES_FILE = 'troop_trees.json'
+CORPUS_META = 'corpus.json'
+BASELINE_FILE = 'baseline.json'
+FIXTURE_HTML = 'debug_troop.html'
+
+BENCHMARKS = ['create_map', 'parse_troop_page', 'extract_equipment', 'is_troop_mounted',
+              'build_upgrade_paths', 'generate_sql']
+
+FACTIONS = {'Aserai': 'Aserai', 'Battania': 'Battanian', 'Empire': 'Imperial',
+            'Khuzait': 'Khuzait', 'Sturgia': 'Sturgian', 'Vlandia': 'Vlandian'}
+TIER_WORDS = ['one', 'two', 'three', 'four', 'five', 'six']
+TROOP_ROLES = ['Recruit', 'Footman', 'Infantry', 'Spearman', 'Archer', 'Skirmisher', 'Horseman',
+               'Cavalry', 'Lancer', 'Horse Archer', 'Veteran', 'Guard', 'Champion', 'Knight']
+
+# Item CSV -> (slot group used on troop pages, name word lists)
+ITEM_FILES = {
+    'armors.csv': ('armor', ['Padded', 'Studded', 'Scale', 'Quilted', 'Fur', 'Lamellar', 'Mail', 'Leather'],
+                   ['Tunic', 'Boots', 'Helmet', 'Bracers', 'Cloak', 'Coat', 'Greaves', 'Cap', 'Hood', 'Vest']),
+    'melee_weapons.csv': ('weapon', ['Iron', 'Steel', 'Jagged', 'Heavy', 'Fine', 'Broad', 'Long', 'Curved'],
+                          ['Spear', 'Sword', 'Axe', 'Mace', 'Glaive', 'Falchion', 'Pike', 'Hammer']),
+    'ranged_weapons.csv': ('weapon', ['Hunting', 'Composite', 'Recurve', 'Light', 'Heavy', 'Horn'],
+                           ['Bow', 'Crossbow', 'Javelins', 'Arrows', 'Bolts', 'Throwing Axes']),
+    'shields.csv': ('shield', ['Round', 'Kite', 'Heater', 'Oval', 'Hide Covered', 'Painted'],
+                    ['Shield', 'Buckler', 'Pavise', 'Targe']),
+    'mounts.csv': ('horse', ['Desert', 'Steppe', 'Northern', 'Highland', 'Imperial', 'Sumpter'],
+                   ['Horse', 'Charger', 'Courser', 'Camel', 'Pony']),
+}
+NAME_QUALIFIERS = ['Red', 'Blue', 'Black', 'Worn', 'Ornate', 'Plain', 'Noble', 'Tribal', 'Old', 'Decorated']
+
+# Equipment table rows: (row header, slot group, most items listed)
+EQUIPMENT_ROWS = [('Weapons', 'weapon', 3), ('Shield', 'shield', 1), ('Head Armor', 'armor', 2),
+                  ('Shoulder Armor', 'armor', 1), ('Body Armor', 'armor', 3), ('Hand Armor', 'armor', 1),
+                  ('Leg Armor', 'armor', 1), ('Foot Armor', 'armor', 2), ('Mount', 'horse', 1),
+                  ('Mount Harness', 'armor', 1)]
+
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    """create_map and the scraper use paths relative to the current directory"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def quiet(fn: Callable, *args, **kwargs):
+    """Call fn with its progress output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Corpus generation
+# ---------------------------------------------------------------------------
+
+def synthesize_items(rng: random.Random, total: int, items_dir: str) -> Dict[str, List[str]]:
+    """Write item CSVs with `total` rows in the real files' proportions; returns names per slot group.
+
+    Every synthetic row copies a random real row of the same file (so stat
+    columns look real) and replaces its id and name.
+    """
+    real_rows = {}
+    for filename in ['items.csv'] + list(ITEM_FILES):
+        with open(os.path.join('items', filename), 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            real_rows[filename] = (next(reader), list(reader))
+
+    os.makedirs(items_dir, exist_ok=True)
+    for filename in ('items_types_ids.csv', 'culture_types_ids.csv'):
+        shutil.copy(os.path.join('items', filename), os.path.join(items_dir, filename))
+
+    real_total = sum(len(real_rows[filename][1]) for filename in ITEM_FILES)
+    items_header, items_rows = real_rows['items.csv']
+    type_of_file = {'melee_weapons.csv': 1, 'ranged_weapons.csv': 2, 'armors.csv': 3,
+                    'shields.csv': 4, 'mounts.csv': 5}
+    names_by_group = {}
+    used_names = set()
+    all_items = []
+
+    for filename, (group, adjectives, bases) in ITEM_FILES.items():
+        header, rows = real_rows[filename]
+        id_col, name_col = 0, 3 if filename != 'shields.csv' else 2
+        count = max(1, round(total * len(rows) / real_total))
+        synthetic = []
+        for number in range(1, count + 1):
+            name = f"{rng.choice(NAME_QUALIFIERS)} {rng.choice(adjectives)} {rng.choice(bases)}"
+            suffix = 2
+            while name in used_names:
+                name = f"{name.rsplit(' #', 1)[0]} #{suffix}"
+                suffix += 1
+            used_names.add(name)
+            names_by_group.setdefault(group, []).append(name)
+
+            row = list(rng.choice(rows))
+            row[id_col], row[name_col] = f"{number:03d}", name
+            synthetic.append(row)
+            all_items.append((type_of_file[filename], row[1], name))
+
+        with open(os.path.join(items_dir, filename), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(synthetic)
+
+    with open(os.path.join(items_dir, 'items.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(items_header)
+        for item_id, (type_id, culture_id, name) in enumerate(all_items, 1):
+            template = rng.choice(items_rows)
+            writer.writerow([f"{item_id:04d}", type_id, culture_id, name] + template[4:])
+
+    return names_by_group
+
+
+def misspell(rng: random.Random, name: str) -> str:
+    """Swap two neighbouring letters, like the wiki's typos"""
+    position = rng.randrange(1, max(2, len(name) - 2))
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+def synthesize_equipment_cell(rng: random.Random, names: List[str], most: int) -> str:
+    roll = rng.random()
+    if roll < 0.15:
+        return '?'
+    if roll < 0.25:
+        return 'N/A'
+
+    listed = []
+    for _ in range(rng.randint(1, most)):
+        name = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.05:
+            name = misspell(rng, name)
+        elif roll < 0.08:
+            name = f"Unlisted Heirloom {rng.randint(1, 999)}"
+        if rng.random() < 0.05:
+            name = f"<i>(Possible)</i> {name}"
+        listed.append(name)
+    return '<br />'.join(listed)
+
+
+def synthesize_page(rng: random.Random, title: str, culture: str, tier: int,
+                    names_by_group: Dict[str, List[str]]) -> str:
+    """Troop page HTML shaped like the wiki's rendered output"""
+    rows = []
+    for header, group, most in EQUIPMENT_ROWS:
+        if header == 'Mount' and 'Horse' not in title and 'Cavalry' not in title and 'Knight' not in title \
+                and 'Lancer' not in title:
+            cell = 'N/A'
+        else:
+            cell = synthesize_equipment_cell(rng, names_by_group[group], most)
+        rows.append(f"<tr>\n<th>{header}\n</th>\n<td>{cell}\n</td></tr>")
+    skills = ''.join(f"<tr>\n<th>{skill}\n</th>\n<td>{rng.randint(0, 200)}\n</td></tr>"
+                     for skill in ['One Handed', 'Two Handed', 'Polearm', 'Bow', 'Crossbow',
+                                   'Throwing', 'Riding', 'Athletics'])
+    trivia = ' '.join(f"{title} {rng.choice(['fights', 'marches', 'trains', 'guards'])} "
+                      f"with the {culture} host." for _ in range(rng.randint(5, 40)))
+
+    return (
+        '<div class="mw-parser-output"><aside role="region" class="portable-infobox">'
+        f'<h2 class="pi-item pi-title" data-source="Box title">{title}</h2>'
+        '<div class="pi-item pi-data" data-source="Culture"><h3 class="pi-data-label">Culture</h3>'
+        f'<div class="pi-data-value"><a href="/wiki/{culture}" title="{culture}">{culture}</a></div></div>'
+        '<div class="pi-item pi-data" data-source="Wages"><h3 class="pi-data-label">Wages</h3>'
+        f'<div class="pi-data-value">{2 + tier * 3} denars/day</div></div></aside>\n'
+        f'<p>The <b>{title}</b> are tier-{TIER_WORDS[tier - 1]} troops of the {culture}.</p>\n'
+        '<h2><span class="mw-headline" id="Skills">Skills</span></h2>\n'
+        f'<table class="article-table"><tbody>{skills}</tbody></table>\n'
+        '<h2><span class="mw-headline" id="Equipment">Equipment</span></h2>\n'
+        '<dl><dd><i>Troops may spawn with these items in battle.</i></dd></dl>\n'
+        f'<table class="article-table">\n<tbody>{"".join(rows)}</tbody></table>\n'
+        '<h2><span class="mw-headline" id="Trivia">Trivia</span></h2>\n'
+        f'<p>{trivia}</p></div>'
+    )
+
+
+def generate_corpus(output_dir: str, troops: int, seed: int = 0):
+    """Synthesize `troops` troop pages, their troop trees and item CSVs of matching size"""
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    names_by_group = synthesize_items(rng, troops * ITEMS_PER_TROOP, os.path.join(output_dir, 'items'))
+
+    # Trees of up to six troops: a recruit, two branches and their upgrades
+    troop_trees = {faction: {'common': [], 'noble': []} for faction in FACTIONS}
+    factions = list(FACTIONS)
+    with gzip.open(os.path.join(output_dir, PAGES_FILE), 'wt', encoding='utf-8') as f:
+        number = 0
+        while number < troops:
+            faction = factions[(number // 6) % len(factions)]
+            culture = FACTIONS[faction]
+            size = min(6, troops - number)
+            tree = []
+            for position in range(size):
+                role = rng.choice(TROOP_ROLES)
+                tree.append(f"{culture} {role} {number + position + 1}")
+            tiers = [1, 2, 3, 2, 3, 4][:size]
+
+            tree_type = 'noble' if rng.random() < 0.2 else 'common'
+            branches = [tree[:3], [tree[0]] + tree[3:]] if size > 3 else [tree]
+            troop_trees[faction][tree_type].extend(branch for branch in branches if len(branch) > 1)
+
+            for title, tier in zip(tree, tiers):
+                page = {'title': title, 'faction': faction,
+                        'html': synthesize_page(rng, title, culture, tier, names_by_group)}
+                f.write(json.dumps(page) + '\n')
+            number += size
+
+    with open(os.path.join(output_dir, TREES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(troop_trees, f)
+    with open(os.path.join(output_dir, CORPUS_META), 'w', encoding='utf-8') as f:
+        json.dump({'kind': 'synthetic', 'troops': troops, 'items': troops * ITEMS_PER_TROOP,
+                   'seed': seed, 'created': time.time()}, f, indent=2)
+
+
+def record_corpus(output_dir: str, cache_path: str = PAGE_CACHE_DB):
+    """Build a corpus from pages in the page cache (plus debug_troop.html) and the real items/ folder"""
+    scraper = quiet(BannerlordTroopScraper, parse_workers=0)
+    faction_of = {troop_name: faction
+                  for faction, trees in scraper.troop_trees.items()
+                  for paths in trees.values() for path in paths for troop_name in path}
+
+    pages = {}
+    if os.path.exists(cache_path):
+        # Read the cache table directly; the latest rendered revision of each title
+        conn = sqlite3.connect(cache_path)
+        for title, html in conn.execute(
+                "SELECT title, html FROM pages WHERE html != '' ORDER BY title, revid"):
+            pages[title] = html
+        conn.close()
+    if not pages and os.path.exists(FIXTURE_HTML):
+        with open(FIXTURE_HTML, 'r', encoding='utf-8') as f:
+            pages['Aserai Recruit'] = f.read()
+    if not pages:
+        raise RuntimeError(f"No pages to record: {cache_path} is empty and {FIXTURE_HTML} is missing")
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.copytree('items', os.path.join(output_dir, 'items'), dirs_exist_ok=True)
+    with gzip.open(os.path.join(output_dir, PAGES_FILE), 'wt', encoding='utf-8') as f:
+        for title, html in pages.items():
+            f.write(json.dumps({'title': title, 'faction': faction_of.get(title, 'Aserai'), 'html': html}) + '\n')
+    with open(os.path.join(output_dir, TREES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(scraper.troop_trees, f)
+    with open(os.path.join(output_dir, CORPUS_META), 'w', encoding='utf-8') as f:
+        json.dump({'kind': 'recorded', 'troops': len(pages), 'source': cache_path, 'created': time.time()},
+                  f, indent=2)
+    return len(pages)
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+class CorpusScraper(BannerlordTroopScraper):
+    """Keeps each page's equipment rows, so the lookup benchmarks can reuse them without re-parsing"""
+
+    def read_equipment_table(self, soup):
+        self.last_rows = super().read_equipment_table(soup)
+        return self.last_rows
+
+
+def read_pages(corpus_dir: str) -> Iterator[Dict]:
+    with gzip.open(os.path.join(corpus_dir, PAGES_FILE), 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def relative_spread(values: List[float]) -> float:
+    """Interquartile range of values relative to their median"""
+    ordered = sorted(values)
+    middle = percentile(ordered, 0.50)
+    return (percentile(ordered, 0.75) - percentile(ordered, 0.25)) / middle if middle else 0.0
+
+
+def summarize(rounds: List[Tuple[List[float], float]], peak_bytes: int) -> Dict:
+    """Best round's value of each metric over the (call latencies, seconds) rounds, with the rounds' spread.
+
+    The fastest round is the one least disturbed by the rest of the machine, so
+    it is what moves when the code itself gets slower; the spread (relative
+    interquartile range across rounds) says how noisy the machine was.
+    """
+    per_round = {'seconds': [], 'ops_per_second': [], 'p50_ms': [], 'p99_ms': []}
+    for latencies, seconds in rounds:
+        ordered = sorted(latencies)
+        per_round['seconds'].append(seconds)
+        per_round['ops_per_second'].append(len(ordered) / seconds if seconds else 0.0)
+        per_round['p50_ms'].append(percentile(ordered, 0.50) * 1000)
+        per_round['p99_ms'].append(percentile(ordered, 0.99) * 1000)
+
+    result = {'ops': len(rounds[0][0]), 'rounds': len(rounds)}
+    for metric, values in per_round.items():
+        result[metric] = round(max(values) if metric == 'ops_per_second' else min(values), 4)
+    result['peak_mb'] = round(peak_bytes / 2**20, 2)
+    result['spread'] = {metric: round(relative_spread(values), 4)
+                        for metric, values in per_round.items() if metric != 'seconds'}
+    return result
+
+
+def time_round(calls: List[Callable]) -> Tuple[List[float], float]:
+    latencies = []
+    started = time.perf_counter()
+    for call in calls:
+        begin = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - begin)
+    return latencies, time.perf_counter() - started
+
+
+def bench_each(calls: List[Callable], rounds: int = BENCH_ROUNDS) -> Dict:
+    """Time every call in `rounds` passes, then trace memory over a sample of them"""
+    timed_rounds = [time_round(calls) for _ in range(max(1, rounds))]
+
+    tracemalloc.start()
+    for call in calls[:MEMORY_SAMPLE]:
+        call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(timed_rounds, peak)
+
+
+def bench_whole(call: Callable, repeat: int = WHOLE_RUN_REPEAT) -> Dict:
+    """Time a whole-corpus call `repeat` times, one call per round"""
+    return bench_each([call], rounds=repeat)
+
+
+def run_suite(corpus_dir: str, only: List[str] = None, rounds: int = BENCH_ROUNDS) -> Tuple[Dict, Dict]:
+    """Run the benchmarks on a corpus; returns (corpus metadata, results per benchmark)"""
+    corpus_dir = os.path.abspath(corpus_dir)
+    with open(os.path.join(corpus_dir, CORPUS_META), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    wanted = set(only or BENCHMARKS)
+    results = {}
+
+    with working_directory(corpus_dir):
+        if 'create_map' in wanted:
+            results['create_map'] = bench_whole(lambda: quiet(create_map, force=True))
+        else:
+            quiet(create_map)
+
+        scraper = quiet(CorpusScraper, parse_workers=0)
+        with open(TREES_FILE, 'r', encoding='utf-8') as f:
+            scraper.troop_trees = json.load(f)
+
+        # Parse every page once (the first timed round, if asked for); the results feed the other benchmarks
+        pages = []
+        latencies = []
+        started = time.perf_counter()
+        for page in read_pages(corpus_dir):
+            begin = time.perf_counter()
+            troop, links = scraper.parse_troop_page(page['html'], page['title'], page['faction'], set(), {})
+            latencies.append(time.perf_counter() - begin)
+            pages.append((troop, links, scraper.last_rows, page['faction']))
+        total = time.perf_counter() - started
+        if 'parse_troop_page' in wanted:
+            # Pages are streamed from the corpus each round, so the HTML is never all in memory at once
+            parse_rounds = [(latencies, total)]
+            for _ in range(rounds - 1):
+                parse_rounds.append(time_round([
+                    lambda page=page: scraper.parse_troop_page(page['html'], page['title'], page['faction'],
+                                                               set(), {})
+                    for page in read_pages(corpus_dir)
+                ]))
+            sample = []
+            for page in read_pages(corpus_dir):
+                if len(sample) >= MEMORY_SAMPLE:
+                    break
+                sample.append(page)
+            tracemalloc.start()
+            for page in sample:
+                scraper.parse_troop_page(page['html'], page['title'], page['faction'], set(), {})
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results['parse_troop_page'] = summarize(parse_rounds, peak)
+
+        if 'extract_equipment' in wanted:
+            results['extract_equipment'] = bench_each([
+                lambda rows=rows: scraper.extract_equipment(None, set(), rows, {}) for _, _, rows, _ in pages
+            ], rounds)
+        if 'is_troop_mounted' in wanted:
+            results['is_troop_mounted'] = bench_each([
+                lambda troop=troop, rows=rows: scraper.is_troop_mounted(troop['name'], equipment_rows=rows)
+                for troop, _, rows, _ in pages
+            ], rounds)
+
+        cultures = {}
+        troops, equipment = TroopStore(), EquipmentLinks()
+        for troop_id, (troop, links, _, faction) in enumerate(pages, 1):
+            culture_id = cultures.setdefault(FACTIONS.get(faction, faction), len(cultures) + 1)
+            troops.add(troop, troop_id, culture_id)
+            equipment.add_troop(troop_id, links)
+
+        if 'build_upgrade_paths' in wanted:
+            results['build_upgrade_paths'] = bench_whole(lambda: scraper.build_upgrade_paths(troops))
+
+        if 'generate_sql' in wanted:
+            graph = scraper.build_upgrade_graph(troops)
+            data = {'troops': troops, 'cultures': cultures, 'equipment': equipment,
+                    'upgrade_paths': scraper.build_upgrade_paths(troops, graph),
+                    'upgrade_closure': scraper.build_upgrade_closure(troops, graph)}
+
+            def generate_sql():
+                with SqlWriter('bench_output.sql') as writer:
+                    scraper.generate_sql(data, writer)
+            results['generate_sql'] = bench_whole(generate_sql)
+            os.remove('bench_output.sql')
+
+    return meta, results
+
+
+def environment() -> Dict:
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'html_parser': run_scraper_improved.HTML_PARSER}
+
+
+def regression_threshold(metric: str, result: Dict, before: Dict) -> float:
+    """Relative change that counts as a regression: REGRESSION_THRESHOLD, or more where the rounds were noisy"""
+    noise = max(result.get('spread', {}).get(metric, 0.0), before.get('spread', {}).get(metric, 0.0))
+    return max(REGRESSION_THRESHOLD, NOISE_FACTOR * noise)
+
+
+def compare(results: Dict, baseline: Dict) -> int:
+    """Print each metric's change from the baseline; returns the number of regressions"""
+    regressions = 0
+    print(f"\nCompared with baseline from {time.ctime(baseline['saved'])}:")
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            print(f"  {name:20} (not in baseline)")
+            continue
+        changes = []
+        for metric, higher_is_better in (('ops_per_second', True), ('p50_ms', False),
+                                         ('p99_ms', False), ('peak_mb', False)):
+            if not before[metric]:
+                continue
+            change = (result[metric] - before[metric]) / before[metric]
+            worse = -change if higher_is_better else change
+            threshold = regression_threshold(metric, result, before)
+            if metric == 'peak_mb':
+                compared = abs(result[metric] - before[metric]) >= MEMORY_FLOOR_MB
+            elif metric in ('p50_ms', 'p99_ms'):
+                # A percentile of a handful of calls is just one noisy sample
+                compared = result['ops'] >= LATENCY_MIN_SAMPLES
+            else:
+                compared = True
+            flag = ' REGRESSION' if compared and worse > threshold else ''
+            regressions += bool(flag)
+            noise = f" (±{threshold:.0%})" if compared and threshold > REGRESSION_THRESHOLD else ''
+            changes.append(f"{metric} {change:+.1%}{noise}{flag}")
+        print(f"  {name:20} " + ', '.join(changes))
+    return regressions
+
+
+def print_results(meta: Dict, results: Dict):
+    print(f"\n{meta['kind']} corpus, {meta['troops']} troop pages "
+          f"({run_scraper_improved.HTML_PARSER} parser)")
+    print("Best of the timed rounds; 'spread' is the rounds' interquartile range in ops/s")
+    print("-" * 95)
+    print(f"  {'benchmark':20} {'ops':>8} {'rounds':>6} {'seconds':>9} {'ops/s':>11} {'spread':>7} "
+          f"{'p50 ms':>9} {'p99 ms':>9} {'peak MB':>9}")
+    for name, result in results.items():
+        print(f"  {name:20} {result['ops']:>8} {result['rounds']:>6} {result['seconds']:>9.3f} "
+              f"{result['ops_per_second']:>11.1f} {result['spread']['ops_per_second']:>7.1%} "
+              f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['peak_mb']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the scraper's hot paths")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="Synthesize a scaled troop page corpus")
+    size = generate.add_mutually_exclusive_group()
+    size.add_argument('--size', choices=list(CORPUS_SIZES), default='1k',
+                      help="Corpus size (default: 1k)")
+    size.add_argument('--troops', type=int, help="Exact number of troop pages")
+    generate.add_argument('--output', help=f"Corpus directory (default: {BENCH_CORPUS_DIR}/<size>)")
+    generate.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+
+    record = subparsers.add_parser('record', help="Build a corpus from the pages in the page cache")
+    record.add_argument('--cache-path', default=PAGE_CACHE_DB, help=f"Page cache database (default: {PAGE_CACHE_DB})")
+    record.add_argument('--output', default=os.path.join(BENCH_CORPUS_DIR, 'recorded'),
+                        help=f"Corpus directory (default: {BENCH_CORPUS_DIR}/recorded)")
+
+    run = subparsers.add_parser('run', help="Run the benchmarks on a corpus")
+    run.add_argument('corpus', help="Corpus directory")
+    run.add_argument('--only', help=f"Comma-separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    run.add_argument('--baseline', help=f"Baseline file (default: <corpus>/{BASELINE_FILE})")
+    run.add_argument('--save-baseline', action='store_true', help="Save this run as the new baseline")
+    run.add_argument('--rounds', type=int, default=BENCH_ROUNDS,
+                     help=f"Timed passes for the per-page benchmarks (default: {BENCH_ROUNDS}); "
+                          f"the whole-corpus ones run {WHOLE_RUN_REPEAT} times")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        troops = args.troops or CORPUS_SIZES[args.size]
+        output = args.output or os.path.join(BENCH_CORPUS_DIR, args.size if not args.troops else str(troops))
+        started = time.perf_counter()
+        generate_corpus(output, troops, args.seed)
+        print(f"✓ Generated {troops} troop pages and {troops * ITEMS_PER_TROOP} items in '{output}' "
+              f"({time.perf_counter() - started:.1f}s)")
+        return
+
+    if args.command == 'record':
+        count = record_corpus(args.output, args.cache_path)
+        print(f"✓ Recorded {count} troop pages in '{args.output}'")
+        return
+
+    only = args.only.split(',') if args.only else None
+    unknown = set(only or []) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    meta, results = run_suite(args.corpus, only, max(1, args.rounds))
+    print_results(meta, results)
+
+    baseline_path = args.baseline or os.path.join(args.corpus, BASELINE_FILE)
+    regressions = 0
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['environment'] != environment():
+            print(f"\nNote: baseline was recorded on {baseline['environment']}")
+        regressions = compare(results, baseline)
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({'saved': time.time(), 'corpus': meta, 'environment': environment(),
+                       'results': results}, f, indent=2)
+        print(f"\n✓ Baseline saved as '{baseline_path}'")
+
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed by more than {REGRESSION_THRESHOLD:.0%} "
+              f"(or their measured noise, if larger)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# columnar_export.py
+"""Typed Parquet / Arrow IPC export of the scraped troops and the item stat tables.
+
+Each table is written with explicit Arrow types and dictionary-encoded text
+columns (slots, cultures, item types, materials...), so analytics jobs can
+memory-map the files and read only the columns they need instead of
+re-parsing JSON and CSV with type inference. pyarrow is optional and only
+needed for this export.
+"""
+import os
+from typing import Dict, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+# --- Configuration ---
+COLUMNAR_OUTPUT_DIR = 'columnar'
+PARQUET_COMPRESSION = 'zstd'
+DICTIONARY_MAX_RATIO = 0.5   # Text columns with fewer distinct values than this share of rows are dictionary-encoded
+# --- End Configuration ---
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def troop_tables(data: Dict) -> Dict[str, 'pa.Table']:
+    """Arrow tables for the troops, cultures, upgrade paths and closure, and equipment junction"""
+    troops = data['troops']
+    culture_names = {culture_id: name for name, culture_id in data['cultures'].items()}
+    troop_ids, item_ids, slot_codes = data['equipment'].columns()
+    culture_codes = {culture_id: code for code, culture_id in enumerate(culture_names)}
+
+    return {
+        # Straight from the store's typed columns; no per-troop dicts are built
+        'troops': pa.table({
+            'troop_id': pa.array(troops.troop_ids, pa.int32()),
+            'name': pa.array(troops.names, pa.string()),
+            'tier': pa.array(troops.tiers, pa.int8()),
+            'wage': pa.array(troops.wages, pa.int32()),
+            'is_mounted': pa.array(troops.mounted, pa.uint8()).cast(pa.bool_()),
+            'culture_id': pa.array(troops.culture_ids, pa.int16()),
+            'culture': pa.DictionaryArray.from_arrays(
+                pa.array([culture_codes.get(culture_id) for culture_id in troops.culture_ids], pa.int32()),
+                pa.array(list(culture_names.values()), pa.string())),
+        }),
+        'cultures': pa.table({
+            'culture_id': pa.array(list(culture_names), pa.int16()),
+            'name': pa.array(list(culture_names.values()), pa.string()),
+        }),
+        'upgrade_paths': pa.table({
+            'base_troop_id': pa.array([path['base_troop_id'] for path in data['upgrade_paths']], pa.int32()),
+            'upgraded_troop_id': pa.array([path['upgraded_troop_id'] for path in data['upgrade_paths']], pa.int32()),
+            'xp_cost': pa.array([path['xp_cost'] for path in data['upgrade_paths']], pa.int32()),
+        }),
+        'upgrade_closure': pa.table({
+            'ancestor_troop_id': pa.array([row['ancestor_troop_id'] for row in data['upgrade_closure']], pa.int32()),
+            'descendant_troop_id': pa.array([row['descendant_troop_id'] for row in data['upgrade_closure']],
+                                            pa.int32()),
+            'distance': pa.array([row['distance'] for row in data['upgrade_closure']], pa.int8()),
+        }),
+        'equipment': pa.table({
+            'troop_id': pa.array(troop_ids, pa.int32()),
+            'item_id': pa.array(item_ids, pa.int32()),
+            'slot': pa.DictionaryArray.from_arrays(pa.array(slot_codes, pa.int8()),
+                                                   pa.array(data['equipment'].slots, pa.string())),
+        }),
+    }
+
+
+def item_tables() -> Dict[str, 'pa.Table']:
+    """Arrow tables for every item CSV, typed the same way as the SQL export"""
+    # Imported here because generate_items_sql loads pandas
+    from generate_items_sql import EXPORT_TABLES, SOURCE_FOLDER, read_table
+
+    tables = {}
+    for filename in EXPORT_TABLES:
+        if not os.path.exists(os.path.join(SOURCE_FOLDER, filename)):
+            continue
+        table_name, df = read_table(filename)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tables[table_name.lower()] = compact_types(table)
+    return tables
+
+
+def compact_types(table: 'pa.Table') -> 'pa.Table':
+    """Narrow int64 columns that fit in int32 and dictionary-encode repetitive text.
+
+    Names and other mostly-unique text stay plain strings.
+    """
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        if pa.types.is_int64(field.type):
+            low, high = pc.min_max(column).values()
+            if low.as_py() is None or (-2 ** 31 <= low.as_py() and high.as_py() < 2 ** 31):
+                table = table.set_column(index, field.name, column.cast(pa.int32()))
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            column = column.cast(pa.string())
+            if table.num_rows and len(column.unique()) < DICTIONARY_MAX_RATIO * table.num_rows:
+                column = column.dictionary_encode()
+            table = table.set_column(index, field.name, column)
+    return table.replace_schema_metadata(None)
+
+
+def write_table(table: 'pa.Table', path: str, file_format: str):
+    if file_format == 'parquet':
+        pq.write_table(table, path, compression=PARQUET_COMPRESSION, use_dictionary=True)
+    else:
+        # Uncompressed IPC files can be memory-mapped without copying
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def export_columnar(data: Dict, output_dir: str = COLUMNAR_OUTPUT_DIR,
+                    file_format: str = 'parquet') -> List[str]:
+    """Write troop and item tables to output_dir; returns the written paths"""
+    if not HAVE_PYARROW:
+        raise RuntimeError("The columnar export needs pyarrow (pip install pyarrow)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, table in {**troop_tables(data), **item_tables()}.items():
+        path = os.path.join(output_dir, name + FORMATS[file_format])
+        write_table(table, path, file_format)
+        paths.append(path)
+    return paths
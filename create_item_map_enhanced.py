@@ -1,11 +1,17 @@
-import pandas as pd
+import argparse
+import csv
 import json
 import os
 from difflib import get_close_matches
 
+from item_map_binary import ITEM_MAP_BIN, write_item_map_binary
+from item_search import ItemSearchIndex, SEARCH_INDEX_DB, build_search_index, file_sha256
+
 # Use project directory for CSV files
 SOURCE_FOLDER = 'items'
 OUTPUT_JSON = 'item_map.json'
+REVERSE_JSON = 'item_map_reverse.json'
+BUILD_CACHE_JSON = 'item_map_build_cache.json'  # Per-file content hashes and rows from the last build
 
 # --- Configuration: All files to read ---
 FILES_TO_PROCESS = {
@@ -24,63 +30,193 @@ def find_fuzzy_match(item_name, item_map, cutoff=0.8):
     matches = get_close_matches(item_name, item_map.keys(), n=1, cutoff=cutoff)
     return matches[0] if matches else None
 
-def create_map():
+def file_digest(filepath):
+    """sha256 of a source file, or None if it does not exist"""
+    return file_sha256(filepath) if os.path.exists(filepath) else None
+
+def load_build_cache():
+    if not os.path.exists(BUILD_CACHE_JSON):
+        return {}
+    try:
+        with open(BUILD_CACHE_JSON, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable {BUILD_CACHE_JSON}: {e}")
+        return {}
+
+def save_build_cache(cache):
+    tmp_path = f"{BUILD_CACHE_JSON}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, BUILD_CACHE_JSON)
+
+def load_item_types(pd=None):
+    """Read items_types_ids.csv as {type id: slot name}"""
+    if pd is not None:
+        df_types = pd.read_csv(ITEM_TYPES_FILE, dtype={'Item_Type_ID': 'int64', 'Item_Type_Name': 'string'})
+        return dict(zip(df_types['Item_Type_ID'].tolist(), df_types['Item_Type_Name'].tolist()))
+    
+    with open(ITEM_TYPES_FILE, 'r', encoding='utf-8', newline='') as f:
+        return {int(row['Item_Type_ID']): row['Item_Type_Name'] for row in csv.DictReader(f)}
+
+def read_item_rows_pandas(pd, filepath, default_slot, id_col, name_col, type_id_to_slot_name):
+    """Read one item CSV into a (name, id, slot) frame with slots resolved column-wise"""
+    dtypes = {id_col: 'int64', name_col: 'string', 'Item_Type_ID': 'Int64', 'Item_Type': 'string'}
+    header = pd.read_csv(filepath, nrows=0).columns
+    if id_col not in header or name_col not in header:
+        return None
+    
+    df = pd.read_csv(filepath, usecols=[col for col in dtypes if col in header],
+                     dtype={col: dtype for col, dtype in dtypes.items() if col in header})
+    
+    if 'Item_Type_ID' in df.columns:
+        slots = df['Item_Type_ID'].map(type_id_to_slot_name).astype('string').fillna(default_slot)
+    elif 'Item_Type' in df.columns:
+        type_names = df['Item_Type'].str.lower().str.replace(' ', '_', regex=False)
+        slots = type_names.where(type_names.isin(set(type_id_to_slot_name.values())), default_slot)
+    else:
+        slots = default_slot
+    
+    rows = pd.DataFrame({'name': df[name_col].str.strip(), 'id': df[id_col], 'slot': slots})
+    return rows.drop_duplicates(subset='name', keep='first')
+
+def read_item_rows_csv(filepath, default_slot, id_col, name_col, type_id_to_slot_name):
+    """Pandas-free equivalent of read_item_rows_pandas, returning [name, id, slot] lists"""
+    slot_names = set(type_id_to_slot_name.values())
+    rows = []
+    seen = set()
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if id_col not in reader.fieldnames or name_col not in reader.fieldnames:
+            return None
+        
+        for row in reader:
+            item_name = row[name_col].strip()
+            if item_name in seen:
+                continue
+            seen.add(item_name)
+            
+            slot = default_slot
+            if 'Item_Type_ID' in row:
+                if row['Item_Type_ID']:
+                    slot = type_id_to_slot_name.get(int(row['Item_Type_ID']), default_slot)
+            elif 'Item_Type' in row:
+                item_type_name = row['Item_Type'].lower().replace(' ', '_')
+                if item_type_name in slot_names:
+                    slot = item_type_name
+            rows.append([item_name, int(row[id_col]), slot])
+    return rows
+
+def merge_item_rows(contributions, pd=None):
+    """First-wins merge of per-file [name, id, slot] rows, in FILES_TO_PROCESS order.
+    
+    Returns the master map and the number of new items each file contributed.
+    """
+    if pd is not None:
+        frames = [pd.DataFrame(rows, columns=['name', 'id', 'slot']).assign(source=filename)
+                  for filename, rows in contributions.items()]
+        if not frames:
+            return {}, {}
+        merged = pd.concat(frames, ignore_index=True).drop_duplicates(subset='name', keep='first')
+        master_item_map = {
+            name: {"id": item_id, "slot": slot}
+            for name, item_id, slot in zip(merged['name'].tolist(), merged['id'].tolist(), merged['slot'].tolist())
+        }
+        return master_item_map, merged['source'].value_counts().to_dict()
+    
+    master_item_map = {}
+    new_counts = {}
+    for filename, rows in contributions.items():
+        before = len(master_item_map)
+        for item_name, item_id, slot in rows:
+            if item_name not in master_item_map:
+                master_item_map[item_name] = {"id": item_id, "slot": slot}
+        new_counts[filename] = len(master_item_map) - before
+    return master_item_map, new_counts
+
+def create_map(force=False, use_pandas=True):
     """
     Reads ALL item files and creates a master map of
     {"Item Name": {"id": 123, "slot": "slot_name"}}
+    
+    Each source file's rows are cached by content hash, so only changed files
+    are re-read and an unchanged items/ folder skips the rebuild entirely.
     """
     print(f"Creating master item map from CSV files in '{SOURCE_FOLDER}'...")
-    master_item_map = {}
     
-    # 1. Load item types (ID -> Name)
+    # 1. Hash the sources and compare them with the last build
+    cache = {} if force else load_build_cache()
+    types_hash = file_digest(ITEM_TYPES_FILE)
+    source_hashes = {filename: file_digest(os.path.join(SOURCE_FOLDER, filename))
+                     for filename in FILES_TO_PROCESS}
+    
+    if (cache.get('types_sha256') == types_hash and cache.get('files_sha256') == source_hashes
+            and all(os.path.exists(path) for path in (OUTPUT_JSON, REVERSE_JSON, ITEM_MAP_BIN))):
+        print(f"No changes in '{SOURCE_FOLDER}' since the last build; {OUTPUT_JSON} is up to date.")
+        return
+    
+    # Slots depend on the item types, so a change there invalidates every file
+    cached_rows = cache.get('rows', {}) if cache.get('types_sha256') == types_hash else {}
+    cached_hashes = cache.get('files_sha256', {})
+    
+    # Imported here so cached builds, the csv engine and the search subcommand skip loading pandas
+    pd = None
+    if use_pandas and any(source_hashes[filename] != cached_hashes.get(filename) or filename not in cached_rows
+                          for filename in FILES_TO_PROCESS):
+        import pandas as pd
+    
+    # 2. Load item types (ID -> Name)
     try:
-        df_types = pd.read_csv(ITEM_TYPES_FILE)
-        type_id_to_slot_name = df_types.set_index('Item_Type_ID')['Item_Type_Name'].to_dict()
+        type_id_to_slot_name = load_item_types(pd)
         print(f"Loaded {len(type_id_to_slot_name)} item types")
     except Exception as e:
         print(f"CRITICAL ERROR reading {ITEM_TYPES_FILE}: {e}")
         print("This file is required to assign slots. Aborting.")
         return
 
-    # 2. Process all configured item files
+    # 3. Read the configured item files that changed; reuse cached rows for the rest
+    contributions = {}
     for filename, (default_slot, id_col, name_col) in FILES_TO_PROCESS.items():
         filepath = os.path.join(SOURCE_FOLDER, filename)
-        if not os.path.exists(filepath):
+        if source_hashes[filename] is None:
             print(f"Warning: File not found, skipping: {filepath}")
             continue
+        
+        if filename in cached_rows and cached_hashes.get(filename) == source_hashes[filename]:
+            contributions[filename] = cached_rows[filename]
+            continue
 
         try:
-            df = pd.read_csv(filepath)
-            count = 0
+            if pd is not None:
+                rows = read_item_rows_pandas(pd, filepath, default_slot, id_col, name_col, type_id_to_slot_name)
+                if rows is not None:
+                    rows = [[name, int(item_id), slot] for name, item_id, slot in rows.itertuples(index=False)]
+            else:
+                rows = read_item_rows_csv(filepath, default_slot, id_col, name_col, type_id_to_slot_name)
             
-            if id_col not in df.columns or name_col not in df.columns:
+            if rows is None:
                 print(f"Warning: Skipping '{filename}'. Missing columns: '{id_col}' or '{name_col}'")
                 continue
-
-            for _, row in df.iterrows():
-                item_name = str(row[name_col]).strip()
-                item_id = int(row[id_col])
-                
-                # Determine the slot
-                slot = default_slot
-                if 'Item_Type_ID' in row and pd.notna(row['Item_Type_ID']):
-                    type_id = int(row['Item_Type_ID'])
-                    slot = type_id_to_slot_name.get(type_id, default_slot)
-                elif 'Item_Type' in row:
-                    item_type_name = str(row['Item_Type']).lower().replace(' ', '_')
-                    if item_type_name in type_id_to_slot_name.values():
-                        slot = item_type_name
-
-                if item_name not in master_item_map:
-                    master_item_map[item_name] = {"id": item_id, "slot": slot}
-                    count += 1
-                
-            print(f"Loaded {count} new items from {filename}")
+            
+            contributions[filename] = rows
+            print(f"Read {len(rows)} items from {filename}")
             
         except Exception as e:
             print(f"Error reading {filepath}: {e}")
+    
+    save_build_cache({
+        'types_sha256': types_hash,
+        'files_sha256': {filename: source_hashes[filename] for filename in contributions},
+        'rows': contributions
+    })
+    
+    # 4. Merge, keeping the first occurrence of each name
+    master_item_map, new_counts = merge_item_rows(contributions, pd)
+    for filename in contributions:
+        print(f"Loaded {new_counts.get(filename, 0)} new items from {filename}")
 
-    # 3. Add generic fallback items
+
+    # 5. Add generic fallback items
     generic_mappings = {
         "Horse": "Hunter",
         "Bow": "Hunting Bow",
@@ -95,7 +231,7 @@ def create_map():
             master_item_map[generic_name] = master_item_map[specific_name].copy()
             print(f"Added generic '{generic_name}' mapping from '{specific_name}'")
 
-    # 4. Add known wiki-to-game mappings
+    # 6. Add known wiki-to-game mappings
     # These are manually curated mappings for items where wiki names differ from game data
     wiki_to_game_mappings = {
         # Battanian Equipment
@@ -128,16 +264,16 @@ def create_map():
     if added_wiki_mappings > 0:
         print(f"Added {added_wiki_mappings} wiki-to-game item mappings")
 
-    # 5. Create reverse lookup helpers for debugging
+    # 7. Create reverse lookup helpers for debugging
     id_to_name = {v['id']: k for k, v in master_item_map.items()}
     
-    # 6. Save the map to JSON
+    # 8. Save the map to JSON
     with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
         json.dump(master_item_map, f, indent=2)
         
     print(f"\nSuccessfully created {OUTPUT_JSON} with {len(master_item_map)} total items.")
     
-    # 7. Save a reverse lookup file for convenience
+    # 9. Save a reverse lookup file for convenience
     reverse_map = {
         "id_to_name": id_to_name,
         "slot_counts": {}
@@ -148,12 +284,19 @@ def create_map():
         slot = item_data['slot']
         reverse_map['slot_counts'][slot] = reverse_map['slot_counts'].get(slot, 0) + 1
     
-    with open('item_map_reverse.json', 'w', encoding='utf-8') as f:
+    with open(REVERSE_JSON, 'w', encoding='utf-8') as f:
         json.dump(reverse_map, f, indent=2)
     
-    print(f"Created item_map_reverse.json with ID lookups")
+    print(f"Created {REVERSE_JSON} with ID lookups")
+    
+    # 10. Build the binary map the scraper loads, and the search index used by the 'search' subcommand
+    source_hash = file_sha256(OUTPUT_JSON)
+    write_item_map_binary(master_item_map, ITEM_MAP_BIN, source_hash)
+    print(f"Created {ITEM_MAP_BIN} for fast loading")
+    build_search_index(master_item_map, SEARCH_INDEX_DB, source_hash)
+    print(f"Created {SEARCH_INDEX_DB} for item search")
     
-    # 8. Print statistics
+    # 11. Print statistics
     print("\nItem Statistics:")
     for slot, count in sorted(reverse_map['slot_counts'].items()):
         print(f"  {slot:20} {count:4} items")
@@ -163,42 +306,51 @@ def create_map():
     for i, (name, data) in enumerate(list(master_item_map.items())[:10]):
         print(f"  {name:30} → ID={data['id']:4}, Slot={data['slot']}")
 
-def search_item_by_name(search_term):
+def load_search_index() -> ItemSearchIndex:
+    """Open the search index, rebuilding it first if item_map.json changed since it was built"""
+    index = ItemSearchIndex(SEARCH_INDEX_DB)
+    source_hash = file_sha256(OUTPUT_JSON)
+    
+    if not os.path.exists(SEARCH_INDEX_DB) or index.source_hash() != source_hash:
+        index.close()
+        print(f"Rebuilding {SEARCH_INDEX_DB} from {OUTPUT_JSON}...")
+        with open(OUTPUT_JSON, 'r', encoding='utf-8') as f:
+            build_search_index(json.load(f), SEARCH_INDEX_DB, source_hash)
+    
+    return index
+
+def search_item_by_name(search_term, slot=None, limit=20):
     """Helper function to search for items"""
     if not os.path.exists(OUTPUT_JSON):
         print("item_map.json not found. Run create_map() first.")
         return
     
-    with open(OUTPUT_JSON, 'r') as f:
-        item_map = json.load(f)
-    
-    search_lower = search_term.lower()
-    matches = [(name, data) for name, data in item_map.items() 
-               if search_lower in name.lower()]
+    index = load_search_index()
+    matches = index.search(search_term, slot=slot, limit=limit)
+    index.close()
     
+    slot_note = f" in slot '{slot}'" if slot else ""
     if matches:
-        print(f"\nFound {len(matches)} matches for '{search_term}':")
-        for name, data in sorted(matches)[:20]:  # Show first 20
-            print(f"  {name:40} ID={data['id']:4}, Slot={data['slot']}")
-        if len(matches) > 20:
-            print(f"  ... and {len(matches) - 20} more")
+        print(f"\nTop {len(matches)} matches for '{search_term}'{slot_note}:")
+        for match in matches:
+            print(f"  {match['name']:40} ID={match['id']:4}, Slot={match['slot']:15} "
+                  f"({match['match']}, score {match['score']})")
     else:
-        print(f"No matches found for '{search_term}'")
-        
-        # Try fuzzy matching
-        fuzzy = get_close_matches(search_term, item_map.keys(), n=5, cutoff=0.6)
-        if fuzzy:
-            print(f"\nDid you mean:")
-            for match in fuzzy:
-                print(f"  {match}")
+        print(f"No matches found for '{search_term}'{slot_note}")
 
 if __name__ == "__main__":
-    import sys
+    parser = argparse.ArgumentParser(description="Build the item map from the CSV files in items/, or search it")
+    parser.add_argument('--force', action='store_true', help="Rebuild every file even if its content hash is unchanged")
+    parser.add_argument('--engine', choices=['pandas', 'csv'], default='pandas',
+                        help="Read the CSVs with pandas or with the pandas-free csv module (faster start-up)")
+    subparsers = parser.add_subparsers(dest='command')
+    search_parser = subparsers.add_parser('search', help="Search the item map by name (prefix, token and typo tolerant)")
+    search_parser.add_argument('item_name', nargs='+', help="Name or part of a name to look up")
+    search_parser.add_argument('--slot', help="Only return items in this slot (e.g. armors, horses)")
+    search_parser.add_argument('--limit', type=int, default=20, help="Maximum number of results (default: 20)")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1 and sys.argv[1] == "search":
-        if len(sys.argv) > 2:
-            search_item_by_name(" ".join(sys.argv[2:]))
-        else:
-            print("Usage: python create_item_map_enhanced.py search <item_name>")
+    if args.command == 'search':
+        search_item_by_name(" ".join(args.item_name), slot=args.slot, limit=args.limit)
     else:
-        create_map()
+        create_map(force=args.force, use_pandas=args.engine == 'pandas')
@@ -1,31 +1,175 @@
+# generate_items_sql.py
+import argparse
+import os
+import re
+from typing import Dict, List, Tuple
+
 import pandas as pd
 
-# Read your items CSV
-items_df = pd.read_csv('items/items.csv')
-
-# Create Item_Types inserts
-print("-- Item Types")
-print("INSERT INTO Item_Types (item_type_id, item_type) VALUES")
-print("  (1, 'melee_weapons'),")
-print("  (2, 'ranged_weapons'),")
-print("  (3, 'armors'),")
-print("  (4, 'shields'),")
-print("  (5, 'horses');")
-print()
-
-# Create Items inserts
-print("-- Items")
-print("INSERT INTO Items (item_id, item_type_id, culture_id, name) VALUES")
-
-item_inserts = []
-for _, row in items_df.iterrows():
-    item_id = int(row['Item_ID'])
-    item_type_id = int(row['Item_Type_ID']) if pd.notna(row['Item_Type_ID']) else 'NULL'
-    culture_id = int(row['Culture_ID']) if pd.notna(row['Culture_ID']) else 'NULL'
-    name = str(row['Item_Name']).replace("'", "''")
-    
-    item_inserts.append(f"  ({item_id}, {item_type_id}, {culture_id}, '{name}')")
-
-print(",\n".join(item_inserts) + ";")
-
-# use python generate_items_sql.py > items.sql to generate the SQL file
\ No newline at end of file
+from sql_writer import SQL_BATCH_SIZE, SqlWriter
+
+# --- Configuration ---
+SOURCE_FOLDER = 'items'
+ITEMS_CSV = os.path.join(SOURCE_FOLDER, 'items.csv')
+SQL_OUTPUT = 'items_data.sql'          # Chunked INSERT output
+BULK_OUTPUT_DIR = 'items_bulk'         # One data file per table plus a load script, for --format pgcopy/mysql
+
+# CSV file -> (table, column renames); other columns keep their header in snake_case
+EXPORT_TABLES = {
+    'items_types_ids.csv': ('Item_Types', {'Item_Type_ID': 'item_type_id', 'Item_Type_Name': 'item_type'}),
+    'culture_types_ids.csv': ('Culture_Types', {}),
+    'items.csv': ('Items', {'Item_Name': 'name'}),
+    'armors.csv': ('Armors', {'Item_Name': 'name'}),
+    'melee_weapons.csv': ('Melee_Weapons', {'Item_Name': 'name'}),
+    'ranged_weapons.csv': ('Ranged_Weapons', {'Item_Name': 'name'}),
+    'shields.csv': ('Shields', {'Shield_name': 'name'}),
+    'mounts.csv': ('Mounts', {'Mount_Name': 'name'}),
+}
+# --- End Configuration ---
+
+# Items keeps the four columns of the original Items table
+ITEMS_COLUMNS = ['item_id', 'item_type_id', 'culture_id', 'name']
+
+# Underscores too, so 'Draw _Speed' becomes draw_speed rather than draw__speed
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+# Backslash first, so the escapes added afterwards are not escaped again
+TSV_ESCAPES = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')]
+TSV_NULL = '\\N'
+
+def column_name(header: str) -> str:
+    return NON_WORD_RE.sub('_', header.strip()).strip('_').lower()
+
+def read_table(filename: str) -> Tuple[str, pd.DataFrame]:
+    """Read one CSV with nullable dtypes, snake_case columns and Yes/No flags as 0/1"""
+    table, renames = EXPORT_TABLES[filename]
+    df = pd.read_csv(os.path.join(SOURCE_FOLDER, filename), encoding='utf-8').convert_dtypes()
+    df = df.rename(columns=lambda header: renames.get(header, column_name(header)))
+
+    for column in df.columns:
+        if pd.api.types.is_string_dtype(df[column]) and set(df[column].dropna().unique()) <= {'Yes', 'No'}:
+            df[column] = df[column].map({'Yes': 1, 'No': 0}, na_action='ignore').astype('Int64')
+
+    if table == 'Items':
+        df = df[ITEMS_COLUMNS]
+    return table, df
+
+def python_rows(df: pd.DataFrame) -> List[Tuple]:
+    """Rows as tuples of plain Python values, with None for missing ones"""
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+def read_item_types() -> List[Tuple]:
+    """(item_type_id, item_type) rows from items_types_ids.csv"""
+    return python_rows(read_table('items_types_ids.csv')[1])
+
+def read_item_rows() -> List[Tuple]:
+    """(item_id, item_type_id, culture_id, name) rows from items.csv"""
+    return python_rows(read_table('items.csv')[1])
+
+def column_type(series: pd.Series) -> str:
+    """Portable SQL type for a column, from its nullable dtype"""
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(series):
+        return 'DOUBLE PRECISION'
+    return 'TEXT'
+
+def table_ddl(table: str, df: pd.DataFrame) -> str:
+    """CREATE TABLE IF NOT EXISTS for a table, keyed on its first column when that is a unique integer id"""
+    columns = [f"  {column} {column_type(df[column])}" for column in df.columns]
+    key = df.columns[0]
+    if column_type(df[key]) == 'INTEGER' and df[key].notna().all() and df[key].is_unique:
+        columns.append(f"  PRIMARY KEY ({key})")
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n" + ",\n".join(columns) + "\n);"
+
+def sql_literals(series: pd.Series) -> pd.Series:
+    """Format a whole column as SQL literals"""
+    if pd.api.types.is_string_dtype(series):
+        formatted = "'" + series.str.replace("'", "''", regex=False) + "'"
+    else:
+        formatted = series.astype('string')
+    return formatted.fillna('NULL')
+
+def tsv_fields(series: pd.Series) -> pd.Series:
+    """Format a whole column for PostgreSQL COPY text / MySQL LOAD DATA (tab separated, \\N for NULL)"""
+    formatted = series.astype('string')
+    if pd.api.types.is_string_dtype(series):
+        for raw, escaped in TSV_ESCAPES:
+            formatted = formatted.str.replace(raw, escaped, regex=False)
+    return formatted.fillna(TSV_NULL)
+
+def join_columns(columns: List[pd.Series], separator: str) -> pd.Series:
+    return columns[0].str.cat(columns[1:], sep=separator) if len(columns) > 1 else columns[0]
+
+def export_sql(tables: Dict[str, pd.DataFrame], path: str, batch_size: int, transaction: bool) -> int:
+    with SqlWriter(path, batch_size=batch_size, transaction=transaction) as writer:
+        for table, df in tables.items():
+            rows = "(" + join_columns([sql_literals(df[column]) for column in df.columns], ', ') + ")"
+            writer.line(f"-- {table}")
+            writer.line(table_ddl(table, df))
+            writer.insert_tuples(table, list(df.columns), rows.tolist())
+            writer.line()
+    return writer.lines
+
+def load_path(output_dir: str, filename: str) -> str:
+    """Absolute path of a data file as quoted in a load script, so it runs from any directory"""
+    path = os.path.abspath(os.path.join(output_dir, filename)).replace('\\', '/')
+    return path.replace("'", "''")
+
+def export_bulk(tables: Dict[str, pd.DataFrame], output_dir: str, dialect: str) -> str:
+    """Write one tab-separated data file per table and a script that creates the tables and bulk-loads them"""
+    os.makedirs(output_dir, exist_ok=True)
+    script = []
+    for table, df in tables.items():
+        filename = f"{table.lower()}.tsv"
+        lines = join_columns([tsv_fields(df[column]) for column in df.columns], '\t')
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8', newline='\n') as f:
+            if len(lines):
+                f.write('\n'.join(lines.tolist()) + '\n')
+
+        columns = ', '.join(df.columns)
+        path = load_path(output_dir, filename)
+        script.append(table_ddl(table, df))
+        if dialect == 'pgcopy':
+            script.append(f"\\copy {table} ({columns}) FROM '{path}'")
+        else:
+            script.append(f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                          f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({columns});")
+
+    script_name = 'load_postgres.sql' if dialect == 'pgcopy' else 'load_mysql.sql'
+    with open(os.path.join(output_dir, script_name), 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(script) + '\n')
+    return script_name
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every item CSV as SQL INSERTs or bulk-load files")
+    parser.add_argument('--format', choices=['sql', 'pgcopy', 'mysql'], default='sql',
+                        help="sql: chunked INSERTs; pgcopy: PostgreSQL COPY text; mysql: LOAD DATA TSV (default: sql)")
+    parser.add_argument('--output', default=SQL_OUTPUT,
+                        help=f"SQL file for --format sql, gzip-compressed if it ends in .gz (default: {SQL_OUTPUT})")
+    parser.add_argument('--output-dir', default=BULK_OUTPUT_DIR,
+                        help=f"Directory for the bulk-load files (default: {BULK_OUTPUT_DIR})")
+    parser.add_argument('--batch-size', type=int, default=SQL_BATCH_SIZE,
+                        help=f"Rows per INSERT statement (default: {SQL_BATCH_SIZE})")
+    parser.add_argument('--transaction', action='store_true', help="Wrap the SQL output in BEGIN/COMMIT")
+    args = parser.parse_args()
+
+    tables = {}
+    for filename in EXPORT_TABLES:
+        if not os.path.exists(os.path.join(SOURCE_FOLDER, filename)):
+            print(f"Warning: File not found, skipping: {filename}")
+            continue
+        table, df = read_table(filename)
+        tables[table] = df
+        print(f"Read {len(df)} rows from {filename} into {table}")
+
+    if args.format == 'sql':
+        lines = export_sql(tables, args.output, args.batch_size, args.transaction)
+        print(f"✓ Wrote {lines} lines of SQL to '{args.output}'")
+    else:
+        script_name = export_bulk(tables, args.output_dir, args.format)
+        print(f"✓ Wrote {len(tables)} data files to '{args.output_dir}'; load them with {script_name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# item_map_binary.py
+"""Compact, memory-mapped form of item_map.json.
+
+Layout (native byte order, recorded in the header):
+
+    header        magic, version, byte order, item count, reverse count,
+                  slot table size, string pool size, sha256 of item_map.json
+    name_offsets  uint32[count + 1]  offsets into the string pool, names sorted by UTF-8 bytes
+    ids           int32[count]       item id of each sorted name
+    order         uint32[count]      sorted index of each name in item_map.json order
+    reverse_ids   int32[reverse]     distinct item ids, ascending
+    reverse_names uint32[reverse]    sorted index of the name each id maps back to
+    slot_codes    uint8[count]       index into the slot table
+    slot table    newline-joined slot names
+    string pool   concatenated UTF-8 names
+
+Nothing is decoded up front: lookups binary-search the mapped arrays, so
+opening the file costs the same for a hundred items or a hundred thousand.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+
+# --- Configuration ---
+ITEM_MAP_BIN = 'item_map.bin'
+# --- End Configuration ---
+
+MAGIC = b'BLIM'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxIIII32s')
+BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+
+
+def write_item_map_binary(item_map: Dict, path: str = ITEM_MAP_BIN, source_hash: str = ''):
+    """Write item_map ({name: {'id', 'slot'}}) in the compact binary layout"""
+    names = list(item_map)
+    encoded = [name.encode('utf-8') for name in names]
+    sorted_positions = sorted(range(len(names)), key=encoded.__getitem__)
+    sorted_index = [0] * len(names)
+    for rank, position in enumerate(sorted_positions):
+        sorted_index[position] = rank
+
+    slots = sorted({data['slot'] for data in item_map.values()})
+    slot_codes = {slot: code for code, slot in enumerate(slots)}
+    if len(slots) > 255:
+        raise ValueError(f"Too many slots for the binary item map: {len(slots)}")
+
+    name_offsets = array('I', [0])
+    pool = bytearray()
+    ids = array('i')
+    codes = array('B')
+    for position in sorted_positions:
+        pool += encoded[position]
+        name_offsets.append(len(pool))
+        data = item_map[names[position]]
+        ids.append(int(data['id']))
+        codes.append(slot_codes[data['slot']])
+
+    order = array('I', sorted_index)
+
+    # Later names win, like the id_to_name dict in item_map_reverse.json
+    id_to_rank = {}
+    for position, name in enumerate(names):
+        id_to_rank[int(item_map[name]['id'])] = sorted_index[position]
+    reverse_ids = array('i', sorted(id_to_rank))
+    reverse_names = array('I', (id_to_rank[item_id] for item_id in reverse_ids))
+
+    slot_table = '\n'.join(slots).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(names), len(reverse_ids),
+                         len(slot_table), len(pool), bytes.fromhex(source_hash) if source_hash else b'')
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for section in (name_offsets, ids, order, reverse_ids, reverse_names, codes):
+            section.tofile(f)
+        f.write(slot_table)
+        f.write(pool)
+    os.replace(tmp_path, path)
+
+
+class CompactItemMap(Mapping):
+    """Read-only {name: {'id', 'slot'}} mapping backed by a memory-mapped item_map.bin.
+
+    Iteration follows item_map.json order. name_for_id serves the reverse
+    lookup that item_map_reverse.json provides, from the same file.
+    """
+
+    def __init__(self, path: str = ITEM_MAP_BIN):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, count, reverse_count, slot_bytes, pool_bytes, digest = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or byte_order != BYTE_ORDER:
+            self.mm.close()
+            raise ValueError(f"{path} is not a compatible binary item map")
+
+        self.count = count
+        self.source_hash = digest.hex()
+        view = memoryview(self.mm)
+        offset = HEADER.size
+
+        def section(length, fmt):
+            nonlocal offset
+            part = view[offset:offset + length * struct.calcsize(fmt)].cast(fmt)
+            offset += length * struct.calcsize(fmt)
+            return part
+
+        self.name_offsets = section(count + 1, 'I')
+        self.ids = section(count, 'i')
+        self.order = section(count, 'I')
+        self.reverse_ids = section(reverse_count, 'i')
+        self.reverse_names = section(reverse_count, 'I')
+        self.slot_codes = section(count, 'B')
+        self.slots = bytes(view[offset:offset + slot_bytes]).decode('utf-8').split('\n')
+        self.pool = view[offset + slot_bytes:offset + slot_bytes + pool_bytes]
+
+    @classmethod
+    def open_validated(cls, path: str, source_hash: str) -> Optional['CompactItemMap']:
+        """Open path if it exists and was built from the item map with this sha256, else None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            item_map = cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if item_map.source_hash != source_hash:
+            item_map.close()
+            return None
+        return item_map
+
+    def _name_bytes(self, rank: int):
+        return self.pool[self.name_offsets[rank]:self.name_offsets[rank + 1]]
+
+    def _find(self, name: str) -> int:
+        """Sorted index of name, or -1"""
+        key = name.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(middle).tobytes() < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._name_bytes(low) == key:
+            return low
+        return -1
+
+    def _entry(self, rank: int) -> Dict:
+        return {'id': self.ids[rank], 'slot': self.slots[self.slot_codes[rank]]}
+
+    def __getitem__(self, name: str) -> Dict:
+        rank = self._find(name) if isinstance(name, str) else -1
+        if rank < 0:
+            raise KeyError(name)
+        return self._entry(rank)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self._find(name) >= 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        for rank in self.order:
+            yield self._name_bytes(rank).tobytes().decode('utf-8')
+
+    def name_for_id(self, item_id: int) -> Optional[str]:
+        """Reverse lookup: the item map name for an item id, or None"""
+        position = bisect_left(self.reverse_ids, item_id)
+        if position < len(self.reverse_ids) and self.reverse_ids[position] == item_id:
+            return self._name_bytes(self.reverse_names[position]).tobytes().decode('utf-8')
+        return None
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for view in (self.name_offsets, self.ids, self.order, self.reverse_ids,
+                     self.reverse_names, self.slot_codes, self.pool):
+            view.release()
+        self.mm.close()
+
+    def __reduce__(self):
+        # Parser worker processes reopen the file instead of pickling its contents
+        return (CompactItemMap, (self.path,))
@@ -0,0 +1,152 @@
+# item_resolver.py
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# --- Configuration ---
+MAX_EDIT_DISTANCE = 2      # Largest typo distance accepted for a fuzzy match
+MIN_CONFIDENCE = 0.85      # 1 - distance / length of the longer name
+NGRAM_SIZE = 3
+# --- End Configuration ---
+
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_item_name(name: str) -> str:
+    """Lowercase, strip accents and apostrophes, and collapse punctuation to single spaces"""
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = name.lower().replace("'", '').replace('’', '')
+    return NON_ALNUM_RE.sub(' ', name).strip()
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> List[str]:
+    """Character n-grams of text, padded so the first and last letters count fully"""
+    padded = f"{'$' * (size - 1)}{text}$"
+    return [padded[i:i + size] for i in range(len(padded) - size + 1)]
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance between a and b, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(a) + 1))
+    for j, char_b in enumerate(b, 1):
+        current = [j] + [0] * len(a)
+        for i, char_a in enumerate(a, 1):
+            current[i] = min(
+                previous[i] + 1,
+                current[i - 1] + 1,
+                previous[i - 1] + (char_a != char_b)
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class ItemResolver:
+    """Maps scraped item names onto item map keys.
+
+    Lookups try the exact name, then the normalized name, then a fuzzy match
+    within MAX_EDIT_DISTANCE. Fuzzy candidates come from a character n-gram
+    index built once from the map, so a lookup never scans every key. The
+    normalized names and the index are only built when an exact lookup first
+    misses. Results are memoized per scraped name.
+    """
+
+    def __init__(self, item_map: Mapping, max_distance: int = MAX_EDIT_DISTANCE,
+                 min_confidence: float = MIN_CONFIDENCE):
+        self.item_map = item_map
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.memo = {}  # scraped name -> (item map key, confidence) or None
+        self.stats = {'exact': 0, 'normalized': 0, 'fuzzy': 0, 'unmatched': 0, 'memoized': 0}
+
+        # Built on the first lookup that misses the exact name; most names never need them
+        self.normalized = None
+        self.ngram_index = None
+        self.index_keys = None
+
+    def build_normalized(self):
+        """Map every normalized name to its item map key, first key winning as in create_map"""
+        self.normalized = {}
+        for key in self.item_map:
+            self.normalized.setdefault(normalize_item_name(key), key)
+
+    def build_index(self):
+        """Index every normalized name by its character n-grams"""
+        self.index_keys = list(self.normalized)
+        self.ngram_index = defaultdict(list)
+        for position, norm in enumerate(self.index_keys):
+            for gram in set(ngrams(norm)):
+                self.ngram_index[gram].append(position)
+
+    def resolve(self, name: str) -> Optional[Tuple[str, float]]:
+        """Return (item map key, confidence) for a scraped name, or None"""
+        if name in self.memo:
+            self.stats['memoized'] += 1
+            return self.memo[name]
+
+        if name in self.item_map:
+            result = (name, 1.0)
+            self.stats['exact'] += 1
+        else:
+            if self.normalized is None:
+                self.build_normalized()
+            norm = normalize_item_name(name)
+            if norm in self.normalized:
+                result = (self.normalized[norm], 1.0)
+                self.stats['normalized'] += 1
+            else:
+                result = self.fuzzy_match(norm)
+                self.stats['fuzzy' if result else 'unmatched'] += 1
+
+        self.memo[name] = result
+        return result
+
+    def lookup(self, name: str) -> Optional[Dict]:
+        """Return the item map entry ({'id', 'slot'}) for a scraped name, or None"""
+        resolved = self.resolve(name)
+        return self.item_map[resolved[0]] if resolved else None
+
+    def fuzzy_match(self, norm: str) -> Optional[Tuple[str, float]]:
+        if not norm:
+            return None
+        if self.ngram_index is None:
+            self.build_index()
+
+        # Each edit touches at most NGRAM_SIZE n-grams, so a match within
+        # max_distance shares at least this many n-grams with the query
+        grams = set(ngrams(norm))
+        needed = max(1, len(grams) - NGRAM_SIZE * self.max_distance)
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for position in self.ngram_index.get(gram, ()):
+                shared[position] += 1
+
+        best = None
+        for position, count in shared.items():
+            if count < needed:
+                continue
+            candidate = self.index_keys[position]
+            distance = bounded_levenshtein(norm, candidate, self.max_distance)
+            if distance > self.max_distance:
+                continue
+            rank = (distance, -count, position)
+            if best is None or rank < best[0]:
+                best = (rank, candidate, distance)
+
+        if best is None:
+            return None
+
+        _, candidate, distance = best
+        confidence = 1 - distance / max(len(norm), len(candidate))
+        if confidence < self.min_confidence:
+            return None
+        return self.normalized[candidate], round(confidence, 3)
@@ -0,0 +1,259 @@
+# item_search.py
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from item_resolver import bounded_levenshtein, ngrams, normalize_item_name
+
+# --- Configuration ---
+SEARCH_INDEX_DB = 'item_search_index.sqlite'
+MIN_TYPO_SIMILARITY = 0.4   # Trigram Jaccard similarity needed for a typo-tolerant hit
+GRAM_CANDIDATES = 200       # Most names (or vocabulary tokens) taken per trigram as typo candidates
+# --- End Configuration ---
+
+# Ranking weights per kind of match; ties go to shorter names
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_ALL_TOKENS = 60
+SCORE_SOME_TOKENS = 40
+SCORE_TYPO = 30
+TYPO_TOKEN_WEIGHT = 0.8     # A misspelled token counts this much of a matched one
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix"""
+    return prefix + '\uffff'
+
+
+def json_list(values) -> str:
+    """A list bound as one parameter and read back with json_each, so no query has a variable-length IN"""
+    return json.dumps(list(values))
+
+
+def build_search_index(item_map: Dict, path: str = SEARCH_INDEX_DB, source_hash: str = ''):
+    """Write an SQLite search index (names, token inverted index, trigram index) for item_map"""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE items (
+            item_rowid INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            norm TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            slot TEXT NOT NULL,
+            gram_count INTEGER NOT NULL
+        );
+        CREATE TABLE tokens (token TEXT NOT NULL, item_rowid INTEGER NOT NULL);
+        CREATE TABLE grams (gram TEXT NOT NULL, item_rowid INTEGER NOT NULL);
+        CREATE TABLE token_grams (gram TEXT NOT NULL, token TEXT NOT NULL);
+    """)
+
+    item_rows = []
+    token_rows = []
+    gram_rows = []
+    for rowid, (name, data) in enumerate(item_map.items(), 1):
+        norm = normalize_item_name(name)
+        grams = set(ngrams(norm))
+        item_rows.append((rowid, name, norm, data['id'], data['slot'], len(grams)))
+        token_rows.extend((token, rowid) for token in set(norm.split()))
+        gram_rows.extend((gram, rowid) for gram in grams)
+
+    conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)", item_rows)
+    conn.executemany("INSERT INTO tokens VALUES (?, ?)", token_rows)
+    conn.executemany("INSERT INTO grams VALUES (?, ?)", gram_rows)
+    vocabulary = {token for token, _ in token_rows}
+    conn.executemany("INSERT INTO token_grams VALUES (?, ?)",
+                     ((gram, token) for token in vocabulary for gram in set(ngrams(token))))
+
+    # Indexes after the bulk insert are much cheaper than maintaining them row by row
+    conn.executescript("""
+        CREATE INDEX idx_items_norm ON items (norm);
+        CREATE INDEX idx_items_slot ON items (slot);
+        CREATE INDEX idx_tokens ON tokens (token, item_rowid);
+        CREATE INDEX idx_grams ON grams (gram, item_rowid);
+        CREATE INDEX idx_token_grams ON token_grams (gram, token);
+    """)
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ('source_sha256', source_hash),
+        ('item_count', str(len(item_rows)))
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+class ItemSearchIndex:
+    """Ranked item search over the prebuilt SQLite index.
+
+    The database is only opened on the first query, and queries touch indexed
+    rows only, so start-up and lookup cost stay flat as the catalogue grows.
+    Typo candidates are capped per trigram, and candidate lists are bound as
+    one JSON parameter, so a broad query never hits SQLite's variable limit.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_DB):
+        self.path = path
+        self.conn = None
+
+    def open(self):
+        if self.conn is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"{self.path} not found. Run create_map() first.")
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return self.conn
+
+    def source_hash(self) -> str:
+        row = self.open().execute("SELECT value FROM meta WHERE key = 'source_sha256'").fetchone()
+        return row[0] if row else ''
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def gram_candidates(self, table: str, column: str, grams: List[str]) -> Tuple[Dict, List[str]]:
+        """Values of column sharing any of grams, taking at most GRAM_CANDIDATES per gram.
+
+        Returns ({value: grams shared among the uncapped grams}, capped grams).
+        The cap bounds the work per query however many names share a common
+        gram; a candidate may also share any of the capped grams, which the
+        caller checks only where that could matter.
+        """
+        conn = self.open()
+        shared = {}
+        capped = []
+        for gram in grams:
+            values = [value for (value,) in conn.execute(
+                f"SELECT {column} FROM {table} WHERE gram = ? LIMIT ?", (gram, GRAM_CANDIDATES)
+            )]
+            counted = len(values) < GRAM_CANDIDATES
+            if not counted:
+                capped.append(gram)
+            for value in values:
+                shared[value] = shared.get(value, 0) + counted
+        return shared, capped
+
+    def similar_tokens(self, token: str) -> List[str]:
+        """Vocabulary tokens within a small edit distance of token (1 for short tokens, 2 otherwise)"""
+        if len(token) < 4:
+            return []
+        limit = 1 if len(token) < 7 else 2
+        grams = sorted(set(ngrams(token)))
+        needed = max(1, len(grams) - 3 * limit)
+
+        shared, capped = self.gram_candidates('token_grams', 'token', grams)
+        return [candidate for candidate, count in shared.items()
+                if count + len(capped) >= needed
+                and count + len(set(capped).intersection(ngrams(candidate))) >= needed
+                and bounded_levenshtein(token, candidate, limit) <= limit]
+
+    def search(self, query: str, slot: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Return ranked matches as dicts with name, id, slot, score and match kind"""
+        conn = self.open()
+        norm = normalize_item_name(query)
+        if not norm:
+            return []
+
+        slot_clause = " AND i.slot = ?" if slot else ""
+        slot_where = " WHERE i.slot = ?" if slot else ""
+        slot_args = (slot,) if slot else ()
+        scores = {}  # item_rowid -> (score, match kind)
+
+        def add(rowid, score, kind):
+            if rowid not in scores or score > scores[rowid][0]:
+                scores[rowid] = (score, kind)
+
+        # Whole-name exact and prefix matches
+        for rowid, item_norm in conn.execute(
+            f"SELECT i.item_rowid, i.norm FROM items i WHERE i.norm >= ? AND i.norm < ?{slot_clause}",
+            (norm, prefix_upper_bound(norm)) + slot_args
+        ):
+            if item_norm == norm:
+                add(rowid, SCORE_EXACT, 'exact')
+            else:
+                add(rowid, SCORE_PREFIX, 'prefix')
+
+        # Token matches: each query token may be a prefix of a token in the name,
+        # or a misspelling of one (weighted lower)
+        query_tokens = norm.split()
+        token_hits = {}  # item_rowid -> {query token position: weight}
+        for position, token in enumerate(query_tokens):
+            for (rowid,) in conn.execute(
+                f"SELECT DISTINCT t.item_rowid FROM tokens t JOIN items i ON i.item_rowid = t.item_rowid "
+                f"WHERE t.token >= ? AND t.token < ?{slot_clause}",
+                (token, prefix_upper_bound(token)) + slot_args
+            ):
+                token_hits.setdefault(rowid, {})[position] = 1.0
+
+            typo_tokens = [similar for similar in self.similar_tokens(token) if similar != token]
+            if typo_tokens:
+                for (rowid,) in conn.execute(
+                    f"SELECT DISTINCT t.item_rowid FROM json_each(?) q "
+                    f"JOIN tokens t ON t.token = q.value JOIN items i ON i.item_rowid = t.item_rowid"
+                    f"{slot_where}",
+                    (json_list(typo_tokens),) + slot_args
+                ):
+                    hits = token_hits.setdefault(rowid, {})
+                    hits[position] = max(hits.get(position, 0), TYPO_TOKEN_WEIGHT)
+
+        for rowid, hits in token_hits.items():
+            weight = sum(hits.values()) / len(query_tokens)
+            if len(hits) == len(query_tokens):
+                add(rowid, SCORE_ALL_TOKENS * weight, 'tokens')
+            else:
+                add(rowid, SCORE_SOME_TOKENS * weight, 'some tokens')
+
+        # Typo tolerance: trigram overlap, confirmed with a bounded edit distance when close
+        grams = sorted(set(ngrams(norm)))
+        shared, capped = self.gram_candidates('grams', 'item_rowid', grams)
+        for rowid, item_norm, gram_count in conn.execute(
+            f"SELECT i.item_rowid, i.norm, i.gram_count FROM json_each(?) c "
+            f"JOIN items i ON i.item_rowid = c.value{slot_where}",
+            (json_list(shared),) + slot_args
+        ):
+            count = shared[rowid]
+            if capped:
+                # Sharing every capped gram is the best case; only close calls are counted exactly
+                best = count + len(capped)
+                if best / (len(grams) + gram_count - best) < MIN_TYPO_SIMILARITY:
+                    continue
+                count += len(set(capped).intersection(ngrams(item_norm)))
+            similarity = count / (len(grams) + gram_count - count)
+            if similarity < MIN_TYPO_SIMILARITY:
+                continue
+            distance = bounded_levenshtein(norm, item_norm, 2)
+            bonus = 10 * (3 - distance) / 3 if distance <= 2 else 0
+            add(rowid, SCORE_TYPO * similarity + bonus, 'typo')
+
+        if not scores:
+            return []
+
+        rows = conn.execute(
+            "SELECT i.item_rowid, i.name, i.item_id, i.slot FROM json_each(?) s "
+            "JOIN items i ON i.item_rowid = s.value",
+            (json_list(scores),)
+        ).fetchall()
+
+        results = [
+            {'name': name, 'id': item_id, 'slot': item_slot,
+             'score': round(scores[rowid][0], 1), 'match': scores[rowid][1]}
+            for rowid, name, item_id, item_slot in rows
+        ]
+        results.sort(key=lambda r: (-r['score'], len(r['name']), r['name']))
+        return results[:limit]
@@ -0,0 +1,231 @@
+# metrics.py
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List
+
+# --- Configuration ---
+RUN_REPORT_JSON = 'run_report.json'
+RUN_REPORT_PROM = 'run_metrics.prom'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)   # Seconds, Prometheus histogram bounds
+LATENCY_RESOLUTION = 0.01   # Relative width of the bins latency percentiles are read from
+METRIC_PREFIX = 'bannerlord_scraper'
+# --- End Configuration ---
+
+LABEL_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class LatencyHistogram:
+    """Fixed-memory latency record: count, sum, max, the Prometheus buckets and log-spaced bins.
+
+    Samples are not kept. Each one lands in a bin (1 + LATENCY_RESOLUTION)
+    times wider than the one before, so the number of bins only grows with
+    the range of latencies seen, and a percentile read from them is within
+    LATENCY_RESOLUTION of the nearest-rank sample. Histograms from worker
+    processes merge exactly.
+    """
+
+    MIN_SECONDS = 1e-6
+    GROWTH = math.log1p(LATENCY_RESOLUTION)
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)   # Samples <= each bound
+        self.bins = Counter()                       # bin index -> samples
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.bins[math.floor(math.log(max(seconds, self.MIN_SECONDS)) / self.GROWTH)] += 1
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.bins.update(other.bins)
+
+    def percentile(self, fraction: float) -> float:
+        """Nearest-rank percentile, as the upper edge of the bin it falls in (capped at the max)"""
+        if not self.count:
+            return 0.0
+        rank = min(self.count - 1, int(fraction * self.count))
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(self.max, math.exp((index + 1) * self.GROWTH))
+        return self.max
+
+
+class Metrics:
+    """Thread-safe run instrumentation: stage timers, counters and latency histograms.
+
+    stage() records wall and CPU time (CPU of the calling thread) per named
+    stage. Stages may nest, so a parent's time includes its children's.
+    Parser worker processes have their own instance; they send snapshot()
+    back with each result and the main process merge()s it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}        # name -> [calls, wall seconds, cpu seconds]
+            self.counters = Counter()
+            self.latencies = {}     # name -> LatencyHistogram
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add_stage(self, name: str, wall: float, cpu: float, calls: int = 1):
+        with self.lock:
+            totals = self.stages.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += calls
+            totals[1] += wall
+            totals[2] += cpu
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def observe(self, name: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def snapshot(self) -> Dict:
+        """Everything recorded since the last snapshot, and start over (used by worker processes)"""
+        with self.lock:
+            snapshot = {'stages': self.stages, 'counters': dict(self.counters), 'latencies': self.latencies}
+            self.stages, self.counters, self.latencies = {}, Counter(), {}
+        return snapshot
+
+    def merge(self, snapshot: Dict):
+        for name, (calls, wall, cpu) in snapshot['stages'].items():
+            self.add_stage(name, wall, cpu, calls)
+        with self.lock:
+            self.counters.update(snapshot['counters'])
+            for name, histogram in snapshot['latencies'].items():
+                self.latencies.setdefault(name, LatencyHistogram()).merge(histogram)
+
+    def report(self, gauges: Dict[str, float] = None) -> Dict:
+        """JSON-ready run report; gauges are point-in-time values such as cache sizes"""
+        with self.lock:
+            elapsed = time.time() - self.started
+            counters = dict(self.counters)
+            stages = {
+                name: {'calls': calls, 'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6)}
+                for name, (calls, wall, cpu) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            }
+            latencies = {}
+            for name, histogram in sorted(self.latencies.items()):
+                latencies[name] = {
+                    'count': histogram.count,
+                    'sum_seconds': round(histogram.sum, 6),
+                    'p50': round(histogram.percentile(0.50), 6),
+                    'p95': round(histogram.percentile(0.95), 6),
+                    'p99': round(histogram.percentile(0.99), 6),
+                    'max': round(histogram.max, 6),
+                    'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, histogram.buckets)}
+                }
+
+        pages = counters.get('pages_parsed', 0)
+        items_seen = sum(counters.get(key, 0) for key in ('items_exact', 'items_fuzzy', 'items_missing'))
+        return {
+            'started': self.started,
+            'elapsed_seconds': round(elapsed, 3),
+            'pages_per_second': round(pages / elapsed, 3) if elapsed else 0.0,
+            'item_hit_rate': round((items_seen - counters.get('items_missing', 0)) / items_seen, 4)
+                             if items_seen else None,
+            'stages': stages,
+            'counters': counters,
+            'latencies': latencies,
+            'gauges': dict(gauges or {})
+        }
+
+    def write_json(self, path: str, report: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def write_prometheus(self, path: str, report: Dict):
+        """Write the report in the Prometheus text exposition format (for node_exporter's textfile collector)"""
+        prefix = METRIC_PREFIX
+        lines = [
+            f"# TYPE {prefix}_run_seconds gauge",
+            f"{prefix}_run_seconds {report['elapsed_seconds']}",
+            f"# TYPE {prefix}_pages_per_second gauge",
+            f"{prefix}_pages_per_second {report['pages_per_second']}",
+            f"# TYPE {prefix}_stage_calls_total counter",
+            f"# TYPE {prefix}_stage_wall_seconds_total counter",
+            f"# TYPE {prefix}_stage_cpu_seconds_total counter",
+        ]
+        for name, stage in report['stages'].items():
+            label = f'{{stage="{name}"}}'
+            lines.append(f"{prefix}_stage_calls_total{label} {stage['calls']}")
+            lines.append(f"{prefix}_stage_wall_seconds_total{label} {stage['wall_seconds']}")
+            lines.append(f"{prefix}_stage_cpu_seconds_total{label} {stage['cpu_seconds']}")
+
+        for name, value in sorted(report['counters'].items()):
+            metric = f"{prefix}_{LABEL_RE.sub('_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in sorted(report['gauges'].items()):
+            metric = f"{prefix}_{LABEL_RE.sub('_', name)}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+        metric = f"{prefix}_request_latency_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for name, histogram in report['latencies'].items():
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'{metric}_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{endpoint="{name}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{metric}_sum{{endpoint="{name}"}} {histogram["sum_seconds"]}')
+            lines.append(f'{metric}_count{{endpoint="{name}"}} {histogram["count"]}')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+# One registry per process
+METRICS = Metrics()
+
+
+def timed(name: str):
+    """Decorator recording every call of a function as the named stage"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
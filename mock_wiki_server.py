@@ -0,0 +1,730 @@
+# mock_wiki_server.py
+"""Local stand-in for the wiki's api.php, for testing and load-testing the fetch path offline.
+
+Serves action=parse (by page or oldid, or rendering posted wikitext) and action=query
+(categorymembers with cmcontinue, prop=revisions, prop=info, prop=imageinfo,
+normalization and redirects) from a fixture directory, and the fixture's
+images at /images/<file> with ETag/Last-Modified revalidation. It can inject latency, errors,
+dropped connections, 429s with Retry-After, maxlag errors, a request rate
+limit and a bandwidth cap.
+
+Usage:
+  python mock_wiki_server.py build mock_wiki --corpus bench_corpus/1k    (or --cache page_cache.sqlite)
+  python mock_wiki_server.py serve mock_wiki --latency lognormal:80,0.5 --throttle-rate 0.05
+  python run_scraper_improved.py --base-url http://127.0.0.1:8765 --no-cache
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from run_scraper_improved import TROOP_CATEGORIES
+
+# --- Configuration ---
+MOCK_FIXTURE_DIR = 'mock_wiki'
+MOCK_PORT = 8765
+CATEGORY_LIMIT = 500          # Members per categorymembers response for cmlimit=max, like MediaWiki
+TITLES_LIMIT = 50             # Titles per action=query request, like MediaWiki without apihighlimits
+SEND_CHUNK = 16 * 1024        # Bytes written at a time under a bandwidth cap
+# --- End Configuration ---
+
+PAGES_FILE = 'pages.jsonl'
+REDIRECTS_FILE = 'redirects.json'
+CATEGORIES_FILE = 'categories.json'
+CATEGORY_PREFIX = 'Category:'
+FILE_PREFIX = 'File:'
+IMAGES_DIR = 'images'
+IMAGES_PATH = '/images/'
+TOUCHED = '2026-01-01T00:00:00Z'
+# The fixed shapes of benchmark_suite.py's synthetic pages
+CORPUS_WAGES_RE = re.compile(r'data-source="Wages">.*?<div class="pi-data-value">(.*?)</div>', re.DOTALL)
+CORPUS_TIER_RE = re.compile(r'tier-(\w+)')
+CORPUS_ROW_RE = re.compile(r'<tr>\s*<th>(.*?)\s*</th>\s*<td>(.*?)\s*</td></tr>', re.DOTALL)
+IMAGE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+               '.webp': 'image/webp', '.svg': 'image/svg+xml'}
+
+
+def normalize_title(title: str) -> str:
+    """MediaWiki title normalization: underscores become spaces and the first letter is capitalized"""
+    title = ' '.join(title.replace('_', ' ').split())
+    return title[:1].upper() + title[1:]
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """Parse a latency distribution in milliseconds and return a sampler of seconds.
+
+    Accepts 'fixed:MS', 'uniform:LOW,HIGH', 'normal:MEAN,SD' and
+    'lognormal:MEDIAN,SIGMA' (SIGMA is the shape, so 0.5-1.0 gives a long tail).
+    """
+    kind, _, values = spec.partition(':')
+    try:
+        numbers = [float(value) for value in values.split(',')] if values else []
+    except ValueError:
+        raise ValueError(f"bad latency spec '{spec}'")
+    arity = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+    if kind not in arity or len(numbers) != arity[kind]:
+        raise ValueError(f"bad latency spec '{spec}' (use fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD "
+                         f"or lognormal:MEDIAN,SIGMA)")
+
+    if kind == 'fixed':
+        return lambda rng: numbers[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(numbers[0], numbers[1]) / 1000
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(numbers[0], numbers[1])) / 1000
+    return lambda rng: rng.lognormvariate(math.log(max(numbers[0], 1e-3)), numbers[1]) / 1000
+
+
+class Link:
+    """Shared bandwidth cap: every response's chunks queue for the same simulated pipe"""
+
+    def __init__(self, bytes_per_second: float):
+        self.bytes_per_second = bytes_per_second
+        self.free_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def send_time(self, size: int) -> float:
+        """Reserve the pipe for size bytes; returns when the last byte is through"""
+        with self.lock:
+            start = max(time.monotonic(), self.free_at)
+            self.free_at = start + size / self.bytes_per_second
+            return self.free_at
+
+
+class MockWiki:
+    """Fixture pages, redirects and categories, answering MediaWiki API requests.
+
+    A fixture directory holds pages.jsonl (one {title, revid, wikitext, html}
+    per line), plus optional redirects.json ({from: to}) and categories.json
+    ({category: [member titles]}, where members named "Category:..." are
+    subcategories), and an optional images/ directory of uploaded files.
+    Responses follow MediaWiki's shapes closely enough for
+    the scraper: formatversion=2 for queries, and the legacy {'*': ...}
+    fields for page parses unless formatversion=2 is asked for.
+    """
+
+    def __init__(self, fixture_dir: str):
+        self.pages = {}
+        with open(os.path.join(fixture_dir, PAGES_FILE), 'r', encoding='utf-8') as f:
+            for pageid, line in enumerate(f, 1):
+                page = json.loads(line)
+                page.setdefault('pageid', pageid)
+                page.setdefault('touched', TOUCHED)
+                self.pages[page['title']] = page
+
+        self.redirects = self.read_optional(fixture_dir, REDIRECTS_FILE)
+        self.categories = self.read_optional(fixture_dir, CATEGORIES_FILE)
+        self.pages_by_revid = {page['revid']: page for page in self.pages.values()}
+        # Rendering posted wikitext looks the HTML up by the page's source
+        self.html_by_wikitext = {page['wikitext'].strip(): page['html'] for page in self.pages.values()
+                                 if page.get('wikitext')}
+
+        self.images_dir = os.path.join(fixture_dir, IMAGES_DIR)
+        self.images = set(os.listdir(self.images_dir)) if os.path.isdir(self.images_dir) else set()
+        # imageinfo URLs are absolute, as on the wiki; the server sets this once it knows its address
+        self.image_base_url = IMAGES_PATH
+
+    def image_url(self, name: str) -> str:
+        return self.image_base_url + quote(name.replace(' ', '_'))
+
+    def read_image(self, name: str) -> Optional[Tuple[bytes, float]]:
+        """(bytes, modification time) of an uploaded file, or None"""
+        name = normalize_title(unquote(name))
+        if name not in self.images:
+            return None
+        path = os.path.join(self.images_dir, name)
+        with open(path, 'rb') as f:
+            return f.read(), os.path.getmtime(path)
+
+    @staticmethod
+    def read_optional(fixture_dir: str, filename: str) -> Dict:
+        path = os.path.join(fixture_dir, filename)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def handle(self, params: Dict[str, str]) -> Dict:
+        action = params.get('action')
+        if action == 'query':
+            return self.query(params)
+        if action == 'parse':
+            return self.parse(params)
+        return self.error('badvalue', f'Unrecognized value for parameter "action": {action}.')
+
+    @staticmethod
+    def error(code: str, info: str) -> Dict:
+        return {'error': {'code': code, 'info': info}}
+
+    def parse(self, params: Dict[str, str]) -> Dict:
+        version2 = params.get('formatversion') == '2'
+        props = params.get('prop', 'text').split('|')
+
+        if 'text' in params:
+            html = self.render(params['text'])
+            title = normalize_title(params.get('title', 'API'))
+            return {'parse': {'title': title, 'pageid': 0, 'text': html if version2 else {'*': html}}}
+
+        if 'oldid' in params:
+            # Only the current revision of each page is kept
+            page = self.pages_by_revid.get(int(params['oldid'])) if params['oldid'].isdigit() else None
+            if page is None:
+                return self.error('nosuchrevid', f"There is no revision with ID {params['oldid']}.")
+        else:
+            title = normalize_title(params.get('page', ''))
+            if 'redirects' in params:
+                title = self.redirects.get(title, title)
+            page = self.pages.get(title)
+            if page is None:
+                return self.error('missingtitle', "The page you specified doesn't exist.")
+
+        parsed = {'title': page['title'], 'pageid': page['pageid'], 'revid': page['revid']}
+        if 'text' in props:
+            parsed['text'] = page['html'] if version2 else {'*': page['html']}
+        if 'wikitext' in props:
+            parsed['wikitext'] = page['wikitext'] if version2 else {'*': page['wikitext']}
+        return {'parse': parsed}
+
+    def render(self, text: str) -> str:
+        """Render posted wikitext: a known page source becomes its page's HTML, anything else is escaped"""
+        wikitext = text.strip()
+        html = self.html_by_wikitext.get(wikitext)
+        if html is None:
+            escaped = wikitext.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            html = f'<div class="mw-parser-output"><p>{escaped}</p></div>' if wikitext else ''
+        return html
+
+    def query(self, params: Dict[str, str]) -> Dict:
+        if params.get('list') == 'categorymembers':
+            return self.category_members(params)
+        if 'titles' in params:
+            return self.query_titles(params)
+        return self.error('missingparam', 'One of the parameters "titles" or "list" is required.')
+
+    def category_members(self, params: Dict[str, str]) -> Dict:
+        category = normalize_title(params.get('cmtitle', ''))
+        if category.startswith(CATEGORY_PREFIX):
+            category = category[len(CATEGORY_PREFIX):]
+        members = self.categories.get(category, [])
+        types = params.get('cmtype', 'page|subcat').split('|')
+        members = [title for title in members
+                   if ('subcat' if title.startswith(CATEGORY_PREFIX) else 'page') in types]
+
+        limit = CATEGORY_LIMIT if params.get('cmlimit', 'max') == 'max' else int(params['cmlimit'])
+        offset = int(params.get('cmcontinue', 'page|0').rsplit('|', 1)[1])
+        chunk = members[offset:offset + limit]
+
+        response = {
+            'batchcomplete': True,
+            'query': {'categorymembers': [
+                {'pageid': self.pages.get(title, {}).get('pageid', 0),
+                 'ns': 14 if title.startswith(CATEGORY_PREFIX) else 0,
+                 'title': title}
+                for title in chunk
+            ]}
+        }
+        if offset + limit < len(members):
+            response['continue'] = {'cmcontinue': f'page|{offset + limit}', 'continue': '-||'}
+        return response
+
+    def query_titles(self, params: Dict[str, str]) -> Dict:
+        titles = params['titles'].split('|')
+        if len(titles) > TITLES_LIMIT:
+            return self.error('toomanyvalues', f'Too many values supplied for parameter "titles". '
+                                               f'The limit is {TITLES_LIMIT}.')
+        props = params.get('prop', '').split('|')
+        content = 'content' in params.get('rvprop', 'ids|timestamp|flags|comment|user').split('|')
+
+        query = {'normalized': [], 'redirects': [], 'pages': []}
+        seen = set()
+        for title in titles:
+            normalized = normalize_title(title)
+            if normalized != title:
+                query['normalized'].append({'from': title, 'to': normalized})
+            target = normalized
+            if 'redirects' in params and target in self.redirects:
+                target = self.redirects[target]
+                query['redirects'].append({'from': normalized, 'to': target})
+            if target in seen:
+                continue
+            seen.add(target)
+
+            if target.startswith(FILE_PREFIX):
+                query['pages'].append(self.file_page(target, props))
+                continue
+            page = self.pages.get(target)
+            if page is None:
+                query['pages'].append({'ns': 0, 'title': target, 'missing': True})
+                continue
+            entry = {'pageid': page['pageid'], 'ns': 0, 'title': page['title']}
+            if 'revisions' in props:
+                revision = {'revid': page['revid'], 'parentid': 0}
+                if content:
+                    revision['slots'] = {'main': {'contentmodel': 'wikitext', 'contentformat': 'text/x-wiki',
+                                                  'content': page['wikitext']}}
+                entry['revisions'] = [revision]
+            if 'info' in props:
+                entry.update({'contentmodel': 'wikitext', 'touched': page['touched'],
+                              'lastrevid': page['revid'], 'length': len(page['wikitext'].encode('utf-8'))})
+            query['pages'].append(entry)
+
+        return {'batchcomplete': True, 'query': {key: value for key, value in query.items() if value}}
+
+    def file_page(self, title: str, props: List[str]) -> Dict:
+        name = normalize_title(title[len(FILE_PREFIX):])
+        title = FILE_PREFIX + name
+        if name not in self.images:
+            return {'ns': 6, 'title': title, 'missing': True, 'imagerepository': ''}
+        entry = {'ns': 6, 'title': title, 'imagerepository': 'local'}
+        if 'imageinfo' in props:
+            entry['imageinfo'] = [{'url': self.image_url(name),
+                                   'descriptionurl': f'/wiki/{quote(title.replace(" ", "_"))}'}]
+        return entry
+
+
+class MockWikiServer(ThreadingHTTPServer):
+    """Threaded HTTP server for a MockWiki at /api.php, with fault injection.
+
+    Each request first waits out a sampled latency, then may be refused: by
+    the rate limit (429 with Retry-After), at random with a 429, with a
+    server error, by a dropped connection, or with a maxlag error when the
+    simulated replication lag exceeds the request's maxlag. Responses are
+    gzipped when the client accepts it, and pushed through a shared pipe of
+    bandwidth bytes per second when a cap is set.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, wiki: MockWiki, host: str = '127.0.0.1', port: int = MOCK_PORT,
+                 latency: str = 'fixed:0', error_rate: float = 0.0, error_statuses=(500, 502, 503, 504),
+                 drop_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 1.0,
+                 max_rps: float = 0.0, lag: float = 0.0, bandwidth: float = 0.0,
+                 compress: bool = True, seed: int = None, verbose: bool = False):
+        super().__init__((host, port), MockWikiHandler)
+        self.wiki = wiki
+        self.sample_latency = latency_sampler(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.drop_rate = drop_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.lag = lag
+        self.link = Link(bandwidth) if bandwidth > 0 else None
+        self.compress = compress
+        self.verbose = verbose
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Server-side rate limit as a token bucket that refuses instead of waiting
+        self.max_rps = max_rps
+        self.tokens = max(1.0, max_rps)
+        self.tokens_at = time.monotonic()
+
+        self.stats = Counter()
+        self.thread = None
+        self.wiki.image_base_url = f"{self.url}{IMAGES_PATH}"
+
+    @property
+    def url(self) -> str:
+        """Base URL to give the scraper"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockWikiServer':
+        """Serve from a background thread (for use inside tests and benchmarks)"""
+        self.thread = threading.Thread(target=self.serve_forever, name='mock-wiki', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def take_token(self) -> float:
+        """0 if a request may proceed under max_rps, otherwise the seconds until it may"""
+        if self.max_rps <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(max(1.0, self.max_rps), self.tokens + (now - self.tokens_at) * self.max_rps)
+            self.tokens_at = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.max_rps
+
+    def decide(self, params: Dict[str, str]) -> Tuple[str, Optional[float]]:
+        """Which fault (or 'ok') to answer with, plus a Retry-After for throttles"""
+        wait = self.take_token()
+        if wait:
+            return 'ratelimit', max(1.0, math.ceil(wait))
+        if self.roll() < self.drop_rate:
+            return 'drop', None
+        if self.roll() < self.throttle_rate:
+            return 'throttle', self.retry_after
+        if self.roll() < self.error_rate:
+            return 'error', None
+        maxlag = params.get('maxlag')
+        if self.lag and maxlag and self.lag > float(maxlag):
+            return 'maxlag', max(1.0, self.retry_after)
+        return 'ok', None
+
+    def count(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                self.stats[key] += 1
+
+
+class MockWikiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # Keep-alive, so the client's connection pool is exercised
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            with self.server.lock:
+                stats = dict(self.server.stats)
+            self.respond(200, json.dumps(stats, indent=2).encode('utf-8'))
+            return
+        if url.path.startswith(IMAGES_PATH):
+            self.image(url.path[len(IMAGES_PATH):])
+            return
+        self.api(url.path, url.query)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.api(urlsplit(self.path).path, self.rfile.read(length).decode('utf-8'))
+
+    def api(self, path: str, query: str):
+        server = self.server
+        if path != '/api.php':
+            self.respond(404, b'Not Found', 'text/plain')
+            return
+        params = {key: values[-1] for key, values in parse_qs(query, keep_blank_values=True).items()}
+        action = params.get('action', 'none')
+
+        time.sleep(server.sample_latency(server.rng))
+        outcome, retry_after = server.decide(params)
+        server.count('requests', f'action:{action}', f'outcome:{outcome}')
+
+        if outcome == 'drop':
+            # Close without a response; the client sees a connection error
+            self.close_connection = True
+            return
+        headers = {}
+        if retry_after is not None and retry_after > 0:
+            headers['Retry-After'] = str(int(math.ceil(retry_after)))
+        if outcome in ('ratelimit', 'throttle'):
+            self.respond(429, b'Too Many Requests', 'text/plain', headers)
+            return
+        if outcome == 'error':
+            status = server.error_statuses[int(server.roll() * len(server.error_statuses))]
+            self.respond(status, b'<html><body>Server error</body></html>', 'text/html')
+            return
+        if outcome == 'maxlag':
+            data = MockWiki.error('maxlag', f'Waiting for a database server: {server.lag:g} seconds lagged.')
+            headers['X-Database-Lag'] = f'{server.lag:g}'
+        else:
+            data = server.wiki.handle(params)
+        self.respond(200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json', headers)
+
+    def image(self, name: str):
+        """An uploaded file, subject to the same latency and faults as the API; 304 when the client's copy is current"""
+        server = self.server
+        time.sleep(server.sample_latency(server.rng))
+        outcome, retry_after = server.decide({})
+        server.count('image_requests', f'image_outcome:{outcome}')
+        if outcome == 'drop':
+            self.close_connection = True
+            return
+        if outcome in ('ratelimit', 'throttle'):
+            headers = {'Retry-After': str(int(math.ceil(retry_after)))} if retry_after else {}
+            self.respond(429, b'Too Many Requests', 'text/plain', headers)
+            return
+        if outcome == 'error':
+            self.respond(503, b'Service Unavailable', 'text/plain')
+            return
+
+        image = server.wiki.read_image(name)
+        if image is None:
+            self.respond(404, b'Not Found', 'text/plain')
+            return
+        body, modified = image
+        headers = {'ETag': f'"{hashlib.sha1(body).hexdigest()}"', 'Last-Modified': formatdate(modified, usegmt=True),
+                   'Cache-Control': 'public, max-age=86400'}
+        if self.headers.get('If-None-Match') == headers['ETag'] or (
+                'If-None-Match' not in self.headers
+                and self.headers.get('If-Modified-Since') == headers['Last-Modified']):
+            server.count('image_not_modified')
+            self.respond(304, b'', None, headers)
+            return
+        extension = os.path.splitext(name)[1].lower()
+        self.respond(200, body, IMAGE_TYPES.get(extension, 'application/octet-stream'), headers, compress=False)
+
+    def respond(self, status: int, body: bytes, content_type: Optional[str] = 'application/json',
+                headers: Dict[str, str] = None, compress: bool = True):
+        if compress and body and self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+        self.send_response(status)
+        if content_type is not None:
+            charset = '; charset=utf-8' if content_type.startswith(('text/', 'application/json')) else ''
+            self.send_header('Content-Type', content_type + charset)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.send_header('Date', formatdate(usegmt=True))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if self.server.link is None:
+            self.wfile.write(body)
+        else:
+            for start in range(0, len(body), SEND_CHUNK):
+                chunk = body[start:start + SEND_CHUNK]
+                time.sleep(max(0.0, self.server.link.send_time(len(chunk)) - time.monotonic()))
+                self.wfile.write(chunk)
+        self.server.count(f'status:{status}')
+        with self.server.lock:
+            self.server.stats['bytes_sent'] += len(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def troop_wikitext(culture: str, upgrades_to: List[str], noble: bool, image_file: str = None,
+                   wages: str = None) -> str:
+    """A minimal troop infobox, enough for --wikitext, --discover and --images to read"""
+    lines = ['{{Troop box']
+    if image_file:
+        lines.append(f'|image file = {image_file}')
+    lines.append(f'|culture = [[{culture}]]')
+    if wages:
+        lines.append(f'|wages = {wages}')
+    if upgrades_to:
+        lines.append('|upgrades to = ' + '<br>'.join(f'[[{target}]]' for target in upgrades_to))
+    if noble:
+        lines.append('|acquired from = Noble troop')
+    lines.append('}}')
+    return '\n'.join(lines)
+
+
+def corpus_page_wikitext(title: str, culture: str, html: str) -> Tuple[Optional[str], str]:
+    """(wages, article wikitext) matching a benchmark_suite.py page's rendered HTML.
+
+    The article has the tier sentence and the Equipment wikitable with the
+    same cells, so --wikitext parses to the same troop as the HTML.
+    """
+    wages = CORPUS_WAGES_RE.search(html)
+    tier = CORPUS_TIER_RE.search(html)
+    lines = []
+    if tier:
+        lines.append(f"The '''{title}''' are tier-{tier.group(1)} troops of the [[{culture}]].")
+    equipment = html.find('id="Equipment"')
+    if equipment != -1:
+        table_end = html.find('</table>', equipment)
+        lines += ['', '==Equipment==', ":''Troops may spawn with these items in battle.''",
+                  '{| class="article-table"']
+        for index, (header, cell) in enumerate(CORPUS_ROW_RE.findall(html, equipment, table_end)):
+            if index:
+                lines.append('|-')
+            lines += [f'!{header}', '|' + cell.replace('<i>', "''").replace('</i>', "''")]
+        lines.append('|}')
+    return (wages.group(1) if wages else None), '\n'.join(lines)
+
+
+def placeholder_png(seed: int, size: int = 8) -> bytes:
+    """A small solid-colour PNG, different for every seed"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rgb = bytes(((seed * 97) % 256, (seed * 57) % 256, (seed * 31) % 256))
+    rows = b''.join(b'\x00' + rgb * size for _ in range(size))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+def portrait_images(titles: List[str]) -> Dict[str, bytes]:
+    """A portrait file per troop; every fourth is a byte-for-byte copy of the one before, as re-uploads are"""
+    images = {}
+    for index, title in enumerate(titles):
+        images[f'{title}.png'] = placeholder_png(index - 1 if index % 4 == 3 else index)
+    return images
+
+
+def pages_from_corpus(corpus_dir: str) -> List[Dict]:
+    """Pages of a benchmark_suite.py corpus, with wikitext built from its troop trees and HTML.
+
+    Every page gets a portrait: the infobox names "<title>.png" and the HTML
+    links it at /images/, relative to the server, like a protocol-relative
+    link on the wiki.
+    """
+    with open(os.path.join(corpus_dir, 'troop_trees.json'), 'r', encoding='utf-8') as f:
+        troop_trees = json.load(f)
+
+    children, nobles = {}, set()
+    for faction, trees in troop_trees.items():
+        for tree_type, paths in trees.items():
+            for path in paths:
+                if tree_type == 'noble':
+                    nobles.add(path[0])
+                for base, upgraded in zip(path, path[1:]):
+                    children.setdefault(base, [])
+                    if upgraded not in children[base]:
+                        children[base].append(upgraded)
+
+    pages = []
+    with gzip.open(os.path.join(corpus_dir, 'pages.jsonl.gz'), 'rt', encoding='utf-8') as f:
+        for revid, line in enumerate(f, 1000):
+            page = json.loads(line)
+            image_file = f"{page['title']}.png"
+            figure = (f'<figure class="pi-item pi-image" data-source="Image file">'
+                      f'<a href="{IMAGES_PATH}{quote(image_file.replace(" ", "_"))}" class="image image-thumbnail">'
+                      f'<img src="{IMAGES_PATH}{quote(image_file.replace(" ", "_"))}" class="pi-image-thumbnail" '
+                      f'data-image-name="{image_file}"/></a></figure>')
+            wages, article = corpus_page_wikitext(page['title'], page['faction'], page['html'])
+            pages.append({
+                'title': page['title'],
+                'revid': revid,
+                'wikitext': troop_wikitext(page['faction'], children.get(page['title'], []),
+                                           page['title'] in nobles, image_file, wages) + '\n' + article,
+                'html': page['html'].replace('class="portable-infobox">', 'class="portable-infobox">' + figure, 1)
+            })
+    return pages
+
+
+def pages_from_cache(cache_path: str) -> List[Dict]:
+    """The newest cached revision of every page that has both wikitext and HTML"""
+    conn = sqlite3.connect(cache_path)
+    pages = {}
+    for title, revid, wikitext, html in conn.execute(
+            "SELECT title, revid, wikitext, html FROM pages WHERE wikitext != '' AND html != '' "
+            "ORDER BY title, revid"):
+        pages[title] = {'title': title, 'revid': revid, 'wikitext': wikitext, 'html': html}
+    conn.close()
+    return list(pages.values())
+
+
+def build_fixture(output_dir: str, pages: List[Dict], category: str = TROOP_CATEGORIES[0],
+                  images: Dict[str, bytes] = None):
+    """Write a fixture directory; every page goes into the troop category so --discover finds it"""
+    os.makedirs(output_dir, exist_ok=True)
+    if images:
+        os.makedirs(os.path.join(output_dir, IMAGES_DIR), exist_ok=True)
+        for name, content in images.items():
+            with open(os.path.join(output_dir, IMAGES_DIR, normalize_title(name)), 'wb') as f:
+                f.write(content)
+    with open(os.path.join(output_dir, PAGES_FILE), 'w', encoding='utf-8') as f:
+        for page in pages:
+            f.write(json.dumps(page, ensure_ascii=False) + '\n')
+    with open(os.path.join(output_dir, CATEGORIES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({category: [page['title'] for page in pages]}, f, indent=2)
+    # A couple of lower-case redirects, as the wiki has for many troops
+    redirects = {}
+    for page in pages[:2]:
+        redirects[page['title'].lower().capitalize()] = page['title']
+    redirects = {source: target for source, target in redirects.items() if source != target}
+    with open(os.path.join(output_dir, REDIRECTS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(redirects, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the wiki's MediaWiki API")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Build a fixture directory")
+    build.add_argument('output', nargs='?', default=MOCK_FIXTURE_DIR,
+                       help=f"Fixture directory (default: {MOCK_FIXTURE_DIR})")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument('--corpus', help="A benchmark_suite.py corpus directory")
+    source.add_argument('--cache', help="A page cache database")
+
+    serve = subparsers.add_parser('serve', help="Serve a fixture directory at http://HOST:PORT/api.php")
+    serve.add_argument('fixture', nargs='?', default=MOCK_FIXTURE_DIR,
+                       help=f"Fixture directory (default: {MOCK_FIXTURE_DIR})")
+    serve.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=MOCK_PORT, help=f"Port (default: {MOCK_PORT})")
+    serve.add_argument('--latency', default='fixed:0',
+                       help="Latency in ms: fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MEDIAN,SIGMA "
+                            "(default: fixed:0)")
+    serve.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 5xx")
+    serve.add_argument('--error-statuses', default='500,502,503,504',
+                       help="Statuses used by --error-rate (default: 500,502,503,504)")
+    serve.add_argument('--drop-rate', type=float, default=0.0,
+                       help="Fraction of requests whose connection is closed without a response")
+    serve.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests answered with a 429")
+    serve.add_argument('--retry-after', type=float, default=1.0,
+                       help="Retry-After seconds sent with injected 429s, 0 to leave it out (default: 1)")
+    serve.add_argument('--max-rps', type=float, default=0.0,
+                       help="Requests per second allowed before answering 429 with Retry-After (default: no limit)")
+    serve.add_argument('--lag', type=float, default=0.0,
+                       help="Simulated replication lag in seconds; requests with a lower maxlag get a maxlag error")
+    serve.add_argument('--bandwidth', type=float, default=0.0,
+                       help="Total bandwidth cap in KB/s shared by all connections (default: no cap)")
+    serve.add_argument('--no-gzip', action='store_true', help="Never compress responses")
+    serve.add_argument('--seed', type=int, help="Random seed for latency and fault injection")
+    serve.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        pages = pages_from_corpus(args.corpus) if args.corpus else pages_from_cache(args.cache)
+        if not pages:
+            print("No pages with both wikitext and HTML found; nothing to build.")
+            return
+        # Cached pages link the wiki's real image server, so only corpus fixtures get images
+        images = portrait_images([page['title'] for page in pages]) if args.corpus else None
+        build_fixture(args.output, pages, images=images)
+        print(f"✓ Built a fixture of {len(pages)} pages{' with portraits' if images else ''} in '{args.output}'")
+        return
+
+    try:
+        latency_sampler(args.latency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = MockWikiServer(MockWiki(args.fixture), host=args.host, port=args.port, latency=args.latency,
+                            error_rate=args.error_rate,
+                            error_statuses=[int(status) for status in args.error_statuses.split(',')],
+                            drop_rate=args.drop_rate, throttle_rate=args.throttle_rate,
+                            retry_after=args.retry_after, max_rps=args.max_rps, lag=args.lag,
+                            bandwidth=args.bandwidth * 1024, compress=not args.no_gzip,
+                            seed=args.seed, verbose=args.verbose)
+    print(f"Serving {len(server.wiki.pages)} pages at {server.url}/api.php (stats at {server.url}/stats)")
+    print(f"Scrape it with: python run_scraper_improved.py --base-url {server.url} --no-cache")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\nRequests served:")
+        for key, value in sorted(server.stats.items()):
+            print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
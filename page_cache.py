@@ -0,0 +1,158 @@
+# page_cache.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# --- Configuration ---
+PAGE_CACHE_DB = 'page_cache.sqlite'
+PAGE_CACHE_MAX_MB = 200        # Disk cap; least recently used pages are evicted past this
+PAGE_CACHE_TTL_HOURS = 24.0    # How long a page is trusted without asking the wiki for its revision
+PAGE_CACHE_MEMORY_ENTRIES = 256
+# --- End Configuration ---
+
+
+class PageCache:
+    """Persistent page cache keyed by (title, revision id) with an in-memory LRU in front.
+
+    Entries looked up by revision id are always valid, since a revision never
+    changes. Lookups without a revision id only return pages younger than the
+    TTL, unless allow_stale is set (used by offline mode).
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_DB, max_mb: float = PAGE_CACHE_MAX_MB,
+                 ttl_hours: float = PAGE_CACHE_TTL_HOURS,
+                 memory_entries: int = PAGE_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl_hours * 3600
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # title -> entry, most recently used last
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                title TEXT NOT NULL,
+                revid INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                html TEXT NOT NULL,
+                wikitext TEXT NOT NULL,
+                PRIMARY KEY (title, revid)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, title: str, revid: int = None, allow_stale: bool = False) -> Optional[Dict]:
+        """Return {'html', 'wikitext', 'revid'} for a cached page, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(title)
+            if entry is None or (revid is not None and entry['revid'] != revid):
+                entry = self._load(title, revid)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if revid is not None:
+                # The wiki just confirmed this revision is current
+                entry['fetched_at'] = now
+            elif not allow_stale and now - entry['fetched_at'] > self.ttl:
+                self.misses += 1
+                return None
+
+            self.conn.execute(
+                "UPDATE pages SET accessed_at = ?, fetched_at = ? WHERE title = ? AND revid = ?",
+                (now, entry['fetched_at'], title, entry['revid'])
+            )
+            self.conn.commit()
+            self._remember(title, entry)
+            self.hits += 1
+            return {'html': entry['html'], 'wikitext': entry['wikitext'], 'revid': entry['revid']}
+
+    def put(self, title: str, page: Dict):
+        """Store a fetched page; older revisions of the same title are dropped.
+
+        A wikitext-only page (from discovery or wikitext mode) keeps the
+        rendered HTML already cached for the same revision.
+        """
+        if not page.get('html') and not page.get('wikitext'):
+            return
+
+        now = time.time()
+        entry = {
+            'revid': page.get('revid') or 0,
+            'fetched_at': now,
+            'html': page.get('html', ''),
+            'wikitext': page.get('wikitext', '')
+        }
+
+        with self.lock:
+            if not entry['html'] and entry['revid']:
+                row = self.conn.execute(
+                    "SELECT html FROM pages WHERE title = ? AND revid = ?", (title, entry['revid'])
+                ).fetchone()
+                if row:
+                    entry['html'] = row[0]
+            size = len(entry['html'].encode('utf-8')) + len(entry['wikitext'].encode('utf-8'))
+            old_size = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM pages WHERE title = ?", (title,)
+            ).fetchone()[0]
+            self.conn.execute("DELETE FROM pages WHERE title = ?", (title,))
+            self.conn.execute(
+                "INSERT INTO pages (title, revid, fetched_at, accessed_at, size, html, wikitext) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (title, entry['revid'], now, now, size, entry['html'], entry['wikitext'])
+            )
+            self.total_bytes += size - old_size
+            self._evict()
+            self.conn.commit()
+            self._remember(title, entry)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _load(self, title: str, revid: Optional[int]) -> Optional[Dict]:
+        if revid is None:
+            row = self.conn.execute(
+                "SELECT revid, fetched_at, html, wikitext FROM pages WHERE title = ? "
+                "ORDER BY fetched_at DESC LIMIT 1", (title,)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT revid, fetched_at, html, wikitext FROM pages WHERE title = ? AND revid = ?",
+                (title, revid)
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {'revid': row[0], 'fetched_at': row[1], 'html': row[2], 'wikitext': row[3]}
+
+    def _remember(self, title: str, entry: Dict):
+        self.memory[title] = entry
+        self.memory.move_to_end(title)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop least recently used pages until the cache fits in max_bytes"""
+        while self.total_bytes > self.max_bytes:
+            row = self.conn.execute(
+                "SELECT title, revid, size FROM pages ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.total_bytes = 0
+                return
+            title, revid, size = row
+            self.conn.execute("DELETE FROM pages WHERE title = ? AND revid = ?", (title, revid))
+            self.memory.pop(title, None)
+            self.total_bytes -= size
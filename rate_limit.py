@@ -0,0 +1,112 @@
+# rate_limit.py
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket that caps how fast requests are sent to the wiki"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        # rate is tokens per second; a rate of 0 or less disables limiting
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until enough tokens are available, then consume them"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """AIMD governor for request rate and concurrency, driven by server responses.
+
+    Each success adds a little to the rate and to the number of requests
+    allowed in flight (additive increase). A throttling response (429, 503,
+    maxlag) halves both (multiplicative decrease) and pauses every sender
+    until the server's Retry-After has passed. A rate of 0 leaves the rate
+    unlimited until the first throttling response, which starts it at the
+    observed request rate.
+    """
+
+    def __init__(self, rate: float, max_concurrency: int, min_rate: float = 0.5,
+                 increase: float = 0.1, decrease: float = 0.5):
+        self.bucket = TokenBucket(rate, capacity=max_concurrency)
+        self.max_rate = rate if rate > 0 else None
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+        self.started = time.monotonic()
+        self.sent = 0
+        self.throttled = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def acquire(self):
+        """Wait for a concurrency slot, any server-requested pause and a rate token"""
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                elif self.in_flight >= int(self.concurrency):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+            self.sent += 1
+        self.bucket.acquire()
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def success(self):
+        """Additive increase after a response the server was happy with"""
+        with self.condition:
+            if self.concurrency < self.max_concurrency:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                self.condition.notify()
+            if self.bucket.rate > 0:
+                ceiling = self.max_rate or float('inf')
+                self.bucket.rate = min(ceiling, self.bucket.rate + self.increase)
+
+    def throttle(self, retry_after: float = 0.0):
+        """Multiplicative decrease, plus a pause for everyone when the server asked for one"""
+        with self.condition:
+            self.throttled += 1
+            self.concurrency = max(1.0, self.concurrency * self.decrease)
+            current = self.bucket.rate
+            if current <= 0:
+                elapsed = max(time.monotonic() - self.started, 1.0)
+                current = self.sent / elapsed
+            self.bucket.rate = max(self.min_rate, current * self.decrease)
+            if retry_after > 0:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.condition.notify_all()
@@ -1,24 +1,471 @@
 # run_scraper_improved.py
-import requests
 import re
 import json
-from bs4 import BeautifulSoup
-from typing import Dict, List, Tuple
-import time
+from bs4 import BeautifulSoup, NavigableString
+from typing import Dict, Iterable, List, Mapping, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter, deque
+import argparse
 import os
+import queue
+import threading
+import time
+from urllib.parse import urljoin
+
+from wikitext_parser import INFOBOX_TEMPLATES, find_template, link_targets, read_equipment_rows, strip_markup
+from item_map_binary import CompactItemMap, ITEM_MAP_BIN, write_item_map_binary
+from item_resolver import ItemResolver
+from item_search import file_sha256
+from metrics import METRICS, RUN_REPORT_JSON, RUN_REPORT_PROM, timed
+from page_cache import PageCache, PAGE_CACHE_DB, PAGE_CACHE_MAX_MB, PAGE_CACHE_TTL_HOURS
+from scrape_journal import SCRAPE_JOURNAL, ScrapeJournal
+from sql_writer import SQL_BATCH_SIZE, SqlWriter, read_head
+from sqlite_backend import SQLITE_DB, SqliteBackend
+from troop_images import IMAGE_DIR, IMAGE_MANIFEST, IMAGE_WORKERS, TroopImages
+from troop_store import EquipmentLinks, TroopStore
+from upgrade_graph import UpgradeGraph
+from work_queue import LEASE_SECONDS, SHARD_SIZE, WORK_QUEUE_DB, WorkQueue, default_worker_id
+from wiki_client import MAX_RETRIES, REQUEST_TIMEOUT, WikiClient
 
 # --- Configuration ---
 ITEM_MAP_JSON = 'item_map.json'
+WIKI_BASE_URL = 'https://mountandblade.fandom.com'  # Point at mock_wiki_server.py to test without the network
+MAX_CONCURRENT_REQUESTS = 4   # Pages fetched in parallel
+REQUESTS_PER_SECOND = 4.0     # Token-bucket limit on API calls (0 disables it)
+BATCH_SIZE = 50               # Titles per action=query request (MediaWiki caps this at 50)
+SCRAPE_STATE_JSON = 'scrape_state.json'  # Per-page revisions and parsed results for --incremental
+PARSE_WORKERS = os.cpu_count() or 1      # Parser processes; 0 parses in the main process
+PIPELINE_QUEUE_SIZE = 64                 # Raw pages buffered between the fetchers and the parsers
+SQL_OUTPUT = 'bannerlord_troops.sql'     # A .gz suffix writes gzip-compressed SQL
+TROOP_CATEGORIES = ['Bannerlord troops'] # Categories (and their subcategories) that seed --discover
+PROFILE_OUTPUT = 'scrape_profile.prof'   # cProfile stats written by --profile
+PROFILE_TOP = 25                         # Functions and allocation sites listed by --profile
+PROFILE_TRACE_FRAMES = 1                 # Stack frames tracemalloc keeps per allocation
+WORKER_POLL_SECONDS = 30.0               # Longest a --worker waits before checking the queue again
 # --- End Configuration ---
 
-class BannerlordTroopScraper:
-    def __init__(self):
-        self.base_url = "https://mountandblade.fandom.com"
+# Static rows written to both the SQL file and the SQLite database
+ATTRIBUTES = ['Vigor', 'Control', 'Endurance', 'Cunning', 'Social', 'Intelligence']
+SKILLS = [
+    ('One Handed', True, 1), ('Two Handed', True, 1), ('Polearm', True, 1),
+    ('Bow', True, 2), ('Crossbow', True, 2), ('Throwing', True, 2),
+    ('Riding', True, 3), ('Athletics', True, 3),
+    ('Tactics', False, 4), ('Scouting', False, 4), ('Roguery', False, 4),
+    ('Charm', False, 5), ('Leadership', False, 5), ('Trade', False, 5),
+    ('Steward', False, 6), ('Medicine', False, 6), ('Engineering', False, 6)
+]
+
+# The closure table is new to the SQL output, so the file creates it rather than assume the schema has it
+UPGRADE_CLOSURE_DDL = """CREATE TABLE IF NOT EXISTS Troop_Upgrade_Closure (
+  ancestor_troop_id INTEGER NOT NULL,
+  descendant_troop_id INTEGER NOT NULL,
+  distance INTEGER NOT NULL,
+  PRIMARY KEY (ancestor_troop_id, descendant_troop_id)
+);"""
+
+TIER_RE = re.compile(r'tier-(\w+)', re.IGNORECASE)
+WAGE_RE = re.compile(r'(\d+)\s*denars?/day', re.IGNORECASE)
+
+# BeautifulSoup backend; lxml parses several times faster when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# MediaWiki suffixes repeated heading ids (Equipment_2, ...) when pages are rendered together
+EQUIPMENT_HEADER_ID = re.compile(r'^Equipment(_\d+)?$')
+# Fandom serves thumbnails as <original>/scale-to-width-down/<px>; dropping it gives the full-size file
+SCALED_IMAGE_RE = re.compile(r'/scale-to-width-down/\d+')
+IMAGE_FILE_RE = re.compile(r'(?:(?:File|Image):)?\s*([^\[\]|{}<>\n:]+\.(?:png|jpe?g|gif|webp|svg))', re.IGNORECASE)
+
+CATEGORY_NAMESPACE = 14
+
+def attribute_rows() -> List[Tuple]:
+    return [(idx, attr, 'Base character attribute') for idx, attr in enumerate(ATTRIBUTES, 1)]
+
+def skill_rows() -> List[Tuple]:
+    return [(idx, skill_name, f"{skill_name} skill", is_combat, attr_id)
+            for idx, (skill_name, is_combat, attr_id) in enumerate(SKILLS, 1)]
+
+class TroopPageParser:
+    """Turns fetched troop pages into troop records and (item_id, slot) equipment links.
+    
+    Holds no scrape-wide state, so it can run inside parser worker processes.
+    """
+    def __init__(self, item_map: Mapping):
+        self.item_map = item_map
+        self.item_resolver = ItemResolver(item_map)
+    
+    @timed('equipment_table')
+    def read_equipment_table(self, soup: BeautifulSoup) -> List[Tuple[str, str, List[str]]]:
+        """Walk the Equipment table once, returning (slot header, cell text, item names) per row"""
+        equipment_header = soup.find('span', {'id': EQUIPMENT_HEADER_ID})
+        if not equipment_header:
+            return []
+        
+        equipment_section = equipment_header.find_parent(['h2', 'h3'])
+        if not equipment_section:
+            return []
+        
+        equipment_table = equipment_section.find_next('table')
+        if not equipment_table:
+            return []
+        
+        rows = []
+        for row in equipment_table.find_all('tr'):
+            cells = row.find_all(['th', 'td'], limit=2)
+            
+            if len(cells) < 2:
+                continue
+            
+            # Split the cell on <br> while walking it, instead of re-parsing its markup
+            item_names = ['']
+            for node in cells[1].descendants:
+                if node.name == 'br':
+                    item_names.append('')
+                elif type(node) is NavigableString:
+                    item_names[-1] += node
+            
+            rows.append((
+                cells[0].get_text(strip=True).lower(),
+                ''.join(item_names).strip(),
+                item_names
+            ))
+        
+        return rows
+    
+    def read_troop_image(self, infobox) -> Dict:
+        """The infobox portrait as {'file', 'url'} with the full-size URL, or {} if there is none"""
+        figure = infobox.find('figure', class_='pi-image') if infobox else None
+        img = figure.find('img') if figure else None
+        if img is None:
+            return {}
+        
+        link = figure.find('a', href=True)
+        url = link['href'] if link and not link['href'].startswith('data:') else None
+        # Lazy-loaded thumbnails keep the real address in data-src
+        url = url or img.get('data-src') or img.get('src')
+        if not url or url.startswith('data:'):
+            return {}
+        return {'file': img.get('data-image-name'), 'url': SCALED_IMAGE_RE.sub('', url)}
+    
+    @timed('item_lookup')
+    def extract_equipment(self, soup: BeautifulSoup, missing_items: set,
+                          equipment_rows: List[Tuple[str, str, List[str]]] = None,
+                          fuzzy_matches: Dict = None) -> List[Tuple[int, str]]:
+        """Return (item_id, slot) for every mapped item.
+        
+        Unmapped names go into missing_items; names that only matched fuzzily
+        are recorded in fuzzy_matches as {name: (item map key, confidence)}.
+        """
+        if equipment_rows is None:
+            equipment_rows = self.read_equipment_table(soup)
+        
+        slot_mapping = {
+            'weapons': 'weapon',
+            'weapon': 'weapon',
+            'shield': 'shield',
+            'head armor': 'head_armor',
+            'shoulder armor': 'shoulder_armor',
+            'body armor': 'body_armor',
+            'hand armor': 'hand_armor',
+            'leg armor': 'leg_armor',
+            'foot armor': 'foot_armor',
+            'mount': 'horse',
+            'mount harness': 'horse_harness',
+        }
+        
+        links = []
+        for slot_name, cell_text, item_names in equipment_rows:
+            if 'n/a' in cell_text.lower() or cell_text == '?':
+                continue
+            
+            db_slot = slot_mapping.get(slot_name)
+            if not db_slot:
+                continue
+            
+            for item_name in item_names:
+                item_name = item_name.strip()
+                
+                if not item_name or item_name == '?' or '(Possible)' in item_name:
+                    continue
+                
+                item_name = item_name.replace('(Possible)', '').strip()
+                if ' (' in item_name:
+                    item_name = item_name.split(' (')[0]
+                
+                resolved = self.item_resolver.resolve(item_name)
+                if resolved:
+                    item_key, confidence = resolved
+                    item_data = self.item_map[item_key]
+                    links.append((item_data['id'], item_data['slot']))
+                    METRICS.count('items_exact' if confidence >= 1.0 else 'items_fuzzy')
+                    if confidence < 1.0 and fuzzy_matches is not None:
+                        fuzzy_matches[item_name] = (item_key, confidence)
+                else:
+                    METRICS.count('items_missing')
+                    missing_items.add(item_name)
+        
+        return links
+    
+    @timed('parse_html')
+    def parse_troop_page(self, html: str, troop_name: str, faction: str, missing_items: set,
+                         fuzzy_matches: Dict = None, image: Dict = None) -> Tuple[Dict, List[Tuple[int, str]]]:
+        """Parse individual troop page for stats AND equipment in a single pass over one soup.
+        
+        The infobox portrait, if any, is recorded in image as {'file', 'url'}.
+        """
+        with METRICS.stage('soup'):
+            soup = BeautifulSoup(html, HTML_PARSER)
+        
+        infobox = soup.find('aside', class_='portable-infobox')
+        if image is not None:
+            image.update(self.read_troop_image(infobox))
+        
+        # Extract tier from the first text node mentioning it ("... are tier-one infantry")
+        tier = 1
+        tier_text = soup.find(string=TIER_RE)
+        tier_match = TIER_RE.search(tier_text) if tier_text else TIER_RE.search(html)
+        if tier_match:
+            tier_text = tier_match.group(1).lower()
+            tier_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+            tier = tier_map.get(tier_text, self.estimate_tier(troop_name))
+        else:
+            tier = self.estimate_tier(troop_name)
+        
+        # Extract wage
+        wage = 0
+        wages_field = infobox.find(attrs={'data-source': 'Wages'}) if infobox else None
+        wage_match = WAGE_RE.search(wages_field.get_text()) if wages_field else None
+        if not wage_match:
+            wage_match = WAGE_RE.search(html)
+        if wage_match:
+            wage = int(wage_match.group(1))
+        else:
+            wage = self.estimate_wage(tier)
+        
+        # Mount status and equipment both come from the same Equipment table walk
+        equipment_rows = self.read_equipment_table(soup)
+        is_mounted = self.is_troop_mounted(troop_name, equipment_rows=equipment_rows)
+        links = self.extract_equipment(soup, missing_items, equipment_rows, fuzzy_matches)
+        
+        return {
+            'name': troop_name,
+            'tier': tier,
+            'wage': wage,
+            'is_mounted': is_mounted,
+            'faction': faction
+        }, links
+    
+    @timed('parse_wikitext')
+    def parse_troop_wikitext(self, wikitext: str, troop_name: str, faction: str, missing_items: set,
+                             fuzzy_matches: Dict = None, image: Dict = None) -> Tuple[Dict, List[Tuple[int, str]]]:
+        """Parse a troop page from its wikitext; returns None if its templates don't match.
+        
+        The infobox image's file name goes into image as {'file'}; its URL
+        needs an imageinfo query (see BannerlordTroopScraper.resolve_image_urls).
+        """
+        infobox = find_template(wikitext, INFOBOX_TEMPLATES)
+        equipment_rows = read_equipment_rows(wikitext)
+        if infobox is None or equipment_rows is None:
+            return None
+        
+        if image is not None:
+            file_match = IMAGE_FILE_RE.search(infobox.get('image file') or infobox.get('image') or '')
+            if file_match:
+                image['file'] = file_match.group(1).strip()
+        
+        # Extract tier
+        tier = 1
+        tier_match = TIER_RE.search(strip_markup(wikitext))
+        if tier_match:
+            tier_text = tier_match.group(1).lower()
+            tier_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+            tier = tier_map.get(tier_text, self.estimate_tier(troop_name))
+        else:
+            tier = self.estimate_tier(troop_name)
+        
+        # Extract wage
+        wage = 0
+        wage_match = WAGE_RE.search(strip_markup(infobox.get('wages', '')))
+        if wage_match:
+            wage = int(wage_match.group(1))
+        else:
+            wage = self.estimate_wage(tier)
+        
+        is_mounted = self.is_troop_mounted(troop_name, equipment_rows=equipment_rows)
+        links = self.extract_equipment(None, missing_items, equipment_rows, fuzzy_matches)
+        
+        return {
+            'name': troop_name,
+            'tier': tier,
+            'wage': wage,
+            'is_mounted': is_mounted,
+            'faction': faction
+        }, links
+    
+    def estimate_tier(self, troop_name: str) -> int:
+        """Estimate tier based on troop name keywords"""
+        name_lower = troop_name.lower()
+        
+        # Tier indicators in order of specificity
+        if any(x in name_lower for x in ['champion', 'elite', 'master', 'khan\'s guard', 'banner knight']):
+            return 6
+        if any(x in name_lower for x in ['veteran', 'heavy', 'sergeant', 'cataphract', 'druzhinnik']):
+            return 5
+        if any(x in name_lower for x in ['trained', 'regular', 'picked', 'hardened', 'legionary']):
+            return 4
+        if any(x in name_lower for x in ['warrior', 'soldier', 'archer', 'cavalry', 'footman', 'infantry']):
+            return 3
+        if any(x in name_lower for x in ['tribesman', 'woodsman', 'skirmisher', 'hunter', 'raider']):
+            return 2
+        if any(x in name_lower for x in ['recruit', 'levy', 'nomad', 'youth', 'son']):
+            return 1
+        
+        return 1  # Default to tier 1
+    
+    def estimate_wage(self, tier: int) -> int:
+        """Estimate wage based on tier"""
+        wage_map = {1: 2, 2: 4, 3: 8, 4: 12, 5: 18, 6: 25}
+        return wage_map.get(tier, 2)
+    
+    @timed('mount_check')
+    def is_troop_mounted(self, troop_name: str, html: str = None,
+                         equipment_rows: List[Tuple[str, str, List[str]]] = None) -> bool:
+        """Determine if troop is mounted by checking the Mount row of the Equipment table"""
+        if equipment_rows is None:
+            equipment_rows = self.read_equipment_table(BeautifulSoup(html or '', HTML_PARSER))
+        
+        for header, value, _ in equipment_rows:
+            if header == 'mount':
+                # Check if mount value is N/A or ? or empty
+                if value.upper() == 'N/A':
+                    return False
+                elif value != '?' and value:
+                    return True
+                break
+        
+        # Fallback: check for mounted keywords in name (used when no Equipment table or Mount row)
+        name_lower = troop_name.lower()
+        mounted_keywords = ['cavalry', 'horseman', 'horse archer', 'lancer', 'knight', 
+                          'cataphract', 'faris', 'mameluke', 'equite', 'bucellarii',
+                          'druzhinnik', 'kheshig', 'darkhan', 'mounted']
+        
+        if any(keyword in name_lower for keyword in mounted_keywords):
+            return True
+        
+        # Default to not mounted if we can't determine
+        return False
+    
+    @timed('parse_page')
+    def parse_page(self, page_data: Dict, troop_name: str, faction: str,
+                   wikitext_mode: bool = False) -> Dict:
+        """Parse one fetched page into a plain, picklable result.
+        
+        Returns {'troop', 'equipment', 'missing_items', 'fuzzy_matches', 'image', 'source', 'fallback'},
+        {'needs_html': True} when the wikitext could not be read and no HTML was
+        fetched, or None when the page has no content at all.
+        """
+        missing_items = set()
+        fuzzy_matches = {}
+        image = {}
+        fallback = False
+        METRICS.count('pages_parsed')
+        
+        if wikitext_mode and page_data.get('wikitext'):
+            parsed = self.parse_troop_wikitext(page_data['wikitext'], troop_name, faction,
+                                               missing_items, fuzzy_matches, image)
+            if parsed is not None:
+                troop, links = parsed
+                return {'troop': troop, 'equipment': links, 'missing_items': sorted(missing_items),
+                        'fuzzy_matches': fuzzy_matches, 'image': image or None,
+                        'source': 'wikitext', 'fallback': False}
+            if not page_data.get('html'):
+                return {'needs_html': True}
+            fallback = True
+        
+        if not page_data.get('html'):
+            return None
+        
+        troop, links = self.parse_troop_page(page_data['html'], troop_name, faction,
+                                             missing_items, fuzzy_matches, image)
+        return {'troop': troop, 'equipment': links, 'missing_items': sorted(missing_items),
+                'fuzzy_matches': fuzzy_matches, 'image': image or None,
+                'source': 'html', 'fallback': fallback}
+
+
+# Parser used by each ProcessPoolExecutor worker; set once by init_parse_worker
+_worker_parser = None
+
+def init_parse_worker(item_map: Mapping):
+    global _worker_parser
+    _worker_parser = TroopPageParser(item_map)
+
+def parse_page_in_worker(job: Tuple[Dict, str, str, bool]) -> Tuple[Dict, Dict]:
+    """Parse one page; also returns the worker's metrics for the main process to merge"""
+    page_data, troop_name, faction, wikitext_mode = job
+    result = _worker_parser.parse_page(page_data, troop_name, faction, wikitext_mode)
+    return result, METRICS.snapshot()
+
+def bounded_ordered_map(executor: Executor, fn, items, window: int):
+    """Like executor.map, but yields in order with at most `window` calls in flight"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+class BannerlordTroopScraper(TroopPageParser):
+    def __init__(self, max_workers: int = MAX_CONCURRENT_REQUESTS,
+                 requests_per_second: float = REQUESTS_PER_SECOND,
+                 batch_size: int = BATCH_SIZE, cache: PageCache = None,
+                 offline: bool = False, state_path: str = None,
+                 wikitext_mode: bool = False, parity_check: bool = False,
+                 parse_workers: int = PARSE_WORKERS, discover_categories: List[str] = None,
+                 timeout=REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 journal: ScrapeJournal = None, resume: bool = False, base_url: str = WIKI_BASE_URL):
+        self.base_url = base_url.rstrip('/')
         self.api_url = f"{self.base_url}/api.php"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'BannerlordTroopScraper/1.0'
-        })
+        
+        # Concurrency settings; the client adapts the rate and in-flight requests to the server's responses
+        self.max_workers = max(1, max_workers)
+        self.client = WikiClient(self.api_url, self.max_workers, requests_per_second,
+                                 timeout=timeout, max_retries=max_retries)
+        
+        # Titles per batched request; 1 falls back to one action=parse call per troop
+        self.batch_size = max(1, min(batch_size, BATCH_SIZE))
+        
+        # Page cache; in offline mode pages are served from it and never fetched
+        self.cache = cache
+        self.offline = offline
+        if self.offline and self.cache is None:
+            raise ValueError("offline mode needs a page cache")
+        
+        # Incremental mode: reuse parsed results of pages whose revision is unchanged
+        self.state_path = state_path
+        
+        # Wikitext mode parses template source and only renders pages it cannot read;
+        # the parity check also parses the HTML of every page and records differences
+        self.wikitext_mode = wikitext_mode or parity_check
+        self.parity_check = parity_check
+        self.parity_mismatches = []
+        self.wikitext_fallbacks = []
+        
+        self.parse_workers = max(0, parse_workers)
+        
+        # Discovery crawls the wiki for the troop list instead of using troop_trees below
+        self.discover_categories = discover_categories
+        
+        # Completed troops are journaled as they finish; resume replays the journal
+        # and only fetches what is still missing
+        self.journal = journal
+        self.resume = resume
+        
+        # Built from troop_trees once the troops are scraped
+        self.upgrade_graph = None
         
         # Major factions in Bannerlord
         self.factions = {
@@ -33,7 +480,7 @@ class BannerlordTroopScraper:
         self.cultures = {}
         self.culture_id_counter = 1
         
-        # Known troop upgrade paths from research
+        # Known troop upgrade paths from research; replaced by discover_troops when discovering
         self.troop_trees = {
             "Aserai": {
                 "common": [
@@ -103,9 +550,9 @@ class BannerlordTroopScraper:
             }
         }
         
-        self.item_map = self.load_item_map()
-        self.equipment_data = [] # To store (troop_id, item_id, slot)
+        super().__init__(self.load_item_map())
         self.missing_items = set() # Track items not found in map
+        self.fuzzy_matches = {} # Scraped name -> (item map key, confidence) for near-miss names
 
     def load_item_map(self):
         """Loads the JSON map of item names to their IDs and slots."""
@@ -115,228 +562,448 @@ class BannerlordTroopScraper:
             return {}
         
         try:
+            # The memory-mapped binary map opens in constant time; it is only
+            # trusted while it matches the current item_map.json
+            source_hash = file_sha256(ITEM_MAP_JSON)
+            item_map = CompactItemMap.open_validated(ITEM_MAP_BIN, source_hash)
+            if item_map is not None:
+                print(f"Loaded item map with {len(item_map)} items from {ITEM_MAP_BIN}")
+                return item_map
+            
             with open(ITEM_MAP_JSON, 'r', encoding='utf-8') as f:
                 item_map = json.load(f)
                 print(f"Loaded item map with {len(item_map)} items")
-                return item_map
+            
+            try:
+                write_item_map_binary(item_map, ITEM_MAP_BIN, source_hash)
+                print(f"Rebuilt {ITEM_MAP_BIN} for faster start-up next time")
+            except OSError as e:
+                print(f"Warning: could not write {ITEM_MAP_BIN}: {e}")
+            return item_map
         except Exception as e:
             print(f"Error reading {ITEM_MAP_JSON}: {e}")
             return {}
     
-    def get_category_members(self, category: str) -> List[str]:
-        """Get all pages in a category using MediaWiki API"""
-        params = {
-            'action': 'query',
-            'list': 'categorymembers',
-            'cmtitle': f'Category:{category}',
-            'cmlimit': 'max',
-            'format': 'json'
+    def get_category_members(self, category: str, recursive: bool = True) -> List[str]:
+        """Get all pages in a category using MediaWiki API, following cmcontinue.
+        
+        With recursive set, subcategories are walked breadth-first as well.
+        """
+        members = []
+        seen_members = set()
+        categories = deque([category])
+        seen_categories = {category}
+        
+        while categories:
+            current = categories.popleft()
+            params = {
+                'action': 'query',
+                'list': 'categorymembers',
+                'cmtitle': f'Category:{current}',
+                'cmtype': 'page|subcat' if recursive else 'page',
+                'cmlimit': 'max',
+                'format': 'json',
+                'formatversion': 2
+            }
+            continue_params = {}
+            
+            try:
+                while True:
+                    data = self.client.get({**params, **continue_params})
+                    
+                    for member in data.get('query', {}).get('categorymembers', []):
+                        title = member['title']
+                        if member.get('ns') == CATEGORY_NAMESPACE:
+                            subcategory = title.split(':', 1)[1]
+                            if subcategory not in seen_categories:
+                                seen_categories.add(subcategory)
+                                categories.append(subcategory)
+                        elif title not in seen_members:
+                            seen_members.add(title)
+                            members.append(title)
+                    
+                    if 'continue' not in data:
+                        break
+                    continue_params = data['continue']
+            except Exception as e:
+                print(f"Error fetching category {current}: {str(e)}")
+        
+        return members
+    
+    def fetch_wikitexts(self, titles: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Fetch {requested title: (page title, wikitext)} with concurrent batched revisions queries.
+        
+        Redirects and normalization are resolved, so the page title may differ
+        from the requested one. Missing pages are left out.
+        """
+        results = {}
+        pending = []
+        for title in titles:
+            cached = self.get_cached_page(title, with_html=False)
+            if cached and cached['wikitext']:
+                results[title] = (title, cached['wikitext'])
+            else:
+                pending.append(title)
+        
+        if self.offline or not pending:
+            return results
+        
+        def fetch(batch):
+            try:
+                return self.query_titles(batch, {'prop': 'revisions', 'rvprop': 'ids|content', 'rvslots': 'main'})
+            except Exception as e:
+                print(f"Error fetching batch starting at {batch[0]}: {str(e)}")
+                return {}
+        
+        batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for pages in executor.map(fetch, batches):
+                for title, page in pages.items():
+                    revisions = page.get('revisions') if page else None
+                    if not revisions:
+                        continue
+                    wikitext = revisions[0]['slots']['main'].get('content', '')
+                    results[title] = (page['title'], wikitext)
+                    if self.cache is not None and wikitext and title == page['title']:
+                        self.cache.put(title, {'wikitext': wikitext, 'revid': revisions[0].get('revid')})
+        
+        return results
+    
+    def read_troop_infobox(self, wikitext: str) -> Dict:
+        """Culture, "Upgrades To" targets and noble flag from a troop page's infobox, or None"""
+        params = find_template(wikitext, INFOBOX_TEMPLATES)
+        if params is None:
+            return None
+        
+        culture = params.get('culture', '')
+        culture_links = link_targets(culture)
+        return {
+            'culture': culture_links[0] if culture_links else strip_markup(culture).strip(),
+            'upgrades_to': link_targets(params.get('upgrades to', '')),
+            'noble': 'noble' in strip_markup(params.get('acquired from', '')).lower()
         }
+    
+    def faction_for(self, culture: str, troop_name: str) -> str:
+        """Faction key for a discovered troop; unknown cultures become new factions"""
+        if culture in self.factions:
+            return culture
+        for faction_key, culture_prefix in self.factions.items():
+            if culture == culture_prefix or troop_name.startswith(culture_prefix + ' '):
+                return faction_key
         
-        try:
-            response = self.session.get(self.api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        faction_key = culture or troop_name.split(' ', 1)[0]
+        self.factions[faction_key] = faction_key
+        return faction_key
+    
+    def discover_troops(self, categories: List[str]):
+        """Replace troop_trees with trees crawled from the wiki.
+        
+        The troop categories seed a breadth-first crawl over every troop's
+        infobox "Upgrades To" links; each level is fetched with concurrent
+        batched queries. Redirected names (typos, renames) collapse onto the
+        page they point to.
+        """
+        seeds = []
+        for category in categories:
+            seeds.extend(self.get_category_members(category))
+        print(f"\nDiscovery: {len(seeds)} pages in {', '.join(categories)}")
+        
+        troops = {}   # page title -> infobox, in discovery order
+        aliases = {}  # requested title -> page title
+        seen = set()
+        frontier = list(dict.fromkeys(seeds))
+        depth = 0
+        
+        while frontier:
+            seen.update(frontier)
+            pages = self.fetch_wikitexts(frontier)
+            next_frontier = []
             
-            if 'query' in data and 'categorymembers' in data['query']:
-                return [member['title'] for member in data['query']['categorymembers']]
-            return []
-        except Exception as e:
-            print(f"Error fetching category {category}: {str(e)}")
-            return []
+            for title in frontier:
+                if title not in pages:
+                    continue
+                page_title, wikitext = pages[title]
+                aliases[title] = page_title
+                if page_title in troops:
+                    continue
+                
+                infobox = self.read_troop_infobox(wikitext)
+                if infobox is None:
+                    continue  # Not a troop page
+                troops[page_title] = infobox
+                seen.add(page_title)
+                
+                for target in infobox['upgrades_to']:
+                    if target not in seen:
+                        seen.add(target)
+                        next_frontier.append(target)
+            
+            depth += 1
+            print(f"  Level {depth}: {len(frontier)} pages fetched, {len(troops)} troops so far")
+            frontier = next_frontier
+        
+        self.troop_trees = self.build_troop_trees(troops, aliases)
+    
+    def build_troop_trees(self, troops: Dict[str, Dict], aliases: Dict[str, str]) -> Dict:
+        """Turn crawled infoboxes into troop_trees: every root-to-leaf upgrade path per faction"""
+        children = {}
+        for troop_name, infobox in troops.items():
+            targets = (aliases.get(target, target) for target in infobox['upgrades_to'])
+            children[troop_name] = list(dict.fromkeys(t for t in targets if t in troops and t != troop_name))
+        upgraded = {child for targets in children.values() for child in targets}
+        
+        trees = {}
+        covered = set()
+        # Roots first; troops only reachable through a cycle become roots afterwards
+        roots = [name for name in troops if name not in upgraded] + [name for name in troops if name in upgraded]
+        for root in roots:
+            if root in upgraded and root in covered:
+                continue
+            
+            tree_type = 'noble' if troops[root]['noble'] else 'common'
+            faction_key = self.faction_for(troops[root]['culture'], root)
+            stack = [[root]]
+            while stack:
+                path = stack.pop()
+                following = [child for child in children[path[-1]] if child not in path]
+                if following:
+                    stack.extend(path + [child] for child in reversed(following))
+                else:
+                    trees.setdefault(faction_key, {}).setdefault(tree_type, []).append(path)
+                    covered.update(path)
+        
+        return trees
     
-    def get_page_info(self, page_title: str) -> Dict:
-        """Fetch detailed page content using MediaWiki API"""
+    def get_cached_page(self, page_title: str, revid: int = None, with_html: bool = True) -> Dict:
+        """Return a cached page if it has what the caller needs, otherwise None"""
+        if self.cache is None:
+            return None
+        
+        cached = self.cache.get(page_title, revid=revid, allow_stale=self.offline)
+        if cached and (cached['html'] or not with_html):
+            return cached
+        return None
+    
+    def get_page_info(self, page_title: str, with_html: bool = True, revid: int = None) -> Dict:
+        """Fetch detailed page content using MediaWiki API.
+        
+        With the page's current revid known, only that revision is taken from
+        the cache, however fresh an older cached revision is.
+        """
+        cached = self.get_cached_page(page_title, revid, with_html)
+        if cached:
+            return cached
+        
+        if self.offline:
+            print(f"Not in cache (offline mode): {page_title}")
+            return {'html': '', 'wikitext': ''}
+        
         params = {
             'action': 'parse',
             'page': page_title,
             'format': 'json',
-            'prop': 'text|wikitext'
+            'prop': 'text|wikitext' if with_html else 'wikitext'
         }
         
         try:
-            response = self.session.get(self.api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self.client.get(params)
             
             if 'parse' in data:
-                return {
-                    'html': data['parse']['text']['*'],
-                    'wikitext': data['parse'].get('wikitext', {}).get('*', '')
+                page = {
+                    'html': data['parse'].get('text', {}).get('*', ''),
+                    'wikitext': data['parse'].get('wikitext', {}).get('*', ''),
+                    'revid': data['parse'].get('revid')
                 }
+                if self.cache is not None:
+                    self.cache.put(page_title, page)
+                return page
             return {'html': '', 'wikitext': ''}
         except Exception as e:
             print(f"Error fetching {page_title}: {str(e)}")
             return {'html': '', 'wikitext': ''}
+    
+    def query_titles(self, titles: List[str], params: Dict) -> Dict[str, Dict]:
+        """Run an action=query over up to BATCH_SIZE titles, following continuation.
         
-    def extract_equipment(self, soup: BeautifulSoup, troop_id: int):
-        equipment_header = soup.find('span', {'id': 'Equipment'})
-        if not equipment_header:
-            return
-        
-        equipment_section = equipment_header.find_parent(['h2', 'h3'])
-        if not equipment_section:
-            return
-        
-        equipment_table = equipment_section.find_next('table')
-        if not equipment_table:
-            return
-        
-        slot_mapping = {
-            'weapons': 'weapon',
-            'weapon': 'weapon',
-            'shield': 'shield',
-            'head armor': 'head_armor',
-            'shoulder armor': 'shoulder_armor',
-            'body armor': 'body_armor',
-            'hand armor': 'hand_armor',
-            'leg armor': 'leg_armor',
-            'foot armor': 'foot_armor',
-            'mount': 'horse',
-            'mount harness': 'horse_harness',
+        Returns {requested title: page} after resolving normalization and redirects.
+        Missing or invalid pages map to None.
+        """
+        base_params = {
+            'action': 'query',
+            'titles': '|'.join(titles),
+            'redirects': 1,
+            'format': 'json',
+            'formatversion': 2
         }
+        base_params.update(params)
         
-        for row in equipment_table.find_all('tr'):
-            cells = row.find_all(['th', 'td'])
-            
-            if len(cells) < 2:
-                continue
-            
-            slot_name = cells[0].get_text(strip=True).lower()
-            cell_text = cells[1].get_text().strip()
+        pages = {}
+        aliases = {}
+        continue_params = {}
+        
+        while True:
+            data = self.client.get({**base_params, **continue_params})
+            query = data.get('query', {})
             
-            if 'n/a' in cell_text.lower() or cell_text == '?':
-                continue
+            for entry in query.get('normalized', []) + query.get('redirects', []):
+                aliases[entry['from']] = entry['to']
             
-            db_slot = slot_mapping.get(slot_name)
-            if not db_slot:
-                continue
+            for page in query.get('pages', []):
+                known = pages.setdefault(page['title'], page)
+                if known is not page:
+                    # Continued responses carry the remaining props for pages seen earlier
+                    for key, value in page.items():
+                        if key not in known or not known[key]:
+                            known[key] = value
             
-            items_text = str(cells[1])
-            items_text = items_text.replace('<br/>', '|').replace('<br />', '|').replace('<br>', '|')
-            soup_cell = BeautifulSoup(items_text, 'html.parser')
-            item_names = soup_cell.get_text().split('|')
+            if 'continue' not in data:
+                break
+            continue_params = data['continue']
+        
+        resolved = {}
+        for title in titles:
+            target = title
+            seen = set()
+            while target in aliases and target not in seen:
+                seen.add(target)
+                target = aliases[target]
             
-            for item_name in item_names:
-                item_name = item_name.strip()
-                
-                if not item_name or item_name == '?' or '(Possible)' in item_name:
-                    continue
-                
-                item_name = item_name.replace('(Possible)', '').strip()
-                if ' (' in item_name:
-                    item_name = item_name.split(' (')[0]
-                
-                if item_name in self.item_map:
-                    item_data = self.item_map[item_name]
-                    self.equipment_data.append((troop_id, item_data['id'], item_data['slot']))
-                else:
-                    self.missing_items.add(item_name)
+            page = pages.get(target)
+            if page is None or page.get('missing') or page.get('invalid'):
+                resolved[title] = None
+            else:
+                resolved[title] = page
+        
+        return resolved
     
-    def parse_troop_page(self, html: str, troop_name: str, faction: str, troop_id: int) -> Dict:
-        """Parse individual troop page for stats AND equipment"""
-        soup = BeautifulSoup(html, 'html.parser')
+    def render_revision(self, revid: int) -> str:
+        """Render one fetched revision by its id.
         
-        # Extract tier
-        tier = 1
-        tier_match = re.search(r'tier-(\w+)', html, re.IGNORECASE)
-        if tier_match:
-            tier_text = tier_match.group(1).lower()
-            tier_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
-            tier = tier_map.get(tier_text, self.estimate_tier(troop_name))
-        else:
-            tier = self.estimate_tier(troop_name)
+        Rendering by oldid rather than posting the wikitext keeps the page's own
+        title, so {{PAGENAME}}, self-links and title-dependent templates come out
+        as on the page itself, and it renders exactly the revision fetched.
+        """
+        params = {
+            'action': 'parse',
+            'oldid': revid,
+            'prop': 'text',
+            'disabletoc': 1,
+            'disablelimitreport': 1,
+            'disableeditsection': 1,
+            'format': 'json',
+            'formatversion': 2
+        }
+        return self.client.get(params)['parse']['text']
+    
+    def get_pages_batch(self, titles: List[str], revids: Dict[str, int] = None) -> List[Dict]:
+        """Fetch up to BATCH_SIZE pages with one revisions query, then render the changed ones.
         
-        # Extract wage
-        wage = 0
-        wage_match = re.search(r'(\d+)\s*denars?/day', html, re.IGNORECASE)
-        if wage_match:
-            wage = int(wage_match.group(1))
-        else:
-            wage = self.estimate_wage(tier)
+        action=parse renders a single title per call, so each page not already
+        cached at its revision is rendered on its own (see render_revision).
+        In wikitext mode the render is skipped and only the wikitext is returned.
+        revids holds current revision ids already known (from --incremental);
+        those pages are only served from the cache at exactly that revision.
+        """
+        results = [None] * len(titles)
+        with_html = not self.wikitext_mode
+        revids = revids or {}
         
-        # Determine if mounted
-        is_mounted = self.is_troop_mounted(troop_name, html)
+        # Pages cached within the TTL (or at their known revision) need no request at all
+        pending = []
+        for index, title in enumerate(titles):
+            cached = self.get_cached_page(title, revids.get(title), with_html)
+            if cached:
+                results[index] = cached
+            else:
+                pending.append(index)
         
-        # Extract Equipment
-        self.extract_equipment(soup, troop_id)
+        if not pending:
+            return results
         
-        return {
-            'name': troop_name,
-            'tier': tier,
-            'wage': wage,
-            'is_mounted': is_mounted,
-            'faction': faction
-        }
-    
-    def estimate_tier(self, troop_name: str) -> int:
-        """Estimate tier based on troop name keywords"""
-        name_lower = troop_name.lower()
+        pending_titles = [titles[index] for index in pending]
+        try:
+            pages = self.query_titles(pending_titles, {
+                'prop': 'revisions',
+                'rvprop': 'ids|content',
+                'rvslots': 'main'
+            })
+        except Exception as e:
+            print(f"Error fetching batch starting at {pending_titles[0]}: {str(e)}")
+            for index in pending:
+                results[index] = self.get_page_info(titles[index], with_html, revids.get(titles[index]))
+            return results
         
-        # Tier indicators in order of specificity
-        if any(x in name_lower for x in ['champion', 'elite', 'master', 'khan\'s guard', 'banner knight']):
-            return 6
-        if any(x in name_lower for x in ['veteran', 'heavy', 'sergeant', 'cataphract', 'druzhinnik']):
-            return 5
-        if any(x in name_lower for x in ['trained', 'regular', 'picked', 'hardened', 'legionary']):
-            return 4
-        if any(x in name_lower for x in ['warrior', 'soldier', 'archer', 'cavalry', 'footman', 'infantry']):
-            return 3
-        if any(x in name_lower for x in ['tribesman', 'woodsman', 'skirmisher', 'hunter', 'raider']):
-            return 2
-        if any(x in name_lower for x in ['recruit', 'levy', 'nomad', 'youth', 'son']):
-            return 1
+        to_render = []
+        for index in pending:
+            title = titles[index]
+            page = pages[title]
+            revisions = page.get('revisions') if page else None
+            if not revisions:
+                if page is None:
+                    print(f"Page not found: {title}")
+                results[index] = {'html': '', 'wikitext': '', 'revid': None}
+                continue
+            
+            revision = revisions[0]
+            revid = revision.get('revid')
+            
+            # Same revision already rendered on an earlier run: skip the render
+            cached = self.get_cached_page(title, revid, with_html) if revid else None
+            if cached:
+                results[index] = cached
+                continue
+            
+            results[index] = {
+                'html': '',
+                'wikitext': revision['slots']['main'].get('content', ''),
+                'revid': revid
+            }
+            if not results[index]['wikitext']:
+                continue
+            if with_html:
+                to_render.append(index)
+            elif self.cache is not None:
+                self.cache.put(title, results[index])
         
-        return 1  # Default to tier 1
-    
-    def estimate_wage(self, tier: int) -> int:
-        """Estimate wage based on tier"""
-        wage_map = {1: 2, 2: 4, 3: 8, 4: 12, 5: 18, 6: 25}
-        return wage_map.get(tier, 2)
-    
-    def is_troop_mounted(self, troop_name: str, html: str) -> bool:
-        """Determine if troop is mounted by checking Equipment table"""
-        # Parse the HTML to find the Mount row in the Equipment table
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        mount_found = False
-        has_mount = False
-        
-        # Look for the Equipment section
-        equipment_header = soup.find('span', {'id': 'Equipment'})
-        if equipment_header:
-            equipment_section = equipment_header.find_parent(['h2', 'h3'])
-            if equipment_section:
-                equipment_table = equipment_section.find_next('table')
-                if equipment_table:
-                    # Find the Mount row
-                    for row in equipment_table.find_all('tr'):
-                        cells = row.find_all(['th', 'td'])
-                        if len(cells) >= 2:
-                            header = cells[0].get_text(strip=True).lower()
-                            value = cells[1].get_text(strip=True)
-                            
-                            if header == 'mount':
-                                # Check if mount value is N/A or ? or empty
-                                if value.upper() == 'N/A':
-                                    return False
-                                elif value == '?' or not value:
-                                    has_mount = False
-                                else:
-                                    return True
-                                break
+        for index in to_render:
+            title = titles[index]
+            try:
+                results[index]['html'] = self.render_revision(results[index]['revid'])
+            except Exception as e:
+                # The revision may have been deleted since the query; fetch the current page instead
+                print(f"Error rendering {title} ({str(e)}), fetching the page instead")
+                results[index] = self.get_page_info(title, revid=revids.get(title))
+                continue
+            if self.cache is not None:
+                self.cache.put(title, results[index])
         
-        # Fallback: check for mounted keywords in name (used when no Equipment table or Mount row)
-        name_lower = troop_name.lower()
-        mounted_keywords = ['cavalry', 'horseman', 'horse archer', 'lancer', 'knight', 
-                          'cataphract', 'faris', 'mameluke', 'equite', 'bucellarii',
-                          'druzhinnik', 'kheshig', 'darkhan', 'mounted']
+        return results
         
-        if any(keyword in name_lower for keyword in mounted_keywords):
-            return True
+    def compare_with_html(self, troop_name: str, faction: str, result: Dict, revid: int = None):
+        """Parse the rendered page as well and record where it disagrees with the wikitext result"""
+        page_data = self.get_page_info(troop_name, revid=revid)
+        html_result = self.parse_page(page_data, troop_name, faction)
+        if html_result is None:
+            self.parity_mismatches.append((troop_name, "rendered HTML unavailable"))
+            return
         
-        # Default to not mounted if we can't determine
-        return False
+        for field in ('tier', 'wage', 'is_mounted'):
+            if html_result['troop'][field] != result['troop'][field]:
+                self.parity_mismatches.append(
+                    (troop_name, f"{field}: wikitext={result['troop'][field]!r} "
+                                 f"html={html_result['troop'][field]!r}")
+                )
+        if sorted(html_result['equipment']) != sorted(result['equipment']):
+            only_html = sorted(set(html_result['equipment']) - set(result['equipment']))
+            only_wikitext = sorted(set(result['equipment']) - set(html_result['equipment']))
+            self.parity_mismatches.append(
+                (troop_name, f"equipment: html only {only_html}, wikitext only {only_wikitext}")
+            )
+        if html_result['missing_items'] != result['missing_items']:
+            self.parity_mismatches.append(
+                (troop_name, f"unmatched items: html={html_result['missing_items']} "
+                             f"wikitext={result['missing_items']}")
+            )
     
     def get_or_create_culture_id(self, culture_name: str) -> int:
         """Get existing culture ID or create new one"""
@@ -345,20 +1012,11 @@ class BannerlordTroopScraper:
             self.culture_id_counter += 1
         return self.cultures[culture_name]
     
-    def scrape_all_factions(self) -> Dict:
-        """Main scraping method"""
-        all_troops = []
-        troop_id = 1
+    def collect_troop_work(self) -> List[Tuple[str, int, str]]:
+        """List (faction, culture_id, troop_name) for every troop in troop_trees order"""
+        work = []
         
-
-        # Limit option for testing; set to a low number to limit troops scraped
-        max_troops = 999999 
-
         for faction_key, culture_prefix in self.factions.items():
-            print(f"\n{'='*60}")
-            print(f"Processing {faction_key} ({culture_prefix})")
-            print(f"{'='*60}")
-            
             culture_id = self.get_or_create_culture_id(culture_prefix)
             
             # Get all troop types for this faction
@@ -373,158 +1031,686 @@ class BannerlordTroopScraper:
             seen = set()
             troop_types = [x for x in troop_types if not (x in seen or seen.add(x))]
             
-            print(f"Found {len(troop_types)} troops to scrape")
-            
-            for troop_name in troop_types:
-                if troop_id > max_troops:  # STOP AFTER 5 TROOPS
+            work.extend((faction_key, culture_id, troop_name) for troop_name in troop_types)
+        
+        return work
+    
+    def fetch_pages(self, titles: List[str], revids: Dict[str, int] = None):
+        """Fetch pages concurrently, yielding results in the same order as titles"""
+        with_html = not self.wikitext_mode
+        revids = revids or {}
+        
+        if self.offline:
+            for title in titles:
+                yield self.get_page_info(title, with_html)
+            return
+        
+        if self.batch_size > 1:
+            batches = [titles[i:i + self.batch_size] for i in range(0, len(titles), self.batch_size)]
+            fetch, jobs = (lambda batch: self.get_pages_batch(batch, revids)), batches
+        else:
+            fetch, jobs = (lambda title: [self.get_page_info(title, with_html, revids.get(title))]), titles
+        
+        if self.max_workers == 1:
+            for job in jobs:
+                yield from fetch(job)
+            return
+        
+        # Results come back in input order, so parsing stays deterministic no matter
+        # which response arrives first; the window stops fetching from racing ahead
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for pages in bounded_ordered_map(executor, fetch, jobs, self.max_workers * 2):
+                yield from pages
+    
+    def fetch_and_parse(self, jobs: List[Tuple[str, str]], revids: Dict[str, int] = None):
+        """Fetch and parse (troop_name, faction) jobs as a pipeline, yielding results in job order.
+        
+        A producer thread runs the fetchers and pushes raw pages onto a bounded
+        queue; pages are handed to a pool of parser processes as they arrive.
+        The queue and the in-flight window keep memory bounded whichever stage
+        is slower.
+        """
+        page_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stop = threading.Event()
+        done = object()
+        
+        def produce():
+            try:
+                titles = [troop_name for troop_name, _ in jobs]
+                for job, page_data in zip(jobs, self.fetch_pages(titles, revids)):
+                    while not stop.is_set():
+                        try:
+                            page_queue.put((job, page_data), timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            finally:
+                page_queue.put(done)
+        
+        producer = threading.Thread(target=produce, name='page-fetcher', daemon=True)
+        producer.start()
+        
+        executor = None
+        if self.parse_workers > 0:
+            executor = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                           initializer=init_parse_worker,
+                                           initargs=(self.item_map,))
+        pending = deque()
+        try:
+            while True:
+                item = page_queue.get()
+                if item is done:
                     break
+                
+                (troop_name, faction), page_data = item
+                if executor is None:
+                    yield self.parse_page(page_data, troop_name, faction, self.wikitext_mode)
+                    continue
+                
+                pending.append(executor.submit(
+                    parse_page_in_worker, (page_data, troop_name, faction, self.wikitext_mode)
+                ))
+                if len(pending) >= self.parse_workers * 2:
+                    yield self.merge_worker_result(pending.popleft().result())
+            
+            while pending:
+                yield self.merge_worker_result(pending.popleft().result())
+        finally:
+            stop.set()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    
+    def merge_worker_result(self, outcome: Tuple[Dict, Dict]) -> Dict:
+        result, snapshot = outcome
+        METRICS.merge(snapshot)
+        return result
+    
+    def get_page_revisions(self, titles: List[str]) -> Dict[str, Dict]:
+        """Look up lastrevid/touched for every title with batched prop=info queries.
+        
+        Titles of a batch that failed get None for both, so they match no stored
+        state and are refetched.
+        """
+        batches = [titles[i:i + BATCH_SIZE] for i in range(0, len(titles), BATCH_SIZE)]
+        unknown = {'lastrevid': None, 'touched': None}
+        
+        def query(batch):
+            try:
+                return self.query_titles(batch, {'prop': 'info'})
+            except Exception as e:
+                print(f"Error checking revisions of batch starting at {batch[0]}, refetching it: {str(e)}")
+                return dict.fromkeys(batch, unknown)
+        
+        revisions = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for pages in executor.map(query, batches):
+                for title, page in pages.items():
+                    if page is None:
+                        revisions[title] = None
+                    elif page is unknown:
+                        revisions[title] = dict(unknown)
+                    else:
+                        revisions[title] = {'lastrevid': page.get('lastrevid'), 'touched': page.get('touched')}
+        return revisions
+    
+    def load_state(self) -> Dict[str, Dict]:
+        """Read per-page state from the previous incremental run"""
+        if not os.path.exists(self.state_path):
+            return {}
+        
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('pages', {})
+        except Exception as e:
+            print(f"Error reading {self.state_path}, doing a full scrape: {e}")
+            return {}
+    
+    def save_state(self, pages: Dict[str, Dict]):
+        """Write per-page state atomically so an interrupted save keeps the old file"""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': pages}, f)
+        os.replace(tmp_path, self.state_path)
+    
+    def scrape_all_factions(self) -> Dict:
+        """Main scraping method"""
+        all_troops = TroopStore()
+        
+        resumed = {}
+        resuming = self.journal is not None and self.resume and self.journal.replay()
+        if resuming:
+            # The journaled trees, factions and cultures keep the work order, and so the
+            # troop and culture ids, of the interrupted run (including discovered factions)
+            header = self.journal.header
+            self.troop_trees = header['troop_trees']
+            self.factions = header.get('factions', self.factions)
+            self.cultures = header.get('cultures', self.cultures)
+            self.culture_id_counter = max(self.cultures.values(), default=0) + 1
+            resumed = self.journal.records
+            self.journal.reopen()
+            print(f"\nResuming from {self.journal.path}: {len(resumed)} troops already done")
+        else:
+            if self.resume:
+                print("\nNothing to resume, starting a new run")
+            if self.discover_categories:
+                self.discover_troops(self.discover_categories)
 
-                print(f"\n  Scraping: {troop_name}")
+        # Limit option for testing; set to a low number to limit troops scraped
+        max_troops = 999999 
+
+        work = self.collect_troop_work()[:max_troops]
+        if self.journal is not None and not resuming:
+            # Started once the work list exists, so the header carries every culture id
+            self.journal.start(self.troop_trees, self.factions, self.cultures)
+        troops_per_faction = Counter(faction_key for faction_key, _, _ in work)
+        titles = [troop_name for _, _, troop_name in work if troop_name not in resumed]
+        
+        # Incremental mode: only pages whose revision moved since the last run are fetched
+        previous_state = {}
+        revisions = {}
+        fetch_titles = titles
+        if self.state_path:
+            revisions = self.get_page_revisions(titles)
+            stored = self.load_state()
+            previous_state = {
+                title: stored[title] for title in titles
+                if title in stored and revisions.get(title)
+                and stored[title]['lastrevid'] == revisions[title]['lastrevid']
+                and stored[title]['touched'] == revisions[title]['touched']
+            }
+            fetch_titles = [t for t in titles if t not in previous_state and revisions.get(t)]
+            print(f"\nIncremental run: {len(previous_state)} pages unchanged, "
+                  f"{len(fetch_titles)} to refetch")
+        
+        print(f"\nFetching {len(fetch_titles)} troop pages "
+              f"({self.max_workers} in flight, {self.client.limiter.rate:g} requests/s, "
+              f"{self.batch_size} per batch)")
+        
+        # fetch_titles keeps work order, so results come off the pipeline in step with the loop
+        faction_of = {troop_name: faction_key for faction_key, _, troop_name in work}
+        # Changed pages must be read at their new revision, never from a cached older one
+        known_revids = {title: revisions[title]['lastrevid'] for title in fetch_titles
+                        if revisions.get(title) and revisions[title].get('lastrevid')}
+        parsed_pages = self.parse_results([(t, faction_of[t]) for t in fetch_titles], known_revids)
+        fetch_set = set(fetch_titles)
+        all_equipment = EquipmentLinks()
+        images = {}
+        new_state = {}
+        next_troop_id = max((entry['troop_id'] for entry in resumed.values()), default=0) + 1
+        
+        current_faction = None
+        try:
+            for faction_key, culture_id, troop_name in work:
+                if faction_key != current_faction:
+                    current_faction = faction_key
+                    print(f"\n{'='*60}")
+                    print(f"Processing {faction_key} ({self.factions[faction_key]})")
+                    print(f"{'='*60}")
+                    print(f"Found {troops_per_faction[faction_key]} troops to scrape")
                 
-                # Fetch page data
-                page_data = self.get_page_info(troop_name)
+                print(f"\n  Scraping: {troop_name}")
+                page_state = None
                 
-                if page_data['html']:
-                    # Parse the page
-                    troop_data = self.parse_troop_page(
-                        page_data['html'], 
-                        troop_name, 
-                        faction_key,
-                        troop_id
-                    )
-                    troop_data['troop_id'] = troop_id
-                    troop_data['culture_id'] = culture_id
-                    
-                    all_troops.append(troop_data)
-                    print(f"    ✓ Tier {troop_data['tier']}, Wage: {troop_data['wage']}, "
-                          f"Mounted: {troop_data['is_mounted']}")
-                    
-                    troop_id += 1
-                    
-                    # Be nice to the API
-                    time.sleep(0.5)
+                if troop_name in resumed:
+                    # Finished before the interruption; keeps the troop id it had then
+                    entry = resumed[troop_name]
+                    troop_id = entry['troop_id']
+                    page_state = entry['page_state']
+                    result = {
+                        'troop': entry['troop'],
+                        'equipment': [tuple(link) for link in entry['equipment']],
+                        'missing_items': entry['missing_items'],
+                        'fuzzy_matches': entry['fuzzy_matches'],
+                        'image': entry.get('image')
+                    }
+                    status = "resumed"
+                elif troop_name in previous_state:
+                    page_state = previous_state[troop_name]
+                    result = {
+                        'troop': page_state['troop'],
+                        'equipment': [tuple(link) for link in page_state['equipment']],
+                        'missing_items': page_state['missing_items'],
+                        'fuzzy_matches': page_state.get('fuzzy_matches', {}),
+                        'image': page_state.get('image')
+                    }
+                    status = "unchanged"
                 else:
-                    print(f"    ✗ Failed to fetch page")
+                    result = next(parsed_pages) if troop_name in fetch_set else None
+                    if result is None:
+                        print(f"    ✗ Failed to fetch page")
+                        continue
+                    status = "✓"
+                    
+                    if self.state_path:
+                        page_state = {
+                            **revisions[troop_name],
+                            'troop': result['troop'],
+                            'equipment': [list(link) for link in result['equipment']],
+                            'missing_items': result['missing_items'],
+                            'fuzzy_matches': result['fuzzy_matches'],
+                            'image': result['image']
+                        }
+                
+                if troop_name not in resumed:
+                    troop_id = next_troop_id
+                    next_troop_id += 1
+                    if self.journal is not None:
+                        self.journal.record(troop_name, troop_id, result, page_state)
+                
+                troop_data = result['troop']
+                all_equipment.add_troop(troop_id, result['equipment'])
+                if result.get('image'):
+                    images[troop_id] = result['image']
+                self.missing_items.update(result['missing_items'])
+                self.fuzzy_matches.update(result['fuzzy_matches'])
+                
+                if self.state_path and page_state is not None:
+                    new_state[troop_name] = page_state
+                
+                all_troops.add(troop_data, troop_id, culture_id)
+                print(f"    {status} Tier {troop_data['tier']}, Wage: {troop_data['wage']}, "
+                      f"Mounted: {troop_data['is_mounted']}")
+        finally:
+            # Everything recorded so far reaches the disk, even on Ctrl-C
+            if self.journal is not None:
+                self.journal.close()
         
+        if self.state_path:
+            self.save_state(new_state)
+        
+        return self.build_data(all_troops, all_equipment, images)
+    
+    def parse_results(self, jobs: List[Tuple[str, str]], revids: Dict[str, int] = None):
+        """fetch_and_parse with the wikitext fallbacks and parity check applied; None for pages that failed"""
+        revids = revids or {}
+        for (troop_name, faction_key), result in zip(jobs, self.fetch_and_parse(jobs, revids)):
+            if result is not None and result.get('needs_html'):
+                # Templates didn't match; fall back to the rendered page
+                self.wikitext_fallbacks.append(troop_name)
+                result = self.parse_page(self.get_page_info(troop_name, revid=revids.get(troop_name)),
+                                         troop_name, faction_key)
+            elif result is not None and result['fallback']:
+                self.wikitext_fallbacks.append(troop_name)
+            
+            if result is not None and self.parity_check and result['source'] == 'wikitext':
+                self.compare_with_html(troop_name, faction_key, result, revids.get(troop_name))
+            yield result
+    
+    def build_data(self, troops: TroopStore, equipment: EquipmentLinks, images: Dict[int, Dict] = None) -> Dict:
+        """The scraped data with upgrade paths and closure, as the outputs expect it"""
+        self.upgrade_graph = graph = self.build_upgrade_graph(troops)
+        for troop_name in graph.self_loops:
+            print(f"Warning: dropped self-upgrade {troop_name} → {troop_name}")
+        for base_troop, upgraded_troop in graph.duplicate_edges:
+            print(f"Warning: upgrade {base_troop} → {upgraded_troop} is listed by more than one tree; kept once")
+        if graph.cycle_nodes:
+            print(f"Warning: upgrade cycle through {', '.join(graph.cycle_nodes)}")
         return {
-            'troops': all_troops,
+            'troops': troops,
             'cultures': self.cultures,
-            'upgrade_paths': self.build_upgrade_paths(all_troops)
+            'upgrade_paths': self.build_upgrade_paths(troops, self.upgrade_graph),
+            'upgrade_closure': self.build_upgrade_closure(troops, self.upgrade_graph),
+            'equipment': equipment,
+            'images': images or {}
         }
     
-    def build_upgrade_paths(self, troops: List[Dict]) -> List[Dict]:
-        """Build upgrade paths based on predefined trees"""
-        upgrade_paths = []
-        upgrade_paths_set = set()
+    def enqueue(self, work_queue: WorkQueue, shard_size: int) -> int:
+        """Coordinator: split the troop work list into shards for workers; returns the shard count"""
+        if self.discover_categories:
+            self.discover_troops(self.discover_categories)
+        work = self.collect_troop_work()
+        meta = {'base_url': self.base_url, 'troop_trees': self.troop_trees, 'factions': self.factions,
+                'cultures': self.cultures, 'created': time.time()}
+        shard_count = work_queue.create(meta, work, shard_size)
+        print(f"\n✓ Queued {len(work)} troops in {shard_count} shards of up to {shard_size} "
+              f"in '{work_queue.path}'")
+        return shard_count
+    
+    def run_worker(self, work_queue: WorkQueue, worker_id: str) -> int:
+        """Worker: claim shards and scrape them until every shard is done or failed; returns shards completed"""
+        completed = 0
+        while True:
+            claim = work_queue.claim(worker_id)
+            if claim is None:
+                progress = work_queue.progress()
+                if not progress['leased']:
+                    break
+                # Other workers hold the rest; wait in case one of them dies and its lease runs out
+                wait = min(max(1.0, (work_queue.next_expiry() or 0) - time.time()), WORKER_POLL_SECONDS)
+                print(f"  {progress['leased']} shards leased by other workers, checking again in {wait:.0f}s")
+                time.sleep(wait)
+                continue
+            
+            shard_id, entries = claim
+            print(f"\n  Shard {shard_id}: {len(entries)} troops ({entries[0][2]} ...)")
+            results = []
+            renewed = time.monotonic()
+            try:
+                jobs = [(title, faction_key) for _, faction_key, title in entries]
+                for (position, _, title), result in zip(entries, self.parse_results(jobs)):
+                    results.append((position, result))
+                    if result is None:
+                        print(f"    ✗ Failed to fetch {title}")
+                    if time.monotonic() - renewed > work_queue.lease_seconds / 3:
+                        if not work_queue.renew(shard_id, worker_id):
+                            break
+                        renewed = time.monotonic()
+            except BaseException as e:
+                work_queue.release(shard_id, worker_id, f"{type(e).__name__}: {e}")
+                if not isinstance(e, Exception):
+                    raise
+                print(f"    ✗ Shard {shard_id} failed: {e}")
+                continue
+            
+            if len(results) == len(entries) and work_queue.complete(shard_id, worker_id, results):
+                completed += 1
+                print(f"    ✓ Shard {shard_id} done")
+            else:
+                print(f"    ✗ Lost the lease on shard {shard_id}; another worker will redo it")
+        return completed
+    
+    def merge_queue(self, work_queue: WorkQueue) -> Dict:
+        """Assemble the workers' results in work order, numbering troops as a single run would"""
+        meta = work_queue.meta()
+        self.troop_trees = meta['troop_trees']
+        self.factions = meta['factions']
+        self.cultures = meta['cultures']
         
-        # Create name -> id mapping
-        troop_name_to_id = {troop['name']: troop['troop_id'] for troop in troops}
+        all_troops = TroopStore()
+        all_equipment = EquipmentLinks()
+        images = {}
+        troop_id = 1
+        for _, _, culture_id, title, result in work_queue.results():
+            if result is None:
+                print(f"  ✗ No page for {title}")
+                continue
+            all_troops.add(result['troop'], troop_id, culture_id)
+            all_equipment.add_troop(troop_id, result['equipment'])
+            if result.get('image'):
+                images[troop_id] = result['image']
+            self.missing_items.update(result['missing_items'])
+            self.fuzzy_matches.update(result['fuzzy_matches'])
+            troop_id += 1
+        
+        return self.build_data(all_troops, all_equipment, images)
+    
+    def resolve_image_urls(self, files: List[str]) -> Dict[str, str]:
+        """Look up file names' URLs with batched prop=imageinfo queries; files with no upload are left out"""
+        titles = [f"File:{file}" for file in files]
+        batches = [titles[i:i + BATCH_SIZE] for i in range(0, len(titles), BATCH_SIZE)]
+        params = {'prop': 'imageinfo', 'iiprop': 'url'}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda batch: self.query_titles(batch, params), batches)
         
-        # Process each faction's troop trees
+        urls = {}
+        for pages in results:
+            for title, page in pages.items():
+                info = page.get('imageinfo') if page else None
+                if info and info[0].get('url'):
+                    urls[title[len('File:'):]] = info[0]['url']
+        return urls
+    
+    def download_images(self, data: Dict, store: TroopImages) -> Dict[str, int]:
+        """Download every scraped troop's portrait into store; returns outcome counts"""
+        images = data['images']
+        unresolved = sorted({image['file'] for image in images.values() if not image.get('url') and image.get('file')})
+        resolved = self.resolve_image_urls(unresolved) if unresolved else {}
+        
+        troops = data['troops']
+        downloads = {}
+        for troop_id, image in images.items():
+            url = image.get('url') or resolved.get(image.get('file'))
+            if url:
+                # Page HTML may hold protocol- or site-relative addresses
+                downloads[troop_id] = {'name': troops.names[troops.row_of[troop_id]],
+                                       'url': urljoin(self.base_url + '/', url)}
+        
+        missing = len(troops) - len(downloads)
+        if missing:
+            print(f"  {missing} troops have no infobox image")
+        return store.download(downloads)
+    
+    def tree_edges(self) -> List[Tuple[str, str]]:
+        """Every consecutive pair in troop_trees.
+
+        Pairs repeated along one tree's paths are the shared prefix and count
+        once; an edge listed by two trees is kept twice, so the graph reports
+        it as a duplicate.
+        """
+        edges = []
         for faction, trees in self.troop_trees.items():
             for tree_type in ['common', 'noble']:
-                if tree_type not in trees:
-                    continue
-                
-                for path in trees[tree_type]:
-                    # For each consecutive pair in the path
-                    for i in range(len(path) - 1):
-                        base_troop = path[i]
-                        upgraded_troop = path[i + 1]
-                        
-                        if base_troop in troop_name_to_id and upgraded_troop in troop_name_to_id:
-                            base_id = troop_name_to_id[base_troop]
-                            upgraded_id = troop_name_to_id[upgraded_troop]
-                            path_key = (base_id, upgraded_id)
-                            
-                            # Only add if not already present
-                            if path_key not in upgrade_paths_set:
-                                upgrade_paths_set.add(path_key)
-                                upgrade_paths.append({
-                                    'base_troop_id': base_id,
-                                    'upgraded_troop_id': upgraded_id,
-                                    'xp_cost': (i + 1) * 100  # Estimated XP
-                                })
-        
-        return upgrade_paths
-    
-    def generate_sql(self, data: Dict) -> str:
-        """Generate SQL INSERT statements"""
-        sql = []
-        
-        sql.append("-- ===========================================")
-        sql.append("-- Mount & Blade II: Bannerlord Troops Database")
-        sql.append("-- ===========================================\n")
+                tree_edges = {}
+                for path in trees.get(tree_type, []):
+                    tree_edges.update(dict.fromkeys(zip(path, path[1:])))
+                edges.extend(tree_edges)
+        return edges
+    
+    def build_upgrade_graph(self, troops: Iterable[Dict]) -> UpgradeGraph:
+        """Upgrade graph over the scraped troops, from every consecutive pair in troop_trees"""
+        return UpgradeGraph([troop['name'] for troop in troops], self.tree_edges())
+    
+    def tree_positions(self) -> Dict[Tuple[str, str], int]:
+        """Position of each edge's base troop in the first troop_trees path that lists the edge"""
+        positions = {}
+        for faction, trees in self.troop_trees.items():
+            for tree_type in ['common', 'noble']:
+                for path in trees.get(tree_type, []):
+                    for position, edge in enumerate(zip(path, path[1:])):
+                        positions.setdefault(edge, position)
+        return positions
+    
+    def build_upgrade_paths(self, troops: Iterable[Dict], graph: UpgradeGraph = None) -> List[Dict]:
+        """Upgrade path rows from the upgrade graph, with xp_cost estimated from the base troop's position"""
+        graph = graph or self.build_upgrade_graph(troops)
+        troop_name_to_id = {troop['name']: troop['troop_id'] for troop in troops}
+        # Positions come from troop_trees itself: in the scraped graph, a troop whose predecessor
+        # page is missing or was dropped becomes a root, which would undercount its level
+        positions = self.tree_positions()
+        return [
+            {
+                'base_troop_id': troop_name_to_id[base_troop],
+                'upgraded_troop_id': troop_name_to_id[upgraded_troop],
+                'xp_cost': (positions.get((base_troop, upgraded_troop), graph.level(base_troop) or 0) + 1) * 100
+            }
+            for base_troop, upgraded_troop in graph.edges()
+        ]
+    
+    def build_upgrade_closure(self, troops: Iterable[Dict], graph: UpgradeGraph = None) -> List[Dict]:
+        """Ancestor/descendant rows for every pair of troops joined by one or more upgrades"""
+        graph = graph or self.build_upgrade_graph(troops)
+        troop_name_to_id = {troop['name']: troop['troop_id'] for troop in troops}
+        return [
+            {
+                'ancestor_troop_id': troop_name_to_id[ancestor],
+                'descendant_troop_id': troop_name_to_id[descendant],
+                'distance': distance
+            }
+            for ancestor, descendant, distance in graph.closure_rows()
+        ]
+    
+    def generate_sql(self, data: Dict, writer: SqlWriter):
+        """Stream SQL INSERT statements for the scraped data to writer"""
+        writer.line("-- ===========================================")
+        writer.line("-- Mount & Blade II: Bannerlord Troops Database")
+        writer.line("-- ===========================================\n")
         
         # Troops Table
-        sql.append("-- Troops Table")
-        sql.append("INSERT INTO Troops (troop_id, name, tier, wage, is_mounted, culture_id) VALUES")
-        troop_inserts = []
-        for troop in data['troops']:
-            name_escaped = troop['name'].replace("'", "''")
-            troop_inserts.append(
-                f"  ({troop['troop_id']}, '{name_escaped}', {troop['tier']}, "
-                f"{troop['wage']}, {1 if troop['is_mounted'] else 0}, {troop['culture_id']})"
-            )
-        sql.append(",\n".join(troop_inserts) + ";\n")
+        writer.section(
+            "Troops Table", "Troops",
+            ('troop_id', 'name', 'tier', 'wage', 'is_mounted', 'culture_id'),
+            ((troop['troop_id'], troop['name'], troop['tier'], troop['wage'],
+              bool(troop['is_mounted']), troop['culture_id']) for troop in data['troops'])
+        )
         
         # Attributes Table
-        sql.append("-- Attributes Table")
-        sql.append("INSERT INTO Attributes (attribute_id, name, description) VALUES")
-        attributes = ['Vigor', 'Control', 'Endurance', 'Cunning', 'Social', 'Intelligence']
-        attr_inserts = []
-        for idx, attr in enumerate(attributes, 1):
-            attr_inserts.append(f"  ({idx}, '{attr}', 'Base character attribute')")
-        sql.append(",\n".join(attr_inserts) + ";\n")
+        writer.section("Attributes Table", "Attributes", ('attribute_id', 'name', 'description'),
+                       attribute_rows())
         
         # Skills Table
-        sql.append("-- Skills Table")
-        sql.append("INSERT INTO Skills (skill_id, name, description, is_combat_skill, attribute_id) VALUES")
-        skills = [
-            ('One Handed', True, 1), ('Two Handed', True, 1), ('Polearm', True, 1),
-            ('Bow', True, 2), ('Crossbow', True, 2), ('Throwing', True, 2),
-            ('Riding', True, 3), ('Athletics', True, 3),
-            ('Tactics', False, 4), ('Scouting', False, 4), ('Roguery', False, 4),
-            ('Charm', False, 5), ('Leadership', False, 5), ('Trade', False, 5),
-            ('Steward', False, 6), ('Medicine', False, 6), ('Engineering', False, 6)
-        ]
-        skill_inserts = []
-        for idx, (skill_name, is_combat, attr_id) in enumerate(skills, 1):
-            skill_inserts.append(
-                f"  ({idx}, '{skill_name}', '{skill_name} skill', {1 if is_combat else 0}, {attr_id})"
-            )
-        sql.append(",\n".join(skill_inserts) + ";\n")
+        writer.section(
+            "Skills Table", "Skills", ('skill_id', 'name', 'description', 'is_combat_skill', 'attribute_id'),
+            skill_rows()
+        )
         
         # Upgrade Paths Table
-        sql.append("-- Troop_Upgrade_Paths Table")
-        sql.append("INSERT INTO Troop_Upgrade_Paths (base_troop_id, upgraded_troop_id, xp_cost) VALUES")
-        upgrade_inserts = []
-        for upgrade in data['upgrade_paths']:
-            upgrade_inserts.append(
-                f"  ({upgrade['base_troop_id']}, {upgrade['upgraded_troop_id']}, {upgrade['xp_cost']})"
-            )
-        sql.append(",\n".join(upgrade_inserts) + ";\n")
-        
-        # Equipment Junction Table
-        sql.append("-- Troop_Equipment_Junction Table")
-        sql.append("INSERT INTO Troop_Equipment_Junction (troop_id, item_id, slot) VALUES")
-        equipment_inserts = []
-        # Use set to avoid duplicates
-        unique_equipment = sorted(list(set(self.equipment_data)))
-        for (troop_id, item_id, slot) in unique_equipment:
-            slot_escaped = slot.replace("'", "''")
-            equipment_inserts.append(
-                f"  ({troop_id}, {item_id}, '{slot_escaped}')"
-            )
+        writer.section(
+            "Troop_Upgrade_Paths Table", "Troop_Upgrade_Paths",
+            ('base_troop_id', 'upgraded_troop_id', 'xp_cost'),
+            ((upgrade['base_troop_id'], upgrade['upgraded_troop_id'], upgrade['xp_cost'])
+             for upgrade in data['upgrade_paths'])
+        )
         
-        if equipment_inserts:
-            sql.append(",\n".join(equipment_inserts) + ";\n")
-        else:
-            sql.append("-- (No equipment data found)\n")
+        # Upgrade Closure Table (every troop reachable from every other, so no recursive queries are needed)
+        writer.line(UPGRADE_CLOSURE_DDL)
+        writer.section(
+            "Troop_Upgrade_Closure Table", "Troop_Upgrade_Closure",
+            ('ancestor_troop_id', 'descendant_troop_id', 'distance'),
+            ((row['ancestor_troop_id'], row['descendant_troop_id'], row['distance'])
+             for row in data['upgrade_closure'])
+        )
         
-        return "\n".join(sql)
+        # Equipment Junction Table (the store is already deduplicated and iterates in sorted order)
+        writer.section(
+            "Troop_Equipment_Junction Table", "Troop_Equipment_Junction",
+            ('troop_id', 'item_id', 'slot'),
+            data['equipment'],
+            empty_note="(No equipment data found)"
+        )
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape Bannerlord troop data from the Fandom wiki")
+    parser.add_argument('--base-url', default=WIKI_BASE_URL,
+                        help=f"Wiki to scrape; its API must be at <base url>/api.php (default: {WIKI_BASE_URL})")
+    parser.add_argument('--workers', type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Number of in-flight requests (default: {MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help=f"Starting and maximum API requests per second, lowered while the wiki throttles; "
+                             f"0 for no limit until it does (default: {REQUESTS_PER_SECOND:g})")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT[1],
+                        help=f"Seconds to wait for a response (default: {REQUEST_TIMEOUT[1]:g})")
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help=f"Retries for a failed or throttled request (default: {MAX_RETRIES})")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"Titles per batched query, 1 for one action=parse call per troop (default: {BATCH_SIZE})")
+    parser.add_argument('--parse-workers', type=int, default=PARSE_WORKERS,
+                        help=f"Parser processes, 0 to parse in the main process (default: {PARSE_WORKERS})")
+    parser.add_argument('--offline', action='store_true',
+                        help="Serve pages only from the page cache; no network requests")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page cache")
+    parser.add_argument('--cache-path', default=PAGE_CACHE_DB,
+                        help=f"Page cache database (default: {PAGE_CACHE_DB})")
+    parser.add_argument('--cache-ttl', type=float, default=PAGE_CACHE_TTL_HOURS,
+                        help=f"Hours a cached page is used without checking its revision (default: {PAGE_CACHE_TTL_HOURS:g})")
+    parser.add_argument('--cache-max-mb', type=float, default=PAGE_CACHE_MAX_MB,
+                        help=f"Page cache size cap in MB (default: {PAGE_CACHE_MAX_MB:g})")
+    parser.add_argument('--wikitext', action='store_true',
+                        help="Parse page wikitext instead of rendered HTML; HTML is only fetched for pages it cannot read")
+    parser.add_argument('--parity-check', action='store_true',
+                        help="Run the wikitext parser and also parse the HTML of every page, reporting differences")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only refetch pages whose revision changed since the last incremental run")
+    parser.add_argument('--state-file', default=SCRAPE_STATE_JSON,
+                        help=f"State file used by --incremental (default: {SCRAPE_STATE_JSON})")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its journal, fetching only the troops still missing")
+    parser.add_argument('--journal', default=SCRAPE_JOURNAL,
+                        help=f"Journal of completed troops, removed once the output is written (default: {SCRAPE_JOURNAL})")
+    parser.add_argument('--no-journal', action='store_true',
+                        help="Do not journal completed troops (the run cannot be resumed)")
+    parser.add_argument('--report', nargs='?', const=RUN_REPORT_JSON, metavar='PATH',
+                        help=f"Write per-stage timings, latency histograms and counters as JSON (default path: {RUN_REPORT_JSON})")
+    parser.add_argument('--prometheus', nargs='?', const=RUN_REPORT_PROM, metavar='PATH',
+                        help=f"Write the same metrics in Prometheus text format (default path: {RUN_REPORT_PROM})")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_OUTPUT, metavar='PATH',
+                        help=f"Run under cProfile and tracemalloc and print the hot spots; the profiler sees the "
+                             f"main thread only, so add --parse-workers 0 to include parsing (default path: {PROFILE_OUTPUT})")
+    parser.add_argument('--sql-output', default=SQL_OUTPUT,
+                        help=f"SQL output file, gzip-compressed if it ends in .gz (default: {SQL_OUTPUT})")
+    parser.add_argument('--sql-batch-size', type=int, default=SQL_BATCH_SIZE,
+                        help=f"Rows per INSERT statement (default: {SQL_BATCH_SIZE})")
+    parser.add_argument('--sql-transaction', action='store_true',
+                        help="Wrap the SQL output in a single BEGIN/COMMIT transaction")
+    parser.add_argument('--sqlite', nargs='?', const=SQLITE_DB, metavar='PATH',
+                        help=f"Also upsert the data and the item catalogue into a SQLite database (default path: {SQLITE_DB})")
+    parser.add_argument('--discover', action='store_true',
+                        help="Build the troop list and upgrade trees by crawling the wiki instead of using the built-in trees")
+    parser.add_argument('--category', action='append', dest='categories',
+                        help=f"Troop category to seed --discover; repeatable (default: {', '.join(TROOP_CATEGORIES)})")
+    parser.add_argument('--columnar', choices=['parquet', 'arrow'],
+                        help="Also export troops, equipment and item stats as typed Parquet or Arrow IPC files (needs pyarrow)")
+    parser.add_argument('--images', action='store_true',
+                        help="Also download the troops' infobox images (conditional GETs, stored once per content hash)")
+    parser.add_argument('--image-dir', default=IMAGE_DIR,
+                        help=f"Directory of the downloaded images (default: {IMAGE_DIR})")
+    parser.add_argument('--image-manifest', default=IMAGE_MANIFEST,
+                        help=f"Manifest mapping troop ids to image files (default: {IMAGE_MANIFEST})")
+    parser.add_argument('--image-workers', type=int, default=IMAGE_WORKERS,
+                        help=f"Parallel image downloads (default: {IMAGE_WORKERS})")
+    queue_mode = parser.add_mutually_exclusive_group()
+    queue_mode.add_argument('--enqueue', action='store_true',
+                            help="Coordinator: split the troop list into shards in the work queue for --worker processes")
+    queue_mode.add_argument('--worker', action='store_true',
+                            help="Claim and scrape shards from the work queue until none are left (any number of "
+                                 "processes, on any machine sharing the queue file)")
+    queue_mode.add_argument('--merge', action='store_true',
+                            help="Merge the workers' results from the work queue and write the usual outputs")
+    parser.add_argument('--queue', default=WORK_QUEUE_DB,
+                        help=f"Work queue database for --enqueue/--worker/--merge (default: {WORK_QUEUE_DB})")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                        help=f"Troops per shard for --enqueue (default: {SHARD_SIZE})")
+    parser.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS,
+                        help=f"How long a silent worker keeps its shard before it is handed out again "
+                             f"(default: {LEASE_SECONDS:g})")
+    parser.add_argument('--worker-id', default=None,
+                        help="Name of this worker in the queue (default: <hostname>-<pid>)")
+    parser.add_argument('--columnar-dir', default='columnar',
+                        help="Output directory for --columnar (default: columnar)")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
+    if args.profile:
+        profile_run(args)
+    else:
+        run(args)
+
+def profile_run(args: argparse.Namespace):
+    """Run under cProfile and tracemalloc, then print the hot spots"""
+    # Imported here because they are only needed for --profile
+    import cProfile
+    import pstats
+    import tracemalloc
+    
+    tracemalloc.start(PROFILE_TRACE_FRAMES)
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run, args)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(args.profile)
+        
+        print("\n" + "="*60)
+        print(f"Profile (main thread; full stats saved as '{args.profile}')")
+        print("="*60)
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        stats.sort_stats('tottime').print_stats(PROFILE_TOP)
+        
+        print(f"Memory: {current / 2**20:.1f} MB traced at exit, {peak / 2**20:.1f} MB peak")
+        print(f"Top {PROFILE_TOP} allocation sites:")
+        for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+            print(f"  {stat}")
+
+def run(args: argparse.Namespace):
+    METRICS.reset()
+    
     print("="*60)
     print("Mount & Blade II: Bannerlord Troop Data Scraper")
     print("="*60)
@@ -535,13 +1721,95 @@ def main():
         print("\nPlease run 'create_item_map_csv.py' first to generate this file.")
         return
 
-    scraper = BannerlordTroopScraper()
+    if args.offline and args.no_cache:
+        print("\nError: --offline cannot be combined with --no-cache.")
+        return
+    if args.offline and args.incremental:
+        print("\nError: --incremental needs the wiki to check revisions; drop --offline.")
+        return
+    if args.offline and args.discover:
+        print("\nError: --discover crawls the wiki's categories and links; drop --offline.")
+        return
+    if args.offline and args.images:
+        print("\nError: --images downloads from the wiki's image server; drop --offline.")
+        return
+    
+    queue_mode = args.enqueue or args.worker or args.merge
+    if queue_mode and (args.resume or args.incremental):
+        print("\nError: --resume and --incremental don't apply to work queue runs; "
+              "the queue itself keeps finished shards.")
+        return
     
-    print("\nStarting scraping process...")
-    print("This will fetch data from the Mount & Blade Fandom Wiki")
-    print("-"*60)
+    base_url = args.base_url
+    work_queue = None
+    if queue_mode:
+        work_queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+        queue_meta = work_queue.meta()
+        if (args.worker or args.merge) and not queue_meta:
+            print(f"\nError: the work queue '{args.queue}' is empty; run with --enqueue first.")
+            return
+        if args.worker or args.merge:
+            # Every worker scrapes the wiki the queue was made for, and image links resolve against it
+            base_url = queue_meta['base_url']
+    
+    if args.columnar:
+        # Imported only when asked for, since pyarrow is an optional dependency
+        import columnar_export
+        if not columnar_export.HAVE_PYARROW:
+            print("\nError: --columnar needs pyarrow (pip install pyarrow).")
+            return
+    
+    cache = None
+    if not args.no_cache:
+        cache = PageCache(args.cache_path, max_mb=args.cache_max_mb, ttl_hours=args.cache_ttl)
     
-    data = scraper.scrape_all_factions()
+    scraper = BannerlordTroopScraper(max_workers=args.workers, requests_per_second=args.rate,
+                                     batch_size=args.batch_size, cache=cache,
+                                     offline=args.offline,
+                                     state_path=args.state_file if args.incremental else None,
+                                     wikitext_mode=args.wikitext, parity_check=args.parity_check,
+                                     parse_workers=args.parse_workers,
+                                     discover_categories=(args.categories or TROOP_CATEGORIES) if args.discover else None,
+                                     timeout=(REQUEST_TIMEOUT[0], args.timeout), max_retries=args.max_retries,
+                                     journal=None if args.no_journal or queue_mode else ScrapeJournal(args.journal),
+                                     resume=args.resume, base_url=base_url)
+    
+    if args.enqueue:
+        scraper.enqueue(work_queue, args.shard_size)
+        work_queue.close()
+        return
+    
+    if args.worker:
+        worker_id = args.worker_id or default_worker_id()
+        print(f"\nWorker {worker_id} scraping {scraper.base_url} for '{args.queue}'")
+        with METRICS.stage('scrape'):
+            completed = scraper.run_worker(work_queue, worker_id)
+        progress = work_queue.progress()
+        work_queue.close()
+        print(f"\n✓ Worker {worker_id} finished {completed} shards; queue: "
+              f"{', '.join(f'{count} {status}' for status, count in progress.items())}")
+        print(f"Wiki requests: {scraper.client.stats()}")
+        return
+    
+    if args.merge:
+        progress = work_queue.progress()
+        if progress['pending'] or progress['leased']:
+            print(f"\nError: {progress['pending'] + progress['leased']} shards are not finished yet; "
+                  f"run --worker until the queue is empty.")
+            return
+        for shard_id, error in work_queue.failures():
+            print(f"Warning: shard {shard_id} failed ({error}); its troops are left out")
+        print(f"\nMerging {progress['done']} shards from '{args.queue}'")
+        with METRICS.stage('merge'):
+            data = scraper.merge_queue(work_queue)
+        work_queue.close()
+    else:
+        print("\nStarting scraping process...")
+        print(f"This will fetch data from {scraper.base_url}")
+        print("-"*60)
+        
+        with METRICS.stage('scrape'):
+            data = scraper.scrape_all_factions()
     
     print("\n" + "="*60)
     print("Scraping Complete!")
@@ -549,8 +1817,33 @@ def main():
     print(f"Total troops: {len(data['troops'])}")
     print(f"Total cultures: {len(data['cultures'])}")
     print(f"Total upgrade paths: {len(data['upgrade_paths'])}")
-    print(f"Total equipment links: {len(scraper.equipment_data)}")
-    print(f"Unique equipment entries: {len(set(scraper.equipment_data))}")
+    print(f"Upgrade closure rows: {len(data['upgrade_closure'])}")
+    graph = scraper.upgrade_graph
+    if graph.self_loops or graph.duplicate_edges:
+        print(f"Upgrade edges dropped: {len(graph.self_loops)} self-upgrades, "
+              f"{len(graph.duplicate_edges)} duplicates")
+    print(f"Total equipment links: {data['equipment'].added}")
+    print(f"Unique equipment entries: {len(data['equipment'])}")
+    print("Equipment links per slot: " + ', '.join(f"{slot} {count}" for slot, count
+                                                   in sorted(data['equipment'].slot_counts.items())))
+    if cache is not None:
+        print(f"Page cache: {cache.hits} hits, {cache.misses} misses")
+    print(f"Wiki requests: {scraper.client.stats()}")
+    if scraper.wikitext_mode:
+        print(f"Wikitext fallbacks to HTML: {len(scraper.wikitext_fallbacks)}")
+        for troop_name in scraper.wikitext_fallbacks[:20]:
+            print(f"  - {troop_name}")
+    if scraper.parity_check:
+        print(f"Parity mismatches (wikitext vs HTML): {len(scraper.parity_mismatches)}")
+        for troop_name, difference in scraper.parity_mismatches:
+            print(f"  - {troop_name}: {difference}")
+    
+    if scraper.fuzzy_matches:
+        print(f"\nResolved {len(scraper.fuzzy_matches)} item names by fuzzy match:")
+        for item, (match, confidence) in sorted(scraper.fuzzy_matches.items())[:20]:
+            print(f"  - {item} → {match} ({confidence:.2f})")
+        if len(scraper.fuzzy_matches) > 20:
+            print(f"  ... and {len(scraper.fuzzy_matches) - 20} more")
     
     if scraper.missing_items:
         print(f"\nWarning: {len(scraper.missing_items)} items not found in item map:")
@@ -562,42 +1855,101 @@ def main():
     # Show sample troops per faction
     print("\nTroops per faction:")
     for culture_name, culture_id in sorted(data['cultures'].items(), key=lambda x: x[1]):
-        count = len([t for t in data['troops'] if t['culture_id'] == culture_id])
+        count = data['troops'].culture_count(culture_id)
         print(f"  {culture_name}: {count} troops")
     
     print("\n" + "="*60)
     print("Generating SQL...")
     print("="*60)
-    sql = scraper.generate_sql(data)
+    # Rows are streamed straight to the file
+    with METRICS.stage('generate_sql'), \
+            SqlWriter(args.sql_output, batch_size=args.sql_batch_size, transaction=args.sql_transaction) as writer:
+        scraper.generate_sql(data, writer)
     
-    # Save to file
-    with open('bannerlord_troops.sql', 'w', encoding='utf-8') as f:
-        f.write(sql)
+    print(f"\n✓ SQL file saved as '{args.sql_output}'")
     
-    print("\n✓ SQL file saved as 'bannerlord_troops.sql'")
+    if args.sqlite:
+        # Imported here because generate_items_sql loads pandas
+        from generate_items_sql import ITEMS_CSV, read_item_rows, read_item_types
+        
+        item_types, item_rows = [], []
+        if os.path.exists(ITEMS_CSV):
+            item_types, item_rows = read_item_types(), read_item_rows()
+        else:
+            print(f"Warning: {ITEMS_CSV} not found, loading troops without the item catalogue")
+        
+        with METRICS.stage('sqlite_load'):
+            backend = SqliteBackend(args.sqlite)
+            counts = backend.load(data, attribute_rows(), skill_rows(), item_types, item_rows)
+            backend.close()
+        print(f"✓ SQLite database updated at '{args.sqlite}' "
+              f"({', '.join(f'{table}: {count}' for table, count in counts.items())} rows upserted)")
     
     # Save JSON (for reference)
     json_data = {
-        'troops': data['troops'],
+        'troops': list(data['troops']),
         'cultures': data['cultures'],
-        'upgrade_paths': data['upgrade_paths']
+        'upgrade_paths': data['upgrade_paths'],
+        'upgrade_closure': data['upgrade_closure']
     }
     
-    with open('bannerlord_troops.json', 'w', encoding='utf-8') as f:
+    with METRICS.stage('json_output'), open('bannerlord_troops.json', 'w', encoding='utf-8') as f:
         json.dump(json_data, f, indent=2)
     
     print("✓ JSON data saved as 'bannerlord_troops.json'")
     
+    if args.columnar:
+        with METRICS.stage('columnar_export'):
+            paths = columnar_export.export_columnar(data, args.columnar_dir, args.columnar)
+        print(f"✓ {len(paths)} {args.columnar} tables saved in '{args.columnar_dir}'")
+    
+    # Every output is written, so the run no longer needs to be resumable
+    if scraper.journal is not None:
+        scraper.journal.discard()
+    
+    if args.images:
+        print(f"\nDownloading images of {len(data['images'])} troops into '{args.image_dir}'")
+        store = TroopImages(args.image_dir, args.image_manifest, workers=args.image_workers)
+        counts = scraper.download_images(data, store)
+        print(f"✓ Images: {counts['downloaded']} downloaded, {counts['not_modified']} unchanged, "
+              f"{counts['duplicate']} already stored, {counts['failed']} failed; "
+              f"manifest saved as '{args.image_manifest}'")
+    
     # Print sample
     print("\n" + "="*60)
     print("Sample Output (first 30 lines):")
     print("="*60)
-    lines = sql.split('\n')
-    for line in lines[:30]:
+    for line in read_head(args.sql_output, 30):
         print(line)
-    if len(lines) > 30:
+    if writer.lines > 30:
         print("...")
-        print(f"\n(Total {len(lines)} lines in SQL file)")
+        print(f"\n(Total {writer.lines} lines in SQL file)")
+    
+    gauges = {'troops': len(data['troops']), 'equipment_links': len(data['equipment']),
+              'request_rate': scraper.client.limiter.rate}
+    if cache is not None:
+        gauges.update(page_cache_hits=cache.hits, page_cache_misses=cache.misses)
+    report = METRICS.report(gauges)
+    
+    print("\n" + "="*60)
+    print(f"Timing ({report['elapsed_seconds']:.1f}s, {report['pages_per_second']:.2f} pages/s)")
+    print("="*60)
+    for name, stage in report['stages'].items():
+        print(f"  {name:<16} {stage['calls']:>7} calls  {stage['wall_seconds']:>9.3f}s wall  "
+              f"{stage['cpu_seconds']:>9.3f}s cpu")
+    for name, histogram in report['latencies'].items():
+        print(f"  {name} requests: p50 {histogram['p50'] * 1000:.0f} ms, p95 {histogram['p95'] * 1000:.0f} ms, "
+              f"p99 {histogram['p99'] * 1000:.0f} ms")
+    print(f"  Downloaded {report['counters'].get('bytes_downloaded', 0) / 2**20:.2f} MB")
+    if report['item_hit_rate'] is not None:
+        print(f"  Item resolution: {report['item_hit_rate']:.1%} of item names mapped")
+    
+    if args.report:
+        METRICS.write_json(args.report, report)
+        print(f"\n✓ Run report saved as '{args.report}'")
+    if args.prometheus:
+        METRICS.write_prometheus(args.prometheus, report)
+        print(f"✓ Prometheus metrics saved as '{args.prometheus}'")
 
 if __name__ == "__main__":
     main()
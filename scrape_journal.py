@@ -0,0 +1,116 @@
+# scrape_journal.py
+import json
+import os
+import time
+from typing import Dict, Optional
+
+# --- Configuration ---
+SCRAPE_JOURNAL = 'scrape_journal.jsonl'
+JOURNAL_FSYNC_EVERY = 20        # Records between fsyncs
+JOURNAL_FSYNC_SECONDS = 2.0     # ...or seconds, whichever comes first
+# --- End Configuration ---
+
+
+class ScrapeJournal:
+    """Append-only JSON Lines journal of completed troops, for resuming a crashed run.
+
+    The first line is a header with the run's troop trees, factions and
+    cultures; every other line is one finished troop with its troop id and
+    parsed result. Each record is flushed to the OS as it is written, so a
+    crash of the process loses nothing; fsync is batched, so a power cut
+    loses at most the last few records. A torn last line from a crash
+    mid-write is dropped on replay.
+    """
+
+    def __init__(self, path: str = SCRAPE_JOURNAL, fsync_every: int = JOURNAL_FSYNC_EVERY,
+                 fsync_seconds: float = JOURNAL_FSYNC_SECONDS):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_seconds = fsync_seconds
+        self.header = None
+        self.records = {}
+        self.file = None
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def replay(self) -> bool:
+        """Load the header and troop records of an earlier run; False if there is nothing to resume"""
+        if not os.path.exists(self.path):
+            return False
+
+        good_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                good_bytes += len(line)
+                if record.get('type') == 'run':
+                    self.header = record
+                elif record.get('type') == 'troop':
+                    self.records[record['title']] = record
+
+        if self.header is None:
+            return False
+        # Cut off a torn final record so appends start on a clean line
+        with open(self.path, 'r+b') as f:
+            f.truncate(good_bytes)
+        return True
+
+    def start(self, troop_trees: Dict, factions: Dict[str, str], cultures: Dict[str, int]):
+        """Begin a new journal for this run, replacing any old one"""
+        self.header = {'type': 'run', 'started': time.time(), 'troop_trees': troop_trees,
+                       'factions': factions, 'cultures': cultures}
+        self.records = {}
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self._append(self.header)
+        self.sync()
+
+    def reopen(self):
+        """Continue appending to a replayed journal"""
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, title: str, troop_id: int, result: Dict, page_state: Optional[Dict]):
+        """Append one completed troop"""
+        entry = {
+            'type': 'troop',
+            'title': title,
+            'troop_id': troop_id,
+            'troop': result['troop'],
+            'equipment': [list(link) for link in result['equipment']],
+            'missing_items': result['missing_items'],
+            'fuzzy_matches': result['fuzzy_matches'],
+            'image': result.get('image'),
+            'page_state': page_state
+        }
+        self.records[title] = entry
+        self._append(entry)
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.synced_at >= self.fsync_seconds:
+            self.sync()
+
+    def _append(self, entry: Dict):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def sync(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        """Remove the journal once the run's output is safely written"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
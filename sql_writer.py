@@ -0,0 +1,102 @@
+# sql_writer.py
+import gzip
+from itertools import islice
+from typing import Iterable, List, Optional, Sequence
+
+# --- Configuration ---
+SQL_BATCH_SIZE = 1000   # Rows per INSERT statement, keeps each statement under server packet limits
+# --- End Configuration ---
+
+
+def sql_literal(value) -> str:
+    """Format a Python value as an SQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def open_text(path: str, mode: str):
+    """Open a UTF-8 text file, gzip-compressed when the name ends in .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def read_head(path: str, count: int) -> List[str]:
+    """First count lines of a (possibly gzipped) text file, without reading the rest"""
+    with open_text(path, 'r') as f:
+        return [line.rstrip('\n') for line in islice(f, count)]
+
+
+class SqlWriter:
+    """Streams SQL to a file as rows are produced.
+
+    Multi-row INSERTs are cut every batch_size rows, so no statement (and
+    nothing held in memory) grows with the row count. With transaction set
+    the whole file is wrapped in BEGIN/COMMIT. Paths ending in .gz are
+    written gzip-compressed.
+    """
+
+    def __init__(self, path: str, batch_size: int = SQL_BATCH_SIZE, transaction: bool = False):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.transaction = transaction
+        self.lines = 0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open_text(self.path, 'w')
+        if self.transaction:
+            self.line("BEGIN;\n")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.transaction and exc_type is None:
+            self.line("\nCOMMIT;")
+        self.file.close()
+        return False
+
+    def line(self, text: str = ''):
+        """Write text followed by a newline"""
+        self.file.write(text + '\n')
+        self.lines += text.count('\n') + 1
+
+    def insert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        """Write rows as INSERT statements of at most batch_size rows; returns the row count"""
+        return self.insert_tuples(
+            table, columns, ("(" + ", ".join(sql_literal(value) for value in row) + ")" for row in rows)
+        )
+
+    def insert_tuples(self, table: str, columns: Sequence[str], tuples: Iterable[str]) -> int:
+        """Like insert, for rows already formatted as '(literal, ...)' strings"""
+        header = f"INSERT INTO {table} ({', '.join(columns)}) VALUES"
+        count = 0
+        for row in tuples:
+            if count % self.batch_size == 0:
+                if count:
+                    self.file.write(";\n")
+                    self.lines += 1
+                self.line(header)
+            else:
+                self.file.write(",\n")
+                self.lines += 1
+            self.file.write("  " + row)
+            count += 1
+
+        if count:
+            self.line(";")
+        return count
+
+    def section(self, comment: str, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                empty_note: Optional[str] = None) -> int:
+        """Write a commented INSERT block followed by a blank line"""
+        self.line(f"-- {comment}")
+        count = self.insert(table, columns, rows)
+        if not count and empty_note:
+            self.line(f"-- {empty_note}")
+        self.line()
+        return count
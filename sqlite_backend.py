@@ -0,0 +1,226 @@
+# sqlite_backend.py
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+# --- Configuration ---
+SQLITE_DB = 'bannerlord_troops.sqlite'
+REINDEX_FRACTION = 0.25   # Rows loaded, as a share of a table's rows, above which its indexes are rebuilt
+# --- End Configuration ---
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS Item_Types (
+        item_type_id INTEGER PRIMARY KEY,
+        item_type TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS Items (
+        item_id INTEGER PRIMARY KEY,
+        item_type_id INTEGER REFERENCES Item_Types (item_type_id),
+        culture_id INTEGER,
+        name TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS Troops (
+        troop_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        tier INTEGER,
+        wage INTEGER,
+        is_mounted INTEGER NOT NULL DEFAULT 0,
+        culture_id INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS Attributes (
+        attribute_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT
+    );
+    CREATE TABLE IF NOT EXISTS Skills (
+        skill_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        is_combat_skill INTEGER NOT NULL DEFAULT 0,
+        attribute_id INTEGER REFERENCES Attributes (attribute_id)
+    );
+    CREATE TABLE IF NOT EXISTS Troop_Upgrade_Paths (
+        base_troop_id INTEGER NOT NULL REFERENCES Troops (troop_id),
+        upgraded_troop_id INTEGER NOT NULL REFERENCES Troops (troop_id),
+        xp_cost INTEGER,
+        PRIMARY KEY (base_troop_id, upgraded_troop_id)
+    );
+    CREATE TABLE IF NOT EXISTS Troop_Upgrade_Closure (
+        ancestor_troop_id INTEGER NOT NULL REFERENCES Troops (troop_id),
+        descendant_troop_id INTEGER NOT NULL REFERENCES Troops (troop_id),
+        distance INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_troop_id, descendant_troop_id)
+    );
+    CREATE TABLE IF NOT EXISTS Troop_Equipment_Junction (
+        troop_id INTEGER NOT NULL REFERENCES Troops (troop_id),
+        item_id INTEGER NOT NULL,
+        slot TEXT NOT NULL,
+        PRIMARY KEY (troop_id, item_id, slot)
+    );
+"""
+
+# Secondary indexes per table. A load that writes a large share of a table's rows
+# drops them first and builds them again once the rows are in, which is cheaper
+# than updating them on every insert; smaller loads keep them
+INDEXES = {
+    'Items': [('idx_items_name', 'name')],
+    'Troops': [('idx_troops_culture', 'culture_id')],
+    'Troop_Upgrade_Paths': [('idx_upgrades_upgraded', 'upgraded_troop_id')],
+    'Troop_Upgrade_Closure': [('idx_closure_descendant', 'descendant_troop_id')],
+    'Troop_Equipment_Junction': [('idx_equipment_item', 'item_id')]
+}
+
+BULK_LOAD_PRAGMAS = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -65536;
+"""
+
+
+class SqliteBackend:
+    """Loads scraped troops (and the item catalogue) straight into a SQLite database.
+
+    Everything goes in through executemany in one transaction. Troops are
+    upserted by name and items by item id, so a rerun updates rows in place
+    and troop ids stay stable between runs. Upgrade paths, the upgrade
+    closure and equipment links of the scraped troops are upserted too, and
+    links that disappeared from the wiki are deleted. Tables that get more
+    than REINDEX_FRACTION of their rows written have their secondary
+    indexes dropped for the load and rebuilt after it, inside the same
+    transaction.
+    """
+
+    def __init__(self, path: str = SQLITE_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(BULK_LOAD_PRAGMAS)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def load(self, data: Dict, attributes: Iterable[Tuple], skills: Iterable[Tuple],
+             item_types: Iterable[Tuple] = (), items: Iterable[Tuple] = ()) -> Dict[str, int]:
+        """Upsert one scrape and return the number of rows written per table"""
+        item_types, items = list(item_types), list(items)
+        loading = {
+            'Items': len(items),
+            'Troops': len(data['troops']),
+            'Troop_Upgrade_Paths': len(data['upgrade_paths']),
+            'Troop_Upgrade_Closure': len(data['upgrade_closure']),
+            'Troop_Equipment_Junction': len(data['equipment'])
+        }
+        counts = {}
+        with self.conn:
+            # Opened explicitly, so dropping and rebuilding the indexes is part of the transaction
+            self.conn.execute("BEGIN")
+            self._drop_indexes_for(loading)
+            counts['Item_Types'] = self._upsert(
+                "INSERT INTO Item_Types (item_type_id, item_type) VALUES (?, ?) "
+                "ON CONFLICT (item_type_id) DO UPDATE SET item_type = excluded.item_type",
+                item_types
+            )
+            counts['Items'] = self._upsert(
+                "INSERT INTO Items (item_id, item_type_id, culture_id, name) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (item_id) DO UPDATE SET item_type_id = excluded.item_type_id, "
+                "culture_id = excluded.culture_id, name = excluded.name",
+                items
+            )
+            counts['Attributes'] = self._upsert(
+                "INSERT INTO Attributes (attribute_id, name, description) VALUES (?, ?, ?) "
+                "ON CONFLICT (attribute_id) DO UPDATE SET name = excluded.name, description = excluded.description",
+                attributes
+            )
+            counts['Skills'] = self._upsert(
+                "INSERT INTO Skills (skill_id, name, description, is_combat_skill, attribute_id) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (skill_id) DO UPDATE SET name = excluded.name, description = excluded.description, "
+                "is_combat_skill = excluded.is_combat_skill, attribute_id = excluded.attribute_id",
+                skills
+            )
+
+            # New troops take the next free id; existing ones keep theirs
+            counts['Troops'] = self._upsert(
+                "INSERT INTO Troops (name, tier, wage, is_mounted, culture_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET tier = excluded.tier, wage = excluded.wage, "
+                "is_mounted = excluded.is_mounted, culture_id = excluded.culture_id",
+                ((troop['name'], troop['tier'], troop['wage'], 1 if troop['is_mounted'] else 0,
+                  troop['culture_id']) for troop in data['troops'])
+            )
+            troop_ids = self._troop_id_map(data['troops'])
+
+            counts['Troop_Upgrade_Paths'] = self._replace_links(
+                "Troop_Upgrade_Paths", "base_troop_id", ('base_troop_id', 'upgraded_troop_id'),
+                "INSERT INTO Troop_Upgrade_Paths (base_troop_id, upgraded_troop_id, xp_cost) VALUES (?, ?, ?) "
+                "ON CONFLICT (base_troop_id, upgraded_troop_id) DO UPDATE SET xp_cost = excluded.xp_cost",
+                [(troop_ids[path['base_troop_id']], troop_ids[path['upgraded_troop_id']], path['xp_cost'])
+                 for path in data['upgrade_paths']],
+                troop_ids.values()
+            )
+            counts['Troop_Upgrade_Closure'] = self._replace_links(
+                "Troop_Upgrade_Closure", "ancestor_troop_id", ('ancestor_troop_id', 'descendant_troop_id'),
+                "INSERT INTO Troop_Upgrade_Closure (ancestor_troop_id, descendant_troop_id, distance) "
+                "VALUES (?, ?, ?) "
+                "ON CONFLICT (ancestor_troop_id, descendant_troop_id) DO UPDATE SET distance = excluded.distance",
+                [(troop_ids[row['ancestor_troop_id']], troop_ids[row['descendant_troop_id']], row['distance'])
+                 for row in data['upgrade_closure']],
+                troop_ids.values()
+            )
+            counts['Troop_Equipment_Junction'] = self._replace_links(
+                "Troop_Equipment_Junction", "troop_id", ('troop_id', 'item_id', 'slot'),
+                "INSERT OR IGNORE INTO Troop_Equipment_Junction (troop_id, item_id, slot) VALUES (?, ?, ?)",
+                sorted((troop_ids[troop_id], item_id, slot) for troop_id, item_id, slot in data['equipment']),
+                troop_ids.values()
+            )
+            self._create_indexes()
+
+        self.conn.execute("PRAGMA optimize")
+        return counts
+
+    def _drop_indexes_for(self, loading: Dict[str, int]):
+        """Drop the indexes of tables about to get more than REINDEX_FRACTION of their rows written"""
+        for table, indexes in INDEXES.items():
+            existing = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if loading[table] > REINDEX_FRACTION * existing:
+                for name, _ in indexes:
+                    self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def _create_indexes(self):
+        for table, indexes in INDEXES.items():
+            for name, column in indexes:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+
+    def _upsert(self, statement: str, rows: Iterable[Tuple]) -> int:
+        cursor = self.conn.executemany(statement, rows)
+        return max(cursor.rowcount, 0)
+
+    def _troop_id_map(self, troops: List[Dict]) -> Dict[int, int]:
+        """Scraped troop id -> database troop id, matched on troop name"""
+        name_to_id = dict(self.conn.execute("SELECT name, troop_id FROM Troops"))
+        return {troop['troop_id']: name_to_id[troop['name']] for troop in troops}
+
+    def _replace_links(self, table: str, owner_column: str, key_columns: Tuple[str, ...],
+                       statement: str, rows: List[Tuple], owners: Iterable[int]) -> int:
+        """Upsert rows, then delete the owners' rows that are no longer scraped"""
+        written = self._upsert(statement, rows)
+
+        columns = ', '.join(key_columns)
+        matches = ' AND '.join(f"c.{column} = {table}.{column}" for column in key_columns)
+        # Same column types as the table, so the lookup below can use the temp table's key
+        types = {row[1]: row[2] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        typed_columns = ', '.join(f"{column} {types[column]}" for column in key_columns)
+        self.conn.execute("DROP TABLE IF EXISTS temp.current_links")
+        self.conn.execute(f"CREATE TEMP TABLE current_links ({typed_columns}, PRIMARY KEY ({columns}))")
+        self.conn.executemany(
+            f"INSERT OR IGNORE INTO temp.current_links VALUES ({', '.join('?' * len(key_columns))})",
+            (row[:len(key_columns)] for row in rows)
+        )
+        self.conn.execute("DROP TABLE IF EXISTS temp.scraped_owners")
+        self.conn.execute("CREATE TEMP TABLE scraped_owners (owner_id INTEGER PRIMARY KEY)")
+        self.conn.executemany("INSERT OR IGNORE INTO temp.scraped_owners VALUES (?)",
+                              ((owner,) for owner in owners))
+        self.conn.execute(
+            f"DELETE FROM {table} WHERE {owner_column} IN (SELECT owner_id FROM temp.scraped_owners) "
+            f"AND NOT EXISTS (SELECT 1 FROM temp.current_links AS c WHERE {matches})"
+        )
+        return written
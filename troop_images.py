@@ -0,0 +1,194 @@
+# troop_images.py
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from metrics import METRICS
+from wiki_client import BACKOFF_BASE, BACKOFF_MAX, RETRY_STATUSES, USER_AGENT, retry_after_seconds
+
+# --- Configuration ---
+IMAGE_DIR = 'troop_images'
+IMAGE_MANIFEST = 'troop_images.json'
+IMAGE_WORKERS = 8             # Parallel downloads; images come from the CDN, not the API, so --workers doesn't apply
+IMAGE_TIMEOUT = (5, 30)       # (connect, read) seconds
+IMAGE_MAX_RETRIES = 3         # Attempts after the first for a failed or throttled download
+# --- End Configuration ---
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg'
+}
+# The file's own extension, for servers that send a generic Content-Type
+URL_EXTENSION_RE = re.compile(r'\.(png|jpe?g|gif|webp|svg)(?=[/?#]|$)', re.IGNORECASE)
+
+
+class ImageDownloadError(Exception):
+    """An image that could not be downloaded, after any retries"""
+
+
+def image_extension(url: str, content_type: str) -> str:
+    extension = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+    if extension:
+        return extension
+    match = URL_EXTENSION_RE.search(url)
+    if match:
+        return '.' + match.group(1).lower().replace('jpeg', 'jpg')
+    return '.bin'
+
+
+class TroopImages:
+    """Content-addressed store of troop images, filled by concurrent conditional GETs.
+
+    Every image is saved once, as <directory>/<aa>/<sha256><ext>, however many
+    URLs serve the same bytes. The manifest records each URL's validators
+    (ETag, Last-Modified) and content hash, and the file every troop id maps
+    to. Rerunning sends If-None-Match / If-Modified-Since for known URLs, so
+    unchanged images cost one empty 304 each. Files and the manifest are
+    written under a temporary name and renamed, so an interrupted run never
+    leaves a torn file behind.
+    """
+
+    def __init__(self, directory: str = IMAGE_DIR, manifest_path: str = IMAGE_MANIFEST,
+                 workers: int = IMAGE_WORKERS, timeout=IMAGE_TIMEOUT, max_retries: int = IMAGE_MAX_RETRIES):
+        self.directory = directory
+        self.manifest_path = manifest_path
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.urls = self.load_manifest().get('urls', {})    # url -> {sha256, file, bytes, etag, last_modified}
+
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading {self.manifest_path}, downloading every image again: {e}")
+            return {}
+
+    def local_path(self, file: str) -> str:
+        return os.path.join(self.directory, file)
+
+    def store(self, content: bytes, extension: str) -> Tuple[str, str, bool]:
+        """Save content under its hash; returns (sha256, file relative to the directory, newly written)"""
+        digest = hashlib.sha256(content).hexdigest()
+        file = f"{digest[:2]}/{digest}{extension}"
+        path = self.local_path(file)
+        if os.path.exists(path):
+            return digest, file, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per thread, so two downloads of the same bytes never share a temporary file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return digest, file, True
+
+    def fetch(self, url: str) -> Tuple[Dict, str]:
+        """Download url unless it is unchanged; returns (manifest entry, outcome)"""
+        known = self.urls.get(url)
+        headers = {}
+        if known and os.path.exists(self.local_path(known['file'])):
+            if known.get('etag'):
+                headers['If-None-Match'] = known['etag']
+            if known.get('last_modified'):
+                headers['If-Modified-Since'] = known['last_modified']
+
+        attempt = 0
+        while True:
+            retry_after = 0.0
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                METRICS.observe('image', time.perf_counter() - started)
+                if response.status_code == 304 and headers:
+                    return known, 'not_modified'
+                if response.status_code == 200:
+                    break
+                if response.status_code not in RETRY_STATUSES:
+                    raise ImageDownloadError(f"HTTP {response.status_code}")
+                error = f"HTTP {response.status_code}"
+                retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+
+            if attempt >= self.max_retries:
+                raise ImageDownloadError(f"{error} (gave up after {attempt + 1} attempts)")
+            attempt += 1
+            backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            time.sleep(max(retry_after, backoff))
+
+        content = response.content
+        METRICS.count('image_bytes', len(content))
+        digest, file, written = self.store(content, image_extension(url, response.headers.get('Content-Type', '')))
+        entry = {
+            'sha256': digest,
+            'file': file,
+            'bytes': len(content),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+        return entry, 'downloaded' if written else 'duplicate'
+
+    def fetch_quietly(self, url: str) -> Tuple[Optional[Dict], str]:
+        """fetch(), with a failure reported as (previous entry if its file is still there, 'failed')"""
+        try:
+            return self.fetch(url)
+        except Exception as e:
+            print(f"  ✗ Image {url}: {e}")
+            known = self.urls.get(url)
+            if known and os.path.exists(self.local_path(known['file'])):
+                return known, 'failed'
+            return None, 'failed'
+
+    def download(self, troops: Dict[int, Dict]) -> Dict[str, int]:
+        """Fetch the images of {troop_id: {'name', 'url'}} and write the manifest; returns outcome counts"""
+        urls = list(dict.fromkeys(troop['url'] for troop in troops.values()))
+        counts = {'downloaded': 0, 'duplicate': 0, 'not_modified': 0, 'failed': 0}
+
+        with METRICS.stage('images'), ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for url, (entry, outcome) in zip(urls, executor.map(self.fetch_quietly, urls)):
+                counts[outcome] += 1
+                METRICS.count(f'images_{outcome}')
+                if entry is not None:
+                    self.urls[url] = entry
+
+        manifest_troops = {}
+        for troop_id, troop in sorted(troops.items()):
+            entry = self.urls.get(troop['url'])
+            if entry is None:
+                continue
+            manifest_troops[str(troop_id)] = {
+                'name': troop['name'],
+                'url': troop['url'],
+                'sha256': entry['sha256'],
+                'path': f"{self.directory}/{entry['file']}"
+            }
+        self.save_manifest(manifest_troops)
+        return counts
+
+    def save_manifest(self, troops: Dict[str, Dict]):
+        """Write the manifest atomically; URLs of earlier runs are kept so their validators stay usable"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'image_dir': self.directory, 'troops': troops, 'urls': self.urls}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
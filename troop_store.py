@@ -0,0 +1,221 @@
+# troop_store.py
+"""Compact, column-oriented in-memory store for scraped troops and equipment links.
+
+Troops are rows of typed arrays (ids, tiers, wages, mounted flags, culture
+ids, faction codes) plus a list of names, instead of one dict per troop.
+Equipment links are packed into one integer each:
+
+    troop_id << 40 | item_id << 8 | slot code
+
+deduplicated as they arrive, and stored in one array. Slot names are
+interned as small codes, allocated in alphabetical order for the known item
+slots, so sorting the packed keys orders the links as (troop_id, item_id,
+slot) tuples. Troop rows per culture and link positions per slot are kept up
+to date on every insert, so summaries and by-slot lookups never scan the data.
+"""
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+# Slots written by create_item_map_enhanced.py; others get codes after these
+ITEM_SLOTS = ('armors', 'horses', 'melee_weapons', 'ranged_weapons', 'shields')
+
+ITEM_ID_BITS = 32
+SLOT_BITS = 8
+TROOP_SHIFT = ITEM_ID_BITS + SLOT_BITS
+TROOP_ID_LIMIT = 1 << (64 - TROOP_SHIFT)
+FACTION_CODE_LIMIT = 1 << 16    # faction codes are stored as unsigned shorts
+ITEM_ID_LIMIT = 1 << ITEM_ID_BITS
+SLOT_MASK = (1 << SLOT_BITS) - 1
+ITEM_ID_MASK = ITEM_ID_LIMIT - 1
+
+
+class TroopStore:
+    """Troop rows in parallel typed arrays, with an incremental per-culture row index.
+
+    Iterating yields one dict per troop (the shape the outputs and JSON
+    expect), built on the fly; the columns themselves are the storage.
+    """
+
+    def __init__(self):
+        self.troop_ids = array('I')
+        self.names = []
+        self.tiers = array('B')
+        self.wages = array('I')
+        self.mounted = array('B')
+        self.culture_ids = array('H')
+        self.faction_codes = array('H')
+        self.factions = []              # faction code -> faction key
+        self.faction_index = {}         # faction key -> faction code
+        self.rows_by_culture = {}       # culture id -> array of row numbers
+        self.row_of = {}                # troop id -> row number
+
+    def add(self, troop: Dict, troop_id: int, culture_id: int) -> int:
+        """Append a parsed troop ({'name', 'tier', 'wage', 'is_mounted', 'faction'}); returns its row"""
+        if troop_id in self.row_of:
+            raise ValueError(f"troop id {troop_id} is already stored")
+        faction = troop['faction']
+        code = self.faction_index.get(faction)
+        if code is None:
+            if len(self.factions) >= FACTION_CODE_LIMIT:
+                raise ValueError(f"Too many factions: {len(self.factions) + 1}")
+            code = self.faction_index[faction] = len(self.factions)
+            self.factions.append(faction)
+
+        row = len(self.names)
+        self.troop_ids.append(troop_id)
+        self.names.append(troop['name'])
+        self.tiers.append(troop['tier'])
+        self.wages.append(troop['wage'])
+        self.mounted.append(1 if troop['is_mounted'] else 0)
+        self.culture_ids.append(culture_id)
+        self.faction_codes.append(code)
+        self.rows_by_culture.setdefault(culture_id, array('I')).append(row)
+        self.row_of[troop_id] = row
+        return row
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def row(self, row: int) -> Dict:
+        return {
+            'name': self.names[row],
+            'tier': self.tiers[row],
+            'wage': self.wages[row],
+            'is_mounted': bool(self.mounted[row]),
+            'faction': self.factions[self.faction_codes[row]],
+            'troop_id': self.troop_ids[row],
+            'culture_id': self.culture_ids[row]
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self.row(row) for row in range(len(self.names)))
+
+    def culture_count(self, culture_id: int) -> int:
+        return len(self.rows_by_culture.get(culture_id, ()))
+
+
+class EquipmentLinks:
+    """Deduplicated (troop_id, item_id, slot) links, one packed integer each.
+
+    The keys live in a single array, eight bytes per link, as one sorted run
+    per insert with each troop's runs indexed by troop id, and each slot's
+    positions in the array indexed by slot code. Since every key
+    carries its troop id, deduplicating a troop's links against a set of its
+    own keys is enough. While troops arrive in increasing id order (the
+    normal case) the array stays sorted and iterating needs no sort;
+    otherwise it is sorted once, on first use. Troop ids must fit in 24 bits,
+    item ids in 32 and slot codes in 8; add_troop raises ValueError for
+    anything that would not.
+    """
+
+    def __init__(self):
+        self.keys = array('Q')
+        self.runs = {}                  # troop id -> [(start, end), ...] in keys
+        self.slots = list(ITEM_SLOTS)   # slot code -> slot name
+        self.slot_codes = {slot: code for code, slot in enumerate(self.slots)}
+        self.slot_positions = [array('I') for _ in self.slots]  # slot code -> positions in keys
+        self.added = 0                  # links offered, duplicates included
+        self.in_order = True            # keys are sorted
+        self.codes_sorted = True        # slot codes still follow slot name order
+
+    def slot_code(self, slot: str) -> int:
+        code = self.slot_codes.get(slot)
+        if code is None:
+            if len(self.slots) >= 1 << SLOT_BITS:
+                raise ValueError(f"Too many equipment slots: {len(self.slots) + 1}")
+            self.codes_sorted = self.codes_sorted and slot > self.slots[-1]
+            code = self.slot_codes[slot] = len(self.slots)
+            self.slots.append(slot)
+            self.slot_positions.append(array('I'))
+        return code
+
+    def sort_key(self, key: int):
+        """Order of (troop_id, item_id, slot name); the key itself while slot codes follow name order"""
+        if self.codes_sorted:
+            return key
+        return key >> SLOT_BITS, self.slots[key & SLOT_MASK]
+
+    def add_troop(self, troop_id: int, links: List[Tuple[int, str]]) -> int:
+        """Store a troop's (item_id, slot) links; returns how many were new"""
+        # Checked before anything is stored: a troop id past 24 bits overflows the 64-bit key,
+        # and an item id past 32 bits would silently change the troop id
+        if not 0 <= troop_id < TROOP_ID_LIMIT:
+            raise ValueError(f"troop id {troop_id} out of range")
+        for item_id, _ in links:
+            if not 0 <= item_id < ITEM_ID_LIMIT:
+                raise ValueError(f"item id {item_id} out of range")
+        slot_codes = self.slot_codes
+        for _, slot in links:
+            if slot not in slot_codes:
+                self.slot_code(slot)
+        self.added += len(links)
+
+        troop_key = troop_id << TROOP_SHIFT
+        new_keys = {troop_key | item_id << SLOT_BITS | slot_codes[slot] for item_id, slot in links}
+        runs = self.runs.get(troop_id)
+        for start, end in runs or ():
+            new_keys.difference_update(self.keys[start:end])
+        if not new_keys:
+            return 0
+
+        if runs or (self.keys and self.keys[-1] >> TROOP_SHIFT > troop_id):
+            self.in_order = False
+        start = len(self.keys)
+        self.keys.extend(sorted(new_keys, key=None if self.codes_sorted else self.sort_key))
+        self.runs.setdefault(troop_id, []).append((start, len(self.keys)))
+        keys, slot_positions = self.keys, self.slot_positions
+        for position in range(start, len(keys)):
+            slot_positions[keys[position] & SLOT_MASK].append(position)
+        return len(new_keys)
+
+    @property
+    def slot_counts(self) -> Dict[str, int]:
+        """Unique links per slot name"""
+        return {slot: len(positions) for slot, positions in zip(self.slots, self.slot_positions) if positions}
+
+    def slot_links(self, slot: str) -> Iterator[Tuple[int, int]]:
+        """(troop_id, item_id) of every link in slot, in sorted order, without scanning the other slots"""
+        code = self.slot_codes.get(slot)
+        if code is None:
+            return
+        keys = self._sorted()
+        for position in self.slot_positions[code]:
+            key = keys[position]
+            yield key >> TROOP_SHIFT, key >> SLOT_BITS & ITEM_ID_MASK
+
+    @property
+    def duplicates(self) -> int:
+        return self.added - len(self.keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _sorted(self) -> array:
+        if not self.in_order:
+            self.keys = array('Q', sorted(self.keys, key=None if self.codes_sorted else self.sort_key))
+            # Every troop is one run again
+            self.runs = {}
+            start = 0
+            for end in range(1, len(self.keys) + 1):
+                if end == len(self.keys) or self.keys[end] >> TROOP_SHIFT != self.keys[start] >> TROOP_SHIFT:
+                    self.runs[self.keys[start] >> TROOP_SHIFT] = [(start, end)]
+                    start = end
+            self.slot_positions = [array('I') for _ in self.slots]
+            for position, key in enumerate(self.keys):
+                self.slot_positions[key & SLOT_MASK].append(position)
+            self.in_order = True
+        return self.keys
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        slots = self.slots
+        for key in self._sorted():
+            yield key >> TROOP_SHIFT, key >> SLOT_BITS & ITEM_ID_MASK, slots[key & SLOT_MASK]
+
+    def columns(self) -> Tuple[array, array, array]:
+        """Sorted links as (troop ids, item ids, slot codes) arrays; slot codes index self.slots"""
+        troop_ids, item_ids, codes = array('I'), array('I'), array('B')
+        for key in self._sorted():
+            troop_ids.append(key >> TROOP_SHIFT)
+            item_ids.append(key >> SLOT_BITS & ITEM_ID_MASK)
+            codes.append(key & SLOT_MASK)
+        return troop_ids, item_ids, codes
@@ -0,0 +1,152 @@
+# upgrade_graph.py
+from array import array
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class UpgradeGraph:
+    """Troop upgrade graph with integer-indexed CSR adjacency and precomputed closures.
+
+    Troops are numbered in the order given. Children and parents are slices
+    of flat arrays (CSR), so listing them is O(k). Every troop's descendants
+    are found once by breadth-first search; they are kept as sorted arrays
+    (O(k) listing) and as sets (O(1) reachability), and inverted into sorted
+    ancestor arrays. Memory grows with the closure size, not with troops
+    squared. Self-loops and repeated edges in the input are dropped and
+    reported, as are troops on cycles.
+    """
+
+    def __init__(self, names: Iterable[str], edges: Iterable[Tuple[str, str]]):
+        self.names = list(dict.fromkeys(names))
+        self.index = {name: position for position, name in enumerate(self.names)}
+
+        counts = Counter()
+        self.self_loops = []
+        for base, upgraded in edges:
+            if base not in self.index or upgraded not in self.index:
+                continue
+            if base == upgraded:
+                self.self_loops.append(base)
+            else:
+                counts[(self.index[base], self.index[upgraded])] += 1
+        self.duplicate_edges = [(self.names[u], self.names[v]) for (u, v), count in counts.items() if count > 1]
+        self.edge_list = list(counts)
+
+        self.child_offsets, self.child_targets = self._csr(self.edge_list)
+        self.parent_offsets, self.parent_targets = self._csr([(v, u) for u, v in self.edge_list])
+
+        self.depth, self.cycle_nodes = self._levels()
+        self.descendant_lists, self.descendant_sets, self.distances = self._closure()
+        self.ancestor_lists = self._invert(self.descendant_lists)
+
+    def _csr(self, pairs: List[Tuple[int, int]]) -> Tuple[array, array]:
+        """Offsets and targets arrays for pairs, keeping each node's targets in input order"""
+        offsets = array('I', [0] * (len(self.names) + 1))
+        for source, _ in pairs:
+            offsets[source + 1] += 1
+        for position in range(len(self.names)):
+            offsets[position + 1] += offsets[position]
+
+        targets = array('I', [0] * len(pairs))
+        filled = array('I', offsets[:-1])
+        for source, target in pairs:
+            targets[filled[source]] = target
+            filled[source] += 1
+        return offsets, targets
+
+    def _levels(self) -> Tuple[array, List[str]]:
+        """Longest distance from a root for every troop (Kahn's order); leftovers sit on cycles"""
+        in_degree = [self.parent_offsets[v + 1] - self.parent_offsets[v] for v in range(len(self.names))]
+        depth = array('i', [0] * len(self.names))
+        queue = deque(v for v in range(len(self.names)) if in_degree[v] == 0)
+        while queue:
+            u = queue.popleft()
+            for v in self.child_ids(u):
+                depth[v] = max(depth[v], depth[u] + 1)
+                in_degree[v] -= 1
+                if in_degree[v] == 0:
+                    queue.append(v)
+
+        cycle_nodes = [self.names[v] for v in range(len(self.names)) if in_degree[v] > 0]
+        for v in range(len(self.names)):
+            if in_degree[v] > 0:
+                depth[v] = -1
+        return depth, cycle_nodes
+
+    def _closure(self) -> Tuple[List[array], List[frozenset], List[Dict[int, int]]]:
+        """Breadth-first search from every troop: descendant arrays, sets and hop distances"""
+        lists, sets, distances = [], [], []
+        for source in range(len(self.names)):
+            found = {}
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                for v in self.child_ids(u):
+                    if v not in found and v != source:
+                        found[v] = found.get(u, 0) + 1
+                        queue.append(v)
+            lists.append(array('I', sorted(found)))
+            sets.append(frozenset(found))
+            distances.append(found)
+        return lists, sets, distances
+
+    def _invert(self, lists: List[array]) -> List[array]:
+        """Ancestor arrays from descendant arrays; sorted, since sources are visited in order"""
+        inverted = [array('I') for _ in self.names]
+        for source, targets in enumerate(lists):
+            for target in targets:
+                inverted[target].append(source)
+        return inverted
+
+    def child_ids(self, u: int) -> array:
+        return self.child_targets[self.child_offsets[u]:self.child_offsets[u + 1]]
+
+    def parent_ids(self, v: int) -> array:
+        return self.parent_targets[self.parent_offsets[v]:self.parent_offsets[v + 1]]
+
+    def children(self, name: str) -> List[str]:
+        return [self.names[v] for v in self.child_ids(self.index[name])]
+
+    def parents(self, name: str) -> List[str]:
+        return [self.names[u] for u in self.parent_ids(self.index[name])]
+
+    def is_reachable(self, base: str, upgraded: str) -> bool:
+        """True if base upgrades into upgraded in one or more steps"""
+        return self.index[upgraded] in self.descendant_sets[self.index[base]]
+
+    def descendants(self, name: str) -> List[str]:
+        return [self.names[v] for v in self.descendant_lists[self.index[name]]]
+
+    def ancestors(self, name: str) -> List[str]:
+        return [self.names[u] for u in self.ancestor_lists[self.index[name]]]
+
+    def roots_of(self, name: str) -> List[str]:
+        """Root recruits (troops nothing upgrades into) that lead to name; name itself if it is one"""
+        if not self.parent_ids(self.index[name]):
+            return [name]
+        return [ancestor for ancestor in self.ancestors(name) if not self.parent_ids(self.index[ancestor])]
+
+    def level(self, name: str) -> Optional[int]:
+        """Upgrade steps from the farthest root, or None for troops on a cycle"""
+        depth = self.depth[self.index[name]]
+        return depth if depth >= 0 else None
+
+    def edges(self) -> List[Tuple[str, str]]:
+        """Distinct upgrade edges in input order"""
+        return [(self.names[u], self.names[v]) for u, v in self.edge_list]
+
+    def closure_rows(self) -> List[Tuple[str, str, int]]:
+        """(ancestor, descendant, distance in upgrades) for every reachable pair"""
+        return [(self.names[u], self.names[v], distance)
+                for u, found in enumerate(self.distances)
+                for v, distance in sorted(found.items())]
+
+    def to_json(self) -> Dict:
+        return {
+            'troops': [{'name': name, 'level': self.level(name)} for name in self.names],
+            'edges': [list(edge) for edge in self.edges()],
+            'closure': [list(row) for row in self.closure_rows()],
+            'cycle_nodes': self.cycle_nodes,
+            'self_loops': self.self_loops,
+            'duplicate_edges': [list(edge) for edge in self.duplicate_edges]
+        }
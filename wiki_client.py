@@ -0,0 +1,151 @@
+# wiki_client.py
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from metrics import METRICS
+from rate_limit import AdaptiveLimiter
+
+# --- Configuration ---
+REQUEST_TIMEOUT = (5, 30)     # (connect, read) seconds
+MAX_RETRIES = 5               # Attempts after the first before a request is given up
+BACKOFF_BASE = 1.0            # Seconds; doubled on every retry, with full jitter
+BACKOFF_MAX = 60.0
+MAXLAG_SECONDS = 5            # Ask MediaWiki to refuse requests while replication lag exceeds this
+# --- End Configuration ---
+
+USER_AGENT = 'BannerlordTroopScraper/1.0'
+
+# Statuses that mean "slow down / try again later" rather than "this request is wrong"
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = THROTTLE_STATUSES | {500, 502, 504}
+# MediaWiki API error codes that are sent with HTTP 200 and should be retried
+THROTTLE_ERROR_CODES = {'maxlag', 'ratelimited'}
+
+
+class WikiRequestError(Exception):
+    """A MediaWiki request that failed for good, after any retries"""
+
+
+def retry_after_seconds(value: str) -> float:
+    """Seconds to wait from a Retry-After header (delta seconds or an HTTP date), 0 if absent"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class WikiClient:
+    """Sends MediaWiki API requests with timeouts, retries and adaptive throttling.
+
+    Requests go through a pooled, gzip-enabled session. Timeouts, connection
+    errors, 5xx responses, 429s and maxlag/ratelimited API errors are retried
+    with jittered exponential backoff, honouring Retry-After when the server
+    sends it. Throttling responses also feed an AIMD governor (AdaptiveLimiter)
+    that cuts the request rate and concurrency for every thread and then
+    ramps them back up, so the client runs as fast as the wiki allows.
+    """
+
+    def __init__(self, api_url: str, max_workers: int, requests_per_second: float,
+                 timeout=REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES, maxlag: int = MAXLAG_SECONDS):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.maxlag = maxlag
+        self.limiter = AdaptiveLimiter(requests_per_second, max_workers)
+        self.retries = 0
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        # One pooled connection per in-flight request; block instead of opening extras
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_workers),
+                                                pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, params: Dict) -> Dict:
+        return self.request('GET', params)
+
+    def post(self, data: Dict) -> Dict:
+        return self.request('POST', data)
+
+    def request(self, method: str, params: Dict) -> Dict:
+        """Send one API request and return its decoded JSON, retrying transient failures"""
+        if self.maxlag:
+            params = {**params, 'maxlag': self.maxlag}
+
+        endpoint = params.get('action', 'unknown')
+        attempt = 0
+        while True:
+            retry_after = 0.0
+            self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                with METRICS.stage('http'):
+                    if method == 'GET':
+                        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+                    else:
+                        response = self.session.post(self.api_url, data=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+                METRICS.count('request_errors')
+            else:
+                METRICS.observe(endpoint, time.perf_counter() - started)
+                METRICS.count('requests')
+                METRICS.count('bytes_downloaded', len(response.content))
+                data, error = self.check(response)
+                if error is None:
+                    self.limiter.success()
+                    return data
+                retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            finally:
+                self.limiter.release()
+
+            if attempt >= self.max_retries:
+                raise WikiRequestError(f"{error} (gave up after {attempt + 1} attempts)")
+            attempt += 1
+            self.retries += 1
+            METRICS.count('request_retries')
+            # Full jitter keeps the retrying threads from hitting the server in lockstep
+            backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            time.sleep(max(retry_after, backoff))
+
+    def check(self, response) -> Tuple[Optional[Dict], Optional[str]]:
+        """(decoded JSON, None) for a usable response, (None, error) for a retryable one; raises otherwise"""
+        status = response.status_code
+        if status in RETRY_STATUSES:
+            if status in THROTTLE_STATUSES:
+                METRICS.count('requests_throttled')
+                self.limiter.throttle(retry_after_seconds(response.headers.get('Retry-After')))
+            return None, f"HTTP {status}"
+        if status >= 400:
+            raise WikiRequestError(f"HTTP {status} from {self.api_url}")
+
+        try:
+            data = response.json()
+        except ValueError:
+            # Truncated bodies or HTML error pages from a proxy
+            return None, "invalid JSON response"
+
+        code = data.get('error', {}).get('code') if isinstance(data, dict) else None
+        if code in THROTTLE_ERROR_CODES:
+            METRICS.count('requests_throttled')
+            self.limiter.throttle(retry_after_seconds(response.headers.get('Retry-After')) or 1.0)
+            return None, f"API error {code}: {data['error'].get('info', '')}"
+        return data, None
+
+    def stats(self) -> str:
+        return (f"{self.limiter.sent} requests, {self.retries} retries, {self.limiter.throttled} throttled, "
+                f"final rate {self.limiter.rate:g}/s with {int(self.limiter.concurrency)} in flight")
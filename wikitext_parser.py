@@ -0,0 +1,228 @@
+# wikitext_parser.py
+"""Helpers for reading troop data straight from page wikitext.
+
+The rendered HTML of a troop page is several times larger than its template
+source, so the scraper's wikitext mode reads the Troop box infobox and the
+Equipment table from the wikitext instead. Rows come back in the same
+(slot header, cell text, item names) shape as
+BannerlordTroopScraper.read_equipment_table, so the mount and equipment logic
+is shared between both modes.
+"""
+import html
+import re
+from typing import Dict, List, Optional, Tuple
+
+INFOBOX_TEMPLATES = {'troop box'}
+
+# Row headers of the Equipment table, as rendered on the wiki
+EQUIPMENT_HEADERS = {
+    'weapons', 'weapon', 'shield', 'head armor', 'shoulder armor', 'body armor',
+    'hand armor', 'leg armor', 'foot armor', 'mount', 'mount harness'
+}
+
+HEADING_RE = re.compile(r'^(=+)\s*(.*?)\s*\1\s*$', re.MULTILINE)
+BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+REF_RE = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.IGNORECASE | re.DOTALL)
+FILE_LINK_RE = re.compile(r'\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]', re.IGNORECASE)
+LINK_RE = re.compile(r'\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]')
+EXTERNAL_LINK_RE = re.compile(r'\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]')
+TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+QUOTES_RE = re.compile(r"'{2,}")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a template or parameter name the way MediaWiki matches them"""
+    return ' '.join(name.replace('_', ' ').split()).lower()
+
+
+def find_closing(text: str, start: int, opening: str = '{{', closing: str = '}}') -> int:
+    """Return the index just past the bracket pair opened at start, or -1 if unbalanced"""
+    depth = 0
+    i = start
+    while i < len(text):
+        if text.startswith(opening, i):
+            depth += 1
+            i += len(opening)
+        elif text.startswith(closing, i):
+            depth -= 1
+            i += len(closing)
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return -1
+
+
+def split_top_level(text: str, separator: str = '|') -> List[str]:
+    """Split on separator, ignoring separators nested inside {{ }} and [[ ]]"""
+    parts = []
+    depth = 0
+    current = []
+    i = 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in ('{{', '[['):
+            depth += 1
+            current.append(pair)
+            i += 2
+        elif pair in ('}}', ']]') and depth:
+            depth -= 1
+            current.append(pair)
+            i += 2
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(''.join(current))
+            current = []
+            i += len(separator)
+        else:
+            current.append(text[i])
+            i += 1
+    parts.append(''.join(current))
+    return parts
+
+
+def remove_templates(text: str) -> str:
+    """Drop every {{...}} template call, including nested ones"""
+    while True:
+        start = text.find('{{')
+        if start == -1:
+            return text
+        end = find_closing(text, start)
+        if end == -1:
+            return text[:start]
+        text = text[:start] + text[end:]
+
+
+def strip_markup(text: str) -> str:
+    """Reduce a wikitext fragment to the plain text the rendered page would show"""
+    text = COMMENT_RE.sub('', text)
+    text = REF_RE.sub('', text)
+    text = remove_templates(text)
+    text = FILE_LINK_RE.sub('', text)
+    text = LINK_RE.sub(lambda m: m.group(2) if m.group(2) is not None else m.group(1), text)
+    text = EXTERNAL_LINK_RE.sub(r'\1', text)
+    text = QUOTES_RE.sub('', text)
+    text = TAG_RE.sub('', text)
+    return html.unescape(text).replace('\xa0', ' ')
+
+
+def link_targets(text: str) -> List[str]:
+    """Page titles of the internal links in text, in order, without anchors or file/category links"""
+    targets = []
+    for match in LINK_RE.finditer(FILE_LINK_RE.sub('', text)):
+        target = match.group(1).split('#', 1)[0].replace('_', ' ').strip()
+        if target:
+            targets.append(target[0].upper() + target[1:])
+    return targets
+
+
+def find_template(wikitext: str, names: set) -> Optional[Dict[str, str]]:
+    """Return the named parameters of the first template whose name is in names"""
+    start = wikitext.find('{{')
+    while start != -1:
+        end = find_closing(wikitext, start)
+        if end == -1:
+            return None
+
+        parts = split_top_level(wikitext[start + 2:end - 2])
+        if normalize_name(parts[0]) in names:
+            params = {}
+            for part in parts[1:]:
+                if '=' in part:
+                    key, value = part.split('=', 1)
+                    params[normalize_name(key)] = value.strip()
+            return params
+
+        start = wikitext.find('{{', start + 2)
+    return None
+
+
+def get_section(wikitext: str, title: str) -> Optional[str]:
+    """Return the body of the first section with the given heading, up to the next heading of the same level or higher"""
+    for match in HEADING_RE.finditer(wikitext):
+        if strip_markup(match.group(2)).strip().lower() != title.lower():
+            continue
+
+        level = len(match.group(1))
+        end = len(wikitext)
+        for following in HEADING_RE.finditer(wikitext, match.end()):
+            if len(following.group(1)) <= level:
+                end = following.start()
+                break
+        return wikitext[match.end():end]
+    return None
+
+
+def split_cells(line: str, separator: str) -> List[str]:
+    """Split one table line into cells, dropping any 'attributes |' prefix"""
+    cells = []
+    for cell in split_top_level(line, separator):
+        pieces = split_top_level(cell, '|')
+        cells.append(pieces[-1] if len(pieces) > 1 else cell)
+    return cells
+
+
+def parse_wikitable(table: str) -> List[List[str]]:
+    """Parse the body of a {| ... |} table into rows of raw cell wikitext"""
+    rows = []
+    cells = []
+    for raw_line in table.split('\n'):
+        line = raw_line.strip()
+        if line.startswith('{|') or line.startswith('|+'):
+            continue
+        if line.startswith('|}') or line.startswith('|-'):
+            if cells:
+                rows.append(cells)
+            cells = []
+        elif line.startswith('!'):
+            cells.extend(split_cells(line[1:], '!!'))
+        elif line.startswith('|'):
+            cells.extend(split_cells(line[1:], '||'))
+        elif cells:
+            # Continuation of a multi-line cell
+            cells[-1] += '\n' + raw_line
+    if cells:
+        rows.append(cells)
+    return rows
+
+
+def equipment_row(header: str, cell: str) -> Tuple[str, str, List[str]]:
+    """Build a (slot header, cell text, item names) row from raw wikitext cells"""
+    item_names = [strip_markup(part) for part in BR_RE.split(cell)]
+    return strip_markup(header).strip().lower(), ''.join(item_names).strip(), item_names
+
+
+def read_equipment_rows(wikitext: str) -> Optional[List[Tuple[str, str, List[str]]]]:
+    """Read the Equipment section as a wikitable or as slot-named template parameters.
+
+    Returns None when the section is missing or has neither shape, so the
+    caller can fall back to the rendered HTML.
+    """
+    section = get_section(wikitext, 'Equipment')
+    if section is None:
+        return None
+
+    table_start = section.find('{|')
+    if table_start != -1:
+        table_end = section.find('\n|}', table_start)
+        table = section[table_start:table_end if table_end != -1 else len(section)]
+        rows = [equipment_row(cells[0], cells[1]) for cells in parse_wikitable(table) if len(cells) >= 2]
+        if any(header in EQUIPMENT_HEADERS for header, _, _ in rows):
+            return rows
+
+    start = section.find('{{')
+    while start != -1:
+        end = find_closing(section, start)
+        if end == -1:
+            break
+        rows = []
+        for part in split_top_level(section[start + 2:end - 2])[1:]:
+            if '=' in part:
+                key, value = part.split('=', 1)
+                if normalize_name(key) in EQUIPMENT_HEADERS:
+                    rows.append(equipment_row(key, value.strip()))
+        if rows:
+            return rows
+        start = section.find('{{', end)
+
+    return None
@@ -0,0 +1,194 @@
+# work_queue.py
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# --- Configuration ---
+WORK_QUEUE_DB = 'scrape_queue.sqlite'
+SHARD_SIZE = 100              # Troops per shard
+LEASE_SECONDS = 300.0         # A shard whose worker stops reporting for this long is handed out again
+MAX_SHARD_ATTEMPTS = 3        # Leases of one shard before it is given up as failed
+# --- End Configuration ---
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending, leased, done or failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS troops (
+    position INTEGER PRIMARY KEY,             -- index in the coordinator's work list
+    shard_id INTEGER NOT NULL,
+    faction TEXT NOT NULL,
+    culture_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    result TEXT                               -- parsed result as JSON; NULL if the page could not be fetched
+);
+CREATE INDEX IF NOT EXISTS idx_troops_shard ON troops (shard_id);
+CREATE INDEX IF NOT EXISTS idx_shards_status ON shards (status);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite-backed queue of troop shards, shared by any number of worker processes.
+
+    The coordinator splits the work list into shards. Workers claim a shard
+    under a lease, renew the lease while they work, and write the shard's
+    parsed results in one transaction. A shard whose lease runs out (its
+    worker died or hung) goes to the next claimant, up to max_attempts
+    times; a shard whose scrape raises is released for retry the same way.
+    Claims take SQLite's write lock (BEGIN IMMEDIATE), so two workers never
+    hold the same shard. The default rollback journal is used rather than
+    WAL so that workers on other machines can share the file over a network
+    filesystem with working locks.
+    """
+
+    def __init__(self, path: str = WORK_QUEUE_DB, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_SHARD_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        # Autocommit; transactions are opened explicitly where they matter
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def create(self, meta: Dict, work: List[Tuple[str, int, str]], shard_size: int = SHARD_SIZE) -> int:
+        """Replace the queue's contents with work ((faction, culture_id, title) in order); returns the shard count"""
+        shard_size = max(1, shard_size)
+        shard_count = (len(work) + shard_size - 1) // shard_size
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ('meta', 'shards', 'troops'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                  [(key, json.dumps(value)) for key, value in meta.items()])
+            self.conn.executemany("INSERT INTO shards (shard_id) VALUES (?)",
+                                  [(shard_id,) for shard_id in range(shard_count)])
+            self.conn.executemany(
+                "INSERT INTO troops (position, shard_id, faction, culture_id, title) VALUES (?, ?, ?, ?, ?)",
+                [(position, position // shard_size, faction, culture_id, title)
+                 for position, (faction, culture_id, title) in enumerate(work)]
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return shard_count
+
+    def meta(self) -> Dict:
+        return {key: json.loads(value) for key, value in self.conn.execute("SELECT key, value FROM meta")}
+
+    def claim(self, worker_id: str) -> Optional[Tuple[int, List[Tuple[int, str, str]]]]:
+        """Lease the next pending (or abandoned) shard; returns (shard_id, [(position, faction, title)]) or None"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Abandoned shards that have used up their attempts are given up
+            self.conn.execute(
+                "UPDATE shards SET status = 'failed', lease_owner = NULL, "
+                "error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT shard_id FROM shards "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY shard_id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            shard_id = row[0]
+            self.conn.execute(
+                "UPDATE shards SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ? "
+                "WHERE shard_id = ?",
+                (worker_id, now + self.lease_seconds, shard_id)
+            )
+            entries = self.conn.execute(
+                "SELECT position, faction, title FROM troops WHERE shard_id = ? ORDER BY position", (shard_id,)
+            ).fetchall()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return shard_id, entries
+
+    def renew(self, shard_id: int, worker_id: str) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+        cursor = self.conn.execute(
+            "UPDATE shards SET lease_expires = ? WHERE shard_id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, shard_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, shard_id: int, worker_id: str, results: List[Tuple[int, Optional[Dict]]]) -> bool:
+        """Store a shard's (position, result) pairs and mark it done; False if the lease was lost"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute(
+                "UPDATE shards SET status = 'done', lease_owner = NULL, lease_expires = NULL, error = NULL "
+                "WHERE shard_id = ? AND status = 'leased' AND lease_owner = ?",
+                (shard_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                self.conn.execute("ROLLBACK")
+                return False
+            self.conn.executemany(
+                "UPDATE troops SET done = 1, result = ? WHERE position = ?",
+                [(json.dumps(result, ensure_ascii=False) if result is not None else None, position)
+                 for position, result in results]
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def release(self, shard_id: int, worker_id: str, error: str):
+        """Hand a shard back after a failed attempt; it fails for good once its attempts are used up"""
+        self.conn.execute(
+            "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, error = ? "
+            "WHERE shard_id = ? AND status = 'leased' AND lease_owner = ?",
+            (self.max_attempts, error, shard_id, worker_id)
+        )
+
+    def progress(self) -> Dict[str, int]:
+        """Shard counts per status"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM shards GROUP BY status"))
+        return counts
+
+    def next_expiry(self) -> Optional[float]:
+        """When the earliest current lease runs out, or None if no shard is leased"""
+        return self.conn.execute("SELECT MIN(lease_expires) FROM shards WHERE status = 'leased'").fetchone()[0]
+
+    def failures(self) -> List[Tuple[int, str]]:
+        return self.conn.execute(
+            "SELECT shard_id, error FROM shards WHERE status = 'failed' ORDER BY shard_id"
+        ).fetchall()
+
+    def results(self) -> Iterator[Tuple[int, str, int, str, Optional[Dict]]]:
+        """(position, faction, culture_id, title, result) for every finished troop, in work order"""
+        for position, faction, culture_id, title, result in self.conn.execute(
+                "SELECT position, faction, culture_id, title, result FROM troops WHERE done = 1 ORDER BY position"):
+            yield position, faction, culture_id, title, json.loads(result) if result is not None else None